@@ -0,0 +1,124 @@
+"""
+This module counts reads of title details to find the popular titles. Reads are
+counted in memory on the request path and flushed to a Redis sorted set every
+ACCESS_FLUSH_INTERVAL seconds in one pipeline, as forward-decayed scores (half
+life ACCESS_HALF_LIFE_HOURS), so that the set ranks titles by recent popularity
+across every worker. The details pre-refresher reads the top of it.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+
+import redis.exceptions
+from environs import Env
+from app.redis_client import redis_client
+from app.utils.forward_decay_utils import ForwardDecay
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+ACCESS_TRACKING_ENABLED = env.bool("ACCESS_TRACKING_ENABLED", True)
+ACCESS_FLUSH_INTERVAL = env.float("ACCESS_FLUSH_INTERVAL", 10)
+ACCESS_HALF_LIFE_HOURS = env.float("ACCESS_HALF_LIFE_HOURS", 24)
+# The least popular titles beyond this many are dropped from the sorted set
+ACCESS_MAX_TRACKED = env.int("ACCESS_MAX_TRACKED", 10_000)
+
+ACCESS_KEY = "details_access"
+LANDMARK_KEY = "details_access_landmark"
+RESCALE_LOCK_KEY = "details_access_rescale_lock"
+
+access_decay = ForwardDecay(half_life=ACCESS_HALF_LIFE_HOURS * 60 * 60)
+pending_accesses = Counter()
+access_stats = {"recorded": 0, "flushed": 0, "flushes": 0, "rescales": 0}
+
+
+def record_access(cache_key):
+    """Count a read of a details entry, written to Redis on the next flush"""
+    if ACCESS_TRACKING_ENABLED:
+        pending_accesses[cache_key] += 1
+        access_stats["recorded"] += 1
+
+
+async def flush_accesses():
+    """Add the reads counted since the last flush to the sorted set"""
+    if not pending_accesses:
+        return 0
+
+    accesses = dict(pending_accesses)
+    pending_accesses.clear()
+    now = time.time()
+    landmark = await get_landmark(now)
+    if access_decay.needs_rescale(now, landmark):
+        landmark = await rescale_scores(landmark, now)
+
+    weight = access_decay.weight(now, landmark)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for cache_key, count in accesses.items():
+            pipe.zincrby(ACCESS_KEY, count * weight, cache_key)
+        pipe.zremrangebyrank(ACCESS_KEY, 0, -ACCESS_MAX_TRACKED - 1)
+        await pipe.execute()
+
+    access_stats["flushes"] += 1
+    access_stats["flushed"] += sum(accesses.values())
+    return len(accesses)
+
+
+async def get_landmark(now):
+    """The shared landmark time of the scores, set by the first flush"""
+    await redis_client.set(LANDMARK_KEY, now, nx=True)
+    return float(await redis_client.get(LANDMARK_KEY))
+
+
+async def rescale_scores(landmark, now):
+    """Move the scores onto a new landmark so their weights stay small"""
+    lock = redis_client.lock(RESCALE_LOCK_KEY, timeout=30)
+    if not await lock.acquire(blocking=False):
+        return landmark
+
+    try:
+        # Another worker may have rescaled since the landmark was read
+        current_landmark = float(await redis_client.get(LANDMARK_KEY))
+        if current_landmark != landmark:
+            return current_landmark
+
+        factor = access_decay.rescale_factor(landmark, now)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.zunionstore(ACCESS_KEY, {ACCESS_KEY: factor})
+            pipe.set(LANDMARK_KEY, now)
+            await pipe.execute()
+        access_stats["rescales"] += 1
+        logging.info("Rescaled details access scores onto a new landmark")
+        return now
+    finally:
+        await lock.release()
+
+
+async def get_popular_keys(count):
+    """The count most read details keys, most popular first"""
+    keys = await redis_client.zrevrange(ACCESS_KEY, 0, count - 1)
+    return [key.decode("utf-8") if isinstance(key, bytes) else key for key in keys]
+
+
+async def run_access_flusher():
+    """Flush the counted reads every ACCESS_FLUSH_INTERVAL seconds until cancelled"""
+    try:
+        while True:
+            await asyncio.sleep(ACCESS_FLUSH_INTERVAL)
+            try:
+                await flush_accesses()
+            except (redis.exceptions.RedisError, TypeError, ValueError) as e:
+                logging.error(f"Error flushing accesses: {type(e).__name__}: {str(e)}.")
+    except asyncio.CancelledError:
+        try:
+            await flush_accesses()
+        except redis.exceptions.RedisError:
+            pass
+        raise
+
+
+def get_access_stats():
+    """Counters of recorded and flushed reads"""
+    return {**access_stats, "pending": sum(pending_accesses.values())}
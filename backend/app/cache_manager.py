@@ -1,14 +1,21 @@
 """
 This module manages the caching of trending movies data using a scheduler.
-It periodically updates the cache to ensure fresh data is available.
+It periodically updates the cache to ensure fresh data is available, and
+pre-refreshes the most read title details before they expire.
 """
 import logging
 import redis
 import redis.exceptions
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from app.redis_client import set_key, ensure_connection, redis_client
-from app.tmdb_api import fetch_trending_movies
+from apscheduler.triggers.interval import IntervalTrigger
+from app.details_manager import prerefresh_popular_details
+from app.redis_client import get_key, set_key, redis_client
+from app.tmdb_api import (
+    fetch_trending_list,
+    fetch_trending_movies,
+    refresh_trending_incrementally,
+)
 from environs import Env
 from redis.exceptions import LockError
 
@@ -20,35 +27,43 @@ env = Env()
 env.read_env()
 
 TMDB_API_KEY = env.str("TMDB_API_KEY")
+# Hours between incremental trending refreshes, on top of the daily full run (0 disables)
+TRENDING_INCREMENTAL_INTERVAL_HOURS = env.float("TRENDING_INCREMENTAL_INTERVAL_HOURS", 3)
+# Minutes between checks for popular details close to expiry (0 disables)
+PREREFRESH_INTERVAL_MINUTES = env.float("PREREFRESH_INTERVAL_MINUTES", 10)
 
 """
 Fetches trending movies from TMDB API and updates the Redis cache.
-Logs success or failure of the operation.
+An incremental update only warms up titles that are new to the trending list
+or expiring soon. Logs success or failure of the operation.
 """
 
 
-async def update_trending_movies_cache():
-    ensure_connection()
-
+async def update_trending_movies_cache(incremental=False):
     # Redis lock used to prevent multiple workers processing trending movies update
     lock = redis_client.lock(
         "trending_movies_update_lock", timeout=600
     )  # 10 minutes timeout, matching uvicorn workers timeout
 
     try:
-        have_lock = lock.acquire(blocking=False)
+        have_lock = await lock.acquire(blocking=False)
         if have_lock:
             logging.info("Acquired lock for trending movies update")
             try:
-                movies = await fetch_trending_movies(TMDB_API_KEY)
-                set_key("trending_movies", movies)
+                if incremental:
+                    previous = await get_key("trending_movies") or []
+                    movies = await fetch_trending_list(TMDB_API_KEY)
+                    await refresh_trending_incrementally(previous, movies, TMDB_API_KEY)
+                else:
+                    movies = await fetch_trending_movies(TMDB_API_KEY)
+                await set_key("trending_movies", movies)
                 logging.info("Trending movies cache updated successfully")
             except Exception as e:
                 logging.error(
                     f"Error updating trending movies cache: {type(e).__name__}: {str(e)}."
                 )
             finally:
-                lock.release()
+                await lock.release()
                 logging.info("Released lock for trending movies update")
         else:
             logging.info("Update already in progress, skipping this run")
@@ -58,6 +73,26 @@ async def update_trending_movies_cache():
         logging.error(f"Redis connection error: {type(e).__name__}: {str(e)}.")
 
 
+async def prerefresh_popular_details_cache():
+    # Only one worker checks the popular entries per interval
+    lock = redis_client.lock("prerefresh_popular_details_lock", timeout=60)
+    try:
+        if not await lock.acquire(blocking=False):
+            return
+        try:
+            await prerefresh_popular_details(TMDB_API_KEY)
+        except Exception as e:
+            logging.error(
+                f"Error pre-refreshing popular details: {type(e).__name__}: {str(e)}."
+            )
+        finally:
+            await lock.release()
+    except LockError as e:
+        logging.error(f"Error acquiring lock: {type(e).__name__}: {str(e)}.")
+    except redis.exceptions.ConnectionError as e:
+        logging.error(f"Redis connection error: {type(e).__name__}: {str(e)}.")
+
+
 """
 Initializes and starts the AsyncIOScheduler to periodically update the trending movies cache.
 Returns the initialized scheduler object.
@@ -73,6 +108,30 @@ def start_scheduler():
         name="Update trending movies cache",
         replace_existing=True,
     )
-    logger.info("Scheduler started, cache will update daily at 3:00 AM")
+    if TRENDING_INCREMENTAL_INTERVAL_HOURS:
+        scheduler.add_job(
+            update_trending_movies_cache,
+            trigger=IntervalTrigger(hours=TRENDING_INCREMENTAL_INTERVAL_HOURS),
+            kwargs={"incremental": True},
+            id="refresh_trending_movies_incrementally",
+            name="Refresh trending movies incrementally",
+            replace_existing=True,
+        )
+    if PREREFRESH_INTERVAL_MINUTES:
+        scheduler.add_job(
+            prerefresh_popular_details_cache,
+            trigger=IntervalTrigger(minutes=PREREFRESH_INTERVAL_MINUTES),
+            id="prerefresh_popular_details",
+            name="Pre-refresh popular details",
+            replace_existing=True,
+        )
+    logger.info(
+        "Scheduler started, cache will update daily at 3:00 AM"
+        + (
+            f" and incrementally every {TRENDING_INCREMENTAL_INTERVAL_HOURS:g} hours"
+            if TRENDING_INCREMENTAL_INTERVAL_HOURS
+            else ""
+        )
+    )
     scheduler.start()
     return scheduler
@@ -0,0 +1,84 @@
+"""
+This module keeps a circuit breaker per external source. When a source keeps
+failing or timing out, its requests fail fast with CircuitOpenError instead of
+every details lookup waiting out the full request timeout. The field is then
+None, or keeps its value when a cached details entry is being refreshed.
+"""
+import logging
+import time
+
+import httpx
+from environs import Env
+from app.utils.circuit_breaker_utils import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+CIRCUIT_BREAKERS_ENABLED = env.bool("CIRCUIT_BREAKERS_ENABLED", True)
+FAILURE_RATE_THRESHOLD = env.float("CIRCUIT_FAILURE_RATE_THRESHOLD", 0.5)
+SLOW_CALL_DURATION = env.float("CIRCUIT_SLOW_CALL_SECONDS", 5.0)
+OPEN_DURATION = env.float("CIRCUIT_OPEN_SECONDS", 30.0)
+
+_breakers = {}
+
+
+class CircuitOpenError(Exception):
+    """A request failed fast because its source's circuit is open"""
+
+
+def get_breaker(source):
+    """Get the circuit breaker for a source, creating it on first use"""
+    breaker = _breakers.get(source)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            failure_rate_threshold=FAILURE_RATE_THRESHOLD,
+            slow_call_duration=SLOW_CALL_DURATION,
+            open_duration=OPEN_DURATION,
+        )
+        _breakers[source] = breaker
+    return breaker
+
+
+def allow_request(source):
+    """Check the source's circuit, logging when a request is failed fast"""
+    if not CIRCUIT_BREAKERS_ENABLED:
+        return True
+    if get_breaker(source).allow_request():
+        return True
+    logger.warning(f"Circuit open for {source}, skipping request")
+    return False
+
+
+def is_source_failure(exc):
+    """Connection errors, timeouts, throttling and 5xx count against the source"""
+    if isinstance(exc, httpx.RequestError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        status_code = exc.response.status_code
+        return status_code >= 500 or status_code == 429
+    return False
+
+
+def record_outcome(source, started, exc=None):
+    """Record a finished request (started at a time.monotonic() value) on its circuit"""
+    if not CIRCUIT_BREAKERS_ENABLED:
+        return
+    breaker = get_breaker(source)
+    duration = time.monotonic() - started
+    if exc is not None and is_source_failure(exc):
+        breaker.record_failure(duration)
+    else:
+        breaker.record_success(duration)
+
+
+def release(source):
+    """Forget a request that was cancelled before it finished"""
+    if CIRCUIT_BREAKERS_ENABLED:
+        get_breaker(source).release()
+
+
+def get_circuit_breaker_stats():
+    """State and counters of the circuit per source"""
+    return {source: breaker.stats() for source, breaker in _breakers.items()}
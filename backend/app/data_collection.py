@@ -3,13 +3,27 @@ This module handles data collection from various external sources such as
 RottenTomatoes, Letterboxd, CommonSenseMedia, IMDb, and BoxOfficeMojo.
 It provides functions to fetch and parse data from these sources.
 """
+import asyncio
 import httpx
 import json
 import logging
+import time
 
-from bs4 import BeautifulSoup
-from unidecode import unidecode
-from app.utils.similar_utils import similar
+from environs import Env
+from app import circuit_breakers, rate_limiter
+from app.revalidation import get_refreshed_value, start_conditional_fetch
+from app.http_client import DEFAULT_SOURCE, get_client
+from app.metrics import record_source_request, track_scrape
+from app.utils.html_parser_utils import element_strainer, parse_html
+from app.utils.server_timing_utils import timed
+from app.utils.title_match_utils import best_match
+from app.utils.streaming_utils import StreamTarget
+
+env = Env()
+env.read_env()
+
+# Stream single-element pages and stop downloading once the element is read
+STREAMING_FETCH = env.bool("STREAMING_FETCH", True)
 
 BASE_URLS = {
     "rottentomatoes": "https://www.rottentomatoes.com/search?search=",
@@ -29,76 +43,299 @@ HEADERS = {
     "Referer": "https://www.google.com",
 }
 
+# Only the elements each extractor reads are kept when a page is parsed
+PARSE_ONLY = {
+    "rottentomatoes_search": element_strainer(("search-page-media-row", {})),
+    "letterboxd_search": element_strainer(("span", {"class": "film-title-wrapper"})),
+    "commonsensemedia_search": element_strainer(
+        ("div", {"class": "site-search-teaser"})
+    ),
+    "imdb_title": element_strainer(
+        ("div", {"data-testid": "hero-rating-bar__aggregate-rating__score"}),
+        ("span", {"class": "metacritic-score-box"}),
+    ),
+    "boxofficemojo_title": element_strainer(
+        ("span", {"class": "a-size-medium a-text-bold"})
+    ),
+    "justwatch_page": element_strainer(("div", {"class": "homepage"})),
+    "rottentomatoes_title": element_strainer(
+        ("script", {"id": "media-scorecard-json"})
+    ),
+    "letterboxd_film": element_strainer(("meta", {"name": "twitter:data2"})),
+}
+
+# Where streamed pages can stop: once their target elements have been read,
+# at a marker past where they would be, or at the byte budget
+STREAM_TARGETS = {
+    "imdb_title": StreamTarget(
+        markers=[
+            (b"hero-rating-bar__aggregate-rating__score", b"</div>"),
+            (b"metacritic-score-box", b"</span>"),
+        ],
+        stop_markers=[b'data-testid="title-cast"'],
+        byte_budget=1_500_000,
+    ),
+    "rottentomatoes_title": StreamTarget(
+        markers=[(b'id="media-scorecard-json"', b"</script>")],
+        byte_budget=1_500_000,
+    ),
+    "letterboxd_film": StreamTarget(
+        markers=[(b'name="twitter:data2"', b">")],
+        stop_markers=[b"</head>"],
+        byte_budget=500_000,
+    ),
+}
+
+# Bytes downloaded (before decompression) and early stops per source
+fetch_stats = {}
+
 """
 Makes an asynchronous HTTP GET request and parses the response with BeautifulSoup.
-Handles various exceptions and logs errors.
+Handles various exceptions and logs errors. Fails fast with CircuitOpenError
+while the source's circuit breaker is open.
 
 :param url: The URL to request.
 :param headers: Optional HTTP headers for the request.
+:param source: The external source, used to pick its pooled HTTP client.
+:param parse_only: Optional SoupStrainer limiting parsing to the elements needed.
+:param conditional: Optional ConditionalFetch; a 304 sets its not_modified and returns None.
 :return: BeautifulSoup object of the parsed HTML content, or None if request fails.
 """
 
 
-async def make_request(url, headers=None):
+async def make_request(
+    url, headers=None, source=DEFAULT_SOURCE, parse_only=None, conditional=None
+):
+    if not circuit_breakers.allow_request(source):
+        raise circuit_breakers.CircuitOpenError(source)
+
+    if conditional is not None:
+        headers = {**(headers or {}), **conditional.request_headers()}
+
+    started = time.monotonic()
     try:
-        # Create an asynchronous HTTP client
-        async with httpx.AsyncClient(
-            timeout=15, limits=httpx.Limits(max_connections=10)
-        ) as client:
-            # Make the HTTP GET request
+        # Reuse the long-lived client so connections to the host are kept alive
+        client = get_client(source)
+
+        # Wait for the host's rate limit, then make the HTTP GET request
+        await rate_limiter.acquire(source)
+        started = time.monotonic()
+        with timed(f"{source}_fetch"):
             response = await client.get(url, headers=headers, follow_redirects=True)
+        rate_limiter.record_response(source, response)
+        record_conditional_response(conditional, response)
+
+        if conditional is not None and conditional.not_modified:
+            record_fetch(source, response.num_bytes_downloaded)
+            record_source_outcome(source, started)
+            return None
 
-            # Check that the request was successful (status code 2xx)
-            response.raise_for_status()
+        # Check that the request was successful (status code 2xx)
+        response.raise_for_status()
 
-            # Parse the HTML content of the response with BeautifulSoup
-            return BeautifulSoup(response.content, "html.parser")
+        record_fetch(source, response.num_bytes_downloaded)
+        record_source_outcome(source, started)
+
+        # Parse the HTML content of the response with BeautifulSoup
+        with timed(f"{source}_parse"):
+            return parse_html(response.content, parse_only)
+    except asyncio.CancelledError:
+        circuit_breakers.release(source)
+        raise
     except httpx.RequestError as exc:
         # Log any exception specific to HTTPX
         logging.error(f"HTTPX Request Error: {exc}")
+        record_source_outcome(source, started, exc)
     except Exception as generic_exc:
         # Log any other generic exceptions
         logging.error(f"Generic Exception: {generic_exc}")
+        record_source_outcome(source, started, generic_exc)
+
+    return None
+
+
+async def make_streaming_request(
+    url,
+    headers=None,
+    source=DEFAULT_SOURCE,
+    parse_only=None,
+    target=None,
+    conditional=None,
+):
+    """
+    Stream the page body and stop downloading as soon as the target has been read,
+    then parse the part received. Closing the response early means its connection
+    is not returned to the pool, in exchange for not downloading the rest of a
+    multi-hundred-KB page. Falls back to make_request when streaming is disabled.
+    """
+    if not STREAMING_FETCH or target is None:
+        return await make_request(url, headers, source, parse_only, conditional)
+
+    if not circuit_breakers.allow_request(source):
+        raise circuit_breakers.CircuitOpenError(source)
+
+    if conditional is not None:
+        headers = {**(headers or {}), **conditional.request_headers()}
+
+    started = time.monotonic()
+    try:
+        client = get_client(source)
+        await rate_limiter.acquire(source)
+        started = time.monotonic()
+        with timed(f"{source}_fetch"):
+            async with client.stream(
+                "GET", url, headers=headers, follow_redirects=True
+            ) as response:
+                rate_limiter.record_response(source, response)
+                if conditional is not None:
+                    conditional.record_response(response)
+                    if conditional.not_modified:
+                        conditional.record_body(0)
+                        record_fetch(source, 0)
+                        record_source_outcome(source, started)
+                        return None
+                response.raise_for_status()
+
+                buffer = bytearray()
+                scanner = target.scanner()
+                stopped_early = False
+                async for chunk in response.aiter_bytes():
+                    buffer += chunk
+                    if scanner.reached(buffer):
+                        stopped_early = True
+                        break
+
+                record_fetch(source, response.num_bytes_downloaded, stopped_early)
+                if conditional is not None:
+                    conditional.record_body(response.num_bytes_downloaded)
+        record_source_outcome(source, started)
+
+        with timed(f"{source}_parse"):
+            return parse_html(bytes(buffer), parse_only)
+    except asyncio.CancelledError:
+        circuit_breakers.release(source)
+        raise
+    except httpx.RequestError as exc:
+        logging.error(f"HTTPX Request Error: {exc}")
+        record_source_outcome(source, started, exc)
+    except Exception as generic_exc:
+        logging.error(f"Generic Exception: {generic_exc}")
+        record_source_outcome(source, started, generic_exc)
 
     return None
 
 
+def record_source_outcome(source, started, exc=None):
+    """Record a finished source request on its circuit and in the metrics"""
+    circuit_breakers.record_outcome(source, started, exc)
+    record_source_request(source, time.monotonic() - started, exc)
+
+
+def record_conditional_response(conditional, response):
+    if conditional is not None:
+        conditional.record_response(response)
+        conditional.record_body(response.num_bytes_downloaded)
+
+
+async def fetch_and_extract(
+    url, source, parse_only, extract, *extract_args, fields, target=None
+):
+    """
+    Fetch a page and extract a value from it with extract(soup, *extract_args).
+    fields are where the value is kept in the details; when revalidating, an
+    unchanged page (304) returns its value from the details being refreshed
+    without being downloaded, as does a source whose circuit is open.
+    """
+    conditional = await start_conditional_fetch(url, *extract_args, fields=fields)
+    try:
+        soup = await make_streaming_request(
+            url, HEADERS, source, parse_only, target, conditional
+        )
+    except circuit_breakers.CircuitOpenError:
+        # A refresh keeps the value it has instead of replacing it with None
+        return get_refreshed_value(fields)
+    if conditional is not None and conditional.not_modified:
+        return await conditional.reuse_previous_value()
+    if soup is None:
+        return None
+
+    with timed(f"{source}_parse"):
+        value = extract(soup, *extract_args)
+    if conditional is not None:
+        await conditional.save(value)
+    return value
+
+
+def record_fetch(source, bytes_downloaded, stopped_early=False):
+    stats = fetch_stats.setdefault(
+        source, {"requests": 0, "bytes_downloaded": 0, "stopped_early": 0}
+    )
+    stats["requests"] += 1
+    stats["bytes_downloaded"] += bytes_downloaded
+    stats["stopped_early"] += int(stopped_early)
+
+
+def get_fetch_stats():
+    """Request, byte and early stop counters per source"""
+    return {source: dict(stats) for source, stats in fetch_stats.items()}
+
+
+@track_scrape
 async def get_rottentomatoes_url(title, year, media_type):
     """Extract the RottenTomatoes URL for the title"""
     search_url = f"{BASE_URLS['rottentomatoes']}{title.replace(' ', '%20')}"
-    soup = await make_request(search_url, HEADERS)
-    if soup is None:
-        return None
+    return await fetch_and_extract(
+        search_url,
+        "rottentomatoes",
+        PARSE_ONLY["rottentomatoes_search"],
+        extract_rottentomatoes_url,
+        title,
+        year,
+        media_type,
+        fields="rottentomatoes_url",
+    )
+
 
-    title = unidecode(title)
+def extract_rottentomatoes_url(soup, title, year, media_type):
+    """Find the RottenTomatoes URL for the title in the search results"""
     attribute_name = "release-year" if media_type == "movie" else "startyear"
-    year = int(year)
 
+    candidates = []
+    urls = []
     for result in soup.find_all("search-page-media-row"):
-        rt_title = result.find("a", {"data-qa": "info-name"}).text.strip()
+        title_tag = result.find("a", {"data-qa": "info-name"})
+        url_tag = result.find("a", {"data-qa": "thumbnail-link"})
+        if title_tag is None or url_tag is None or not url_tag.get("href"):
+            continue
         try:
             rt_year = int(result.get(attribute_name, 0))
         except ValueError:
             continue
 
-        # Check year proximity
-        if abs(rt_year - year) <= 1:
-            # Check title similarity
-            if similar(title.lower(), rt_title.lower()) > 0.79:
-                url_tag = result.find("a", {"data-qa": "thumbnail-link"})
-                rottentomatoes_url = url_tag["href"]
-                return rottentomatoes_url
+        candidates.append((title_tag.text.strip(), rt_year))
+        urls.append(url_tag["href"])
 
-    return None
+    # Best title similarity within a year of the release, not the first match
+    match = best_match(title, int(year), candidates)
+    return urls[match] if match is not None else None
 
 
+@track_scrape
 async def get_letterboxd_url(title, year):
     """Extract the Letterboxd URL for the movie"""
     search_url = f"{BASE_URLS['letterboxd']}{title.replace(' ', '+')}/"
-    soup = await make_request(search_url, HEADERS)
-    if soup is None:
-        return None
+    return await fetch_and_extract(
+        search_url,
+        "letterboxd",
+        PARSE_ONLY["letterboxd_search"],
+        extract_letterboxd_url,
+        year,
+        fields="letterboxd_url",
+    )
+
 
+def extract_letterboxd_url(soup, year):
+    """Find the Letterboxd URL for the movie in the search results"""
     search_results = soup.find_all("span", {"class": "film-title-wrapper"})
     year = int(year)
 
@@ -116,15 +353,32 @@ async def get_letterboxd_url(title, year):
     return None
 
 
-async def get_commonsense_info(title, year, media_type):
-    """Extract the title's specific URL page and age rating"""
+@track_scrape
+async def get_commonsense_info(title, year, media_type, commonsense_url=None):
+    """
+    Extract the title's specific URL page and age rating. With the URL already
+    known, its search result is used without matching the title.
+    """
     search_url = f"{BASE_URLS['commonsensemedia']}{title.replace(' ', '%20')}"
-    soup = await make_request(search_url, HEADERS)
-    if soup is None:
-        return None
+    return await fetch_and_extract(
+        search_url,
+        "commonsensemedia",
+        PARSE_ONLY["commonsensemedia_search"],
+        extract_commonsense_info,
+        title,
+        year,
+        media_type,
+        commonsense_url,
+        fields="commonsense_info",
+    )
+
+
+def extract_commonsense_info(soup, title, year, media_type, commonsense_url=None):
+    """Find the title's URL and age rating in the search results"""
     search_results = soup.find_all("div", {"class": "site-search-teaser"})
-    year = int(year)
 
+    candidates = []
+    infos = []
     for result in search_results:
         # Check media type
         product_type_element = result.find(
@@ -138,116 +392,154 @@ async def get_commonsense_info(title, year, media_type):
         if product_type != media_type.upper():
             continue
 
-        # Check title similarity
         commonsense_title_element = result.find("h3", class_="review-teaser-title")
         commonsense_title = (
             commonsense_title_element.text.strip()
             if commonsense_title_element is not None
             else None
         )
-        if not commonsense_title or similar(title.lower(), commonsense_title.lower()) < 0.79:
+        if not commonsense_title:
             continue
 
-        # Check years
-        for check_year in [year, year - 1, year + 1]:
-            year_element = result.find("div", class_="review-product-summary")
-            year_text = year_element.text.strip()[-5:-1]
-            if year_text == str(check_year):
-                # If there is a match, get rating and URL
-                rating_age_element = result.find("span", {"class": "rating__age"})
-                rating_age = (
-                    rating_age_element.text.strip()
-                    if rating_age_element is not None
-                    else None
-                )
-                if not rating_age:
-                    continue
-
-                a_element = result.find("a")
-                href = a_element["href"] if a_element is not None else None
-                if not href:
-                    continue
-
-                return {
-                    "url": f"https://www.commonsensemedia.org{href}",
-                    "rating": rating_age,
-                }
+        # The summary ends with the release year in parentheses
+        year_element = result.find("div", class_="review-product-summary")
+        year_text = year_element.text.strip()[-5:-1] if year_element else ""
+        if not year_text.isdigit():
+            continue
 
-    return None
+        rating_age_element = result.find("span", {"class": "rating__age"})
+        rating_age = (
+            rating_age_element.text.strip() if rating_age_element is not None else None
+        )
+        a_element = result.find("a")
+        href = a_element["href"] if a_element is not None else None
+        if not rating_age or not href:
+            continue
+
+        candidates.append((commonsense_title, int(year_text)))
+        infos.append(
+            {
+                "url": f"https://www.commonsensemedia.org{href}",
+                "rating": rating_age,
+            }
+        )
+
+    for info in infos:
+        if commonsense_url and info["url"] == commonsense_url:
+            return info
 
+    # Best title similarity within a year of the release, not the first match
+    match = best_match(title, int(year), candidates)
+    return infos[match] if match is not None else None
 
+
+@track_scrape
 async def get_imdb_rating(imdb_id):
     """Extract the average user rating and Metascore"""
     if imdb_id:
         imdb_url = f"{BASE_URLS['imdb']}{imdb_id}"
-        soup = await make_request(imdb_url, HEADERS)
-        if soup is None:
-            return None
-
-        # Locate the class that contains the IMDb Rating
-        rating = soup.find(
-            "div", {"data-testid": "hero-rating-bar__aggregate-rating__score"}
+        return await fetch_and_extract(
+            imdb_url,
+            "imdb",
+            PARSE_ONLY["imdb_title"],
+            extract_imdb_rating,
+            fields=("imdb_rating", "metascore"),
+            target=STREAM_TARGETS["imdb_title"],
         )
-        imdb_rating = rating.text[:-3] if rating else None
-
-        # Locate the Metascore
-        metascore_element = soup.find("span", class_="metacritic-score-box")
-        metascore = metascore_element.text.strip() if metascore_element else None
-
-        return {
-            "imdb_rating": imdb_rating,
-            "metascore": metascore
-        }
     else:
         return None
 
 
+def extract_imdb_rating(soup):
+    """Read the average user rating and Metascore from the title page"""
+    # Locate the class that contains the IMDb Rating
+    rating = soup.find(
+        "div", {"data-testid": "hero-rating-bar__aggregate-rating__score"}
+    )
+    imdb_rating = rating.text[:-3] if rating else None
+
+    # Locate the Metascore
+    metascore_element = soup.find("span", class_="metacritic-score-box")
+    metascore = metascore_element.text.strip() if metascore_element else None
+
+    return {
+        "imdb_rating": imdb_rating,
+        "metascore": metascore
+    }
+
+
+@track_scrape
 async def get_boxofficemojo_url(imdb_id):
     boxofficemojo_url = f"{BASE_URLS['boxofficemojo']}{imdb_id}/"
     return boxofficemojo_url
 
 
+@track_scrape
 async def get_box_office_amounts(imdb_id):
     """Extract box office amounts"""
     if imdb_id:
         url = f"{BASE_URLS['boxofficemojo']}{imdb_id}/"
-        soup = await make_request(url, HEADERS)
-        if soup is None:
-            return None
-
-        # Locate the span element that contains the Box Office amounts
-        span_elements = soup.find_all("span", class_="a-size-medium a-text-bold")
-        dollar_amounts = [span.get_text(strip=True) for span in span_elements]
-        return dollar_amounts
+        return await fetch_and_extract(
+            url,
+            "boxofficemojo",
+            PARSE_ONLY["boxofficemojo_title"],
+            extract_box_office_amounts,
+            fields="box_office_amounts",
+        )
     else:
         return None
 
 
+def extract_box_office_amounts(soup):
+    """Read the box office amounts from the title page"""
+    # Locate the span element that contains the Box Office amounts
+    span_elements = soup.find_all("span", class_="a-size-medium a-text-bold")
+    dollar_amounts = [span.get_text(strip=True) for span in span_elements]
+    return dollar_amounts
+
+
+@track_scrape
 async def get_justwatch_page(justwatch_url):
     """Extract the JustWatch page url for 'US'"""
     if justwatch_url:
-        soup = await make_request(justwatch_url, HEADERS)
-        if soup is None:
-            return None
+        return await fetch_and_extract(
+            justwatch_url,
+            "justwatch",
+            PARSE_ONLY["justwatch_page"],
+            extract_justwatch_page,
+            fields="justwatch_page",
+        )
 
-        try:
-            link = soup.find("div", class_="homepage")
-        except AttributeError:
-            link = None
 
-        return link.find("a")["href"] if link else None
+def extract_justwatch_page(soup):
+    """Read the JustWatch link from the TMDB watch page"""
+    try:
+        link = soup.find("div", class_="homepage")
+    except AttributeError:
+        link = None
+
+    return link.find("a")["href"] if link else None
 
 
+@track_scrape
 async def get_rottentomatoes_scores(rottentomatoes_url):
     """Extract Tomotometer and Audience Scores"""
     if not rottentomatoes_url:
         return None
 
     # Get the script element that contains the Tomatometer and Audience scores
-    soup = await make_request(rottentomatoes_url, HEADERS)
-    if soup is None:
-        return None
+    return await fetch_and_extract(
+        rottentomatoes_url,
+        "rottentomatoes",
+        PARSE_ONLY["rottentomatoes_title"],
+        extract_rottentomatoes_scores,
+        fields="rottentomatoes_scores",
+        target=STREAM_TARGETS["rottentomatoes_title"],
+    )
+
 
+def extract_rottentomatoes_scores(soup):
+    """Read the Tomatometer and Audience Scores from the scorecard JSON"""
     script_tag = soup.find("script", {"id": "media-scorecard-json"})
     if not script_tag:
         return None
@@ -319,15 +611,24 @@ async def get_rottentomatoes_scores(rottentomatoes_url):
     }
 
 
+@track_scrape
 async def get_letterboxd_rating(letterboxd_url):
     """Extract the average user rating"""
     if not letterboxd_url:
         return None
 
-    soup = await make_request(letterboxd_url, HEADERS)
-    if soup is None:
-        return None
+    return await fetch_and_extract(
+        letterboxd_url,
+        "letterboxd",
+        PARSE_ONLY["letterboxd_film"],
+        extract_letterboxd_rating,
+        fields="letterboxd_rating",
+        target=STREAM_TARGETS["letterboxd_film"],
+    )
+
 
+def extract_letterboxd_rating(soup):
+    """Read the average user rating from the film page meta tags"""
     # Locate the class that contains the Tomatometer and Audience scores
     try:
         rating = soup.find("meta", {"name": "twitter:data2"}).get("content")
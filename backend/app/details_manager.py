@@ -0,0 +1,588 @@
+"""
+This module assembles title details (TMDB data plus external ratings) and caches them.
+Concurrent cache misses for the same title are coalesced so that a single scrape
+serves every request waiting on it, and entries past their soft expiry are served
+stale while being refreshed in the background. User-facing misses are assembled
+within a latency budget; fields still being scraped at the deadline are marked
+pending and backfilled into the cache in the background. The most read entries
+are refreshed shortly before their soft expiry, within an hourly scrape budget.
+"""
+import asyncio
+import logging
+import time
+import redis.exceptions
+from environs import Env
+from redis.exceptions import LockError
+from app import rate_limiter
+from app.access_tracker import get_popular_keys, record_access
+from app.external_ids import get_external_ids, save_external_ids
+from app.external_data import (
+    collect_external_data,
+    get_task_fields,
+    start_movie_tasks,
+    start_tv_show_tasks,
+)
+from app.redis_client import (
+    get_key_with_soft_expiry,
+    get_keys,
+    unwrap_soft_expiry,
+    set_key_with_soft_expiry,
+    redis_client,
+)
+from app.revalidation import revalidating
+from app.tmdb_api import fetch_title_details, select_expiring_keys
+from app.utils.background_tasks_utils import BackgroundTaskRunner
+from app.utils.server_timing_utils import timed
+from app.utils.single_flight_utils import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+# Coalesce misses across gunicorn workers with a Redis lock per details key
+CROSS_WORKER_COALESCING = env.bool("DETAILS_CROSS_WORKER_COALESCING", False)
+LOCK_TIMEOUT = 60  # seconds, longer than a full scrape of every source
+LOCK_POLL_INTERVAL = 0.25  # seconds between cache checks while another worker scrapes
+
+# Bound the background refreshes of stale entries so they cannot swamp the sources
+MAX_CONCURRENT_REFRESHES = env.int("DETAILS_MAX_CONCURRENT_REFRESHES", 2)
+MAX_PENDING_REFRESHES = env.int("DETAILS_MAX_PENDING_REFRESHES", 50)
+
+# Seconds a user-facing miss may spend assembling details, 0 to wait for every source
+LATENCY_BUDGET = env.float("DETAILS_LATENCY_BUDGET", 1.5) or None
+# Backfills only await scrapes that are already running, so they are not throttled
+MAX_PENDING_BACKFILLS = env.int("DETAILS_MAX_PENDING_BACKFILLS", 100)
+
+# Batch requests are capped in size, and compute at most this many misses at once
+MAX_BATCH_SIZE = env.int("DETAILS_MAX_BATCH_SIZE", 100)
+MAX_CONCURRENT_BATCH_MISSES = env.int("DETAILS_MAX_CONCURRENT_BATCH_MISSES", 4)
+
+# Pre-refresh of popular entries: how many of the most read are checked, how long
+# before their soft expiry they are refreshed, and at most how many per hour
+PREREFRESH_TOP_TITLES = env.int("PREREFRESH_TOP_TITLES", 200)
+PREREFRESH_WINDOW = env.int("PREREFRESH_WINDOW_SECONDS", 2 * 60 * 60)
+PREREFRESH_BUDGET_PER_HOUR = env.int("PREREFRESH_BUDGET_PER_HOUR", 60)
+
+MEDIA_TYPES = ("movie", "tv")
+
+details_single_flight = SingleFlight()
+cross_worker_stats = {"lock_acquired": 0, "coalesced": 0, "fallback": 0}
+prerefresh_stats = {"runs": 0, "due": 0, "scheduled": 0, "over_budget": 0}
+details_refresher = BackgroundTaskRunner(
+    max_concurrent=MAX_CONCURRENT_REFRESHES, max_pending=MAX_PENDING_REFRESHES
+)
+details_backfiller = BackgroundTaskRunner(
+    max_concurrent=MAX_PENDING_BACKFILLS, max_pending=MAX_PENDING_BACKFILLS
+)
+
+
+def get_details_cache_key(tmdb_id, media_type):
+    return f"details_{tmdb_id}_{media_type}"
+
+
+async def build_title_details(tmdb_id, media_type, api_key, latency_budget=None):
+    """
+    Fetch the TMDB details and the external data for a title. With a latency
+    budget, returns whatever has been fetched when it runs out along with the
+    external data tasks still running (an empty dict when complete).
+    """
+    if media_type not in MEDIA_TYPES:
+        raise ValueError(f"Invalid media type: {media_type}")
+
+    started = time.monotonic()
+
+    # Fetch title details from TMDB API
+    tmdb_data = await fetch_title_details(tmdb_id, media_type, api_key)
+    tasks = await start_external_data_tasks(tmdb_id, tmdb_data, media_type)
+
+    timeout = None
+    if latency_budget is not None:
+        timeout = max(0, latency_budget - (time.monotonic() - started))
+    external_data, pending_fields = await collect_external_data(tasks, timeout)
+
+    pending_tasks = {
+        fields: task for fields, task in tasks.items() if not task.done()
+    }
+    return assemble_title_details(tmdb_data, external_data, pending_fields), pending_tasks
+
+
+def get_imdb_url(tmdb_data):
+    # Only create imdb_url if imdb_id exists
+    return (
+        f"https://www.imdb.com/title/{tmdb_data['imdb_id']}"
+        if tmdb_data["imdb_id"]
+        else None
+    )
+
+
+async def start_external_data_tasks(tmdb_id, tmdb_data, media_type):
+    """
+    Start the movie or TV show specific external data tasks, skipping the search
+    pages of sources already resolved in the external ID index
+    """
+    with timed("external_ids"):
+        external_ids = await get_external_ids(tmdb_id, media_type, tmdb_data["imdb_id"])
+    start_tasks = start_movie_tasks if media_type == "movie" else start_tv_show_tasks
+    return start_tasks(
+        tmdb_data["imdb_id"],
+        tmdb_data["title"],
+        tmdb_data["year"],
+        media_type,
+        tmdb_data["justwatch_url"],
+        external_ids,
+    )
+
+
+async def cache_title_details(tmdb_id, media_type, result_data):
+    """Write the title details to the cache, and complete ones to the external ID index"""
+    await set_key_with_soft_expiry(
+        get_details_cache_key(tmdb_id, media_type), result_data
+    )
+    if not result_data["external_data"].get("pending_fields"):
+        await save_external_ids(
+            tmdb_id,
+            media_type,
+            result_data["tmdb_data"]["imdb_id"],
+            result_data["external_data"],
+        )
+
+
+def assemble_title_details(tmdb_data, external_data, pending_fields=()):
+    """Combine the TMDB details and the external data into the cached details model"""
+    external_data_model = {
+        "imdb_url": get_imdb_url(tmdb_data),
+        **external_data,
+        "pending_fields": list(pending_fields),
+    }
+
+    return {"tmdb_data": tmdb_data, "external_data": external_data_model}
+
+
+async def fetch_and_cache_details(tmdb_id, media_type, api_key, latency_budget=None):
+    """Build the title details and write them to the cache"""
+    cache_key = get_details_cache_key(tmdb_id, media_type)
+
+    if CROSS_WORKER_COALESCING:
+        return await fetch_and_cache_details_with_lock(
+            cache_key, tmdb_id, media_type, api_key, latency_budget
+        )
+
+    return await build_and_cache_details(
+        cache_key, tmdb_id, media_type, api_key, latency_budget
+    )
+
+
+async def build_and_cache_details(cache_key, tmdb_id, media_type, api_key, latency_budget):
+    """Build and cache the title details, backfilling any pending fields"""
+    result_data, pending_tasks = await build_title_details(
+        tmdb_id, media_type, api_key, latency_budget
+    )
+    await cache_title_details(tmdb_id, media_type, result_data)
+
+    if pending_tasks:
+        schedule_details_backfill(tmdb_id, media_type, result_data, pending_tasks)
+        logging.info(
+            f"Fetched partial details for {cache_key}, "
+            f"pending: {', '.join(result_data['external_data']['pending_fields'])}"
+        )
+    else:
+        logging.info("Fetched from external_data.py")
+    return result_data
+
+
+def schedule_details_backfill(tmdb_id, media_type, result_data, pending_tasks):
+    """Complete a partial details entry in the cache once its pending fields arrive"""
+    scheduled = details_backfiller.schedule(
+        get_details_cache_key(tmdb_id, media_type),
+        backfill_details,
+        tmdb_id,
+        media_type,
+        result_data,
+        pending_tasks,
+    )
+    if not scheduled:
+        # Nothing would collect the results, stop scraping for them
+        for task in pending_tasks.values():
+            task.cancel()
+    return scheduled
+
+
+async def backfill_details(tmdb_id, media_type, result_data, pending_tasks):
+    """Wait for the pending external data and rewrite the complete details entry"""
+    fetched_data, still_pending = await collect_external_data(pending_tasks)
+
+    external_data = {
+        field: value
+        for field, value in result_data["external_data"].items()
+        if field not in ("imdb_url", "pending_fields")
+    }
+    for fields in pending_tasks:
+        for field in fields:
+            external_data[field] = fetched_data[field]
+
+    complete_data = assemble_title_details(
+        result_data["tmdb_data"], external_data, still_pending
+    )
+    await cache_title_details(tmdb_id, media_type, complete_data)
+    logging.info(
+        f"Backfilled pending details for {get_details_cache_key(tmdb_id, media_type)}"
+    )
+    return complete_data
+
+
+async def fetch_and_cache_details_with_lock(
+    cache_key, tmdb_id, media_type, api_key, latency_budget=None
+):
+    """
+    Build the title details under a Redis lock so only one worker scrapes a title.
+    Workers that lose the lock wait for the winner to populate the cache, and fall
+    back to scraping themselves if the lock is released or expires without a result.
+    """
+    lock = redis_client.lock(f"{cache_key}_lock", timeout=LOCK_TIMEOUT)
+
+    try:
+        have_lock = await lock.acquire(blocking=False)
+    except redis.exceptions.ConnectionError as e:
+        logging.error(f"Redis connection error: {type(e).__name__}: {str(e)}.")
+        have_lock = False
+        lock = None
+
+    if have_lock:
+        cross_worker_stats["lock_acquired"] += 1
+        try:
+            return await build_and_cache_details(
+                cache_key, tmdb_id, media_type, api_key, latency_budget
+            )
+        finally:
+            try:
+                await lock.release()
+            except LockError as e:
+                logging.warning(f"Error releasing lock: {type(e).__name__}: {str(e)}.")
+
+    if lock is not None:
+        # Another worker holds the lock, wait for it to cache the result
+        waited = 0
+        while waited < LOCK_TIMEOUT:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            waited += LOCK_POLL_INTERVAL
+
+            cached_data, is_stale = await get_key_with_soft_expiry(cache_key)
+            if cached_data and not is_stale:
+                cross_worker_stats["coalesced"] += 1
+                return cached_data
+
+            if not await lock.locked():
+                break
+
+    cross_worker_stats["fallback"] += 1
+    return await build_and_cache_details(
+        cache_key, tmdb_id, media_type, api_key, latency_budget
+    )
+
+
+async def get_title_details(tmdb_id, media_type, api_key):
+    """
+    Get the title details from cache, computing them once for concurrent misses.
+    Stale entries are returned immediately and refreshed in the background.
+    """
+    cache_key = get_details_cache_key(tmdb_id, media_type)
+    with timed("cache_lookup"):
+        cached_data, is_stale = await get_key_with_soft_expiry(cache_key)
+
+    if cached_data:
+        record_access(cache_key)
+        if is_stale:
+            schedule_details_refresh(tmdb_id, media_type, api_key, cached_data)
+            logging.info("Fetched stale details from redis cache, refreshing")
+        else:
+            logging.info("Fetched from redis cache")
+        return cached_data
+
+    result_data = await details_single_flight.run(
+        cache_key,
+        fetch_and_cache_details,
+        tmdb_id,
+        media_type,
+        api_key,
+        LATENCY_BUDGET,
+    )
+    # Only titles that exist are counted, or unknown IDs would be pre-refreshed
+    record_access(cache_key)
+    return result_data
+
+
+async def iter_title_details_batch(titles, api_key):
+    """
+    Yield the details of many (tmdb_id, media_type) titles as each one resolves,
+    as (index, result) pairs with a per-title status of "ok" or "error". Cached
+    titles are read with one MGET and yielded first; misses are computed through
+    the shared details pipeline with bounded concurrency.
+    """
+    results = {}
+    cache_keys = {}
+    for index, (tmdb_id, media_type) in enumerate(titles):
+        if media_type not in MEDIA_TYPES:
+            results[index] = _batch_error(tmdb_id, media_type, "Invalid media type")
+        else:
+            cache_keys[index] = get_details_cache_key(tmdb_id, media_type)
+
+    for index, result in results.items():
+        yield index, result
+
+    unique_keys = list(dict.fromkeys(cache_keys.values()))
+    cached_entries = dict(zip(unique_keys, await get_keys(unique_keys)))
+
+    misses = {}
+    for index, cache_key in cache_keys.items():
+        tmdb_id, media_type = titles[index]
+        cached_data, is_stale = unwrap_soft_expiry(cached_entries[cache_key])
+        if cached_data:
+            record_access(cache_key)
+            if is_stale:
+                schedule_details_refresh(tmdb_id, media_type, api_key, cached_data)
+            yield index, _batch_result(tmdb_id, media_type, cached_data)
+        else:
+            misses.setdefault(cache_key, []).append(index)
+
+    if not misses:
+        return
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCH_MISSES)
+
+    async def compute(cache_key, indexes):
+        tmdb_id, media_type = titles[indexes[0]]
+        async with semaphore:
+            try:
+                result_data = await details_single_flight.run(
+                    cache_key,
+                    fetch_and_cache_details,
+                    tmdb_id,
+                    media_type,
+                    api_key,
+                    LATENCY_BUDGET,
+                )
+                return indexes, _batch_result(tmdb_id, media_type, result_data)
+            except Exception as e:
+                logging.error(
+                    f"Error fetching details for {cache_key}: {type(e).__name__}: {str(e)}."
+                )
+                return indexes, _batch_error(
+                    tmdb_id, media_type, f"{type(e).__name__}: {str(e)}"
+                )
+
+    tasks = [
+        asyncio.create_task(compute(cache_key, indexes))
+        for cache_key, indexes in misses.items()
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indexes, result = await next_done
+            for index in indexes:
+                if result["status"] == "ok":
+                    record_access(cache_keys[index])
+                yield index, result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def get_title_details_batch(titles, api_key):
+    """The details of many (tmdb_id, media_type) titles, in the order given"""
+    results = [None] * len(titles)
+    async for index, result in iter_title_details_batch(titles, api_key):
+        results[index] = result
+    return results
+
+
+def _batch_result(tmdb_id, media_type, data):
+    return {"tmdb_id": tmdb_id, "media_type": media_type, "status": "ok", "data": data}
+
+
+def _batch_error(tmdb_id, media_type, error):
+    return {
+        "tmdb_id": tmdb_id,
+        "media_type": media_type,
+        "status": "error",
+        "error": error,
+    }
+
+
+async def stream_title_details(tmdb_id, media_type, api_key):
+    """
+    Yield the title details progressively as events: the TMDB block first, then
+    one "external" event per source as it completes, then "complete". Cached and
+    in-flight titles are yielded as a single "external" event. The scrape runs as
+    the single-flight computation of the title, so concurrent requests for it
+    join the stream's scrape, and it completes into the cache even if the stream
+    is closed early.
+    """
+    if media_type not in MEDIA_TYPES:
+        raise ValueError(f"Invalid media type: {media_type}")
+
+    cache_key = get_details_cache_key(tmdb_id, media_type)
+    cached_data, is_stale = await get_key_with_soft_expiry(cache_key)
+
+    if cached_data:
+        record_access(cache_key)
+        if is_stale:
+            schedule_details_refresh(tmdb_id, media_type, api_key, cached_data)
+        async for event in _stream_cached_details(cached_data):
+            yield event
+        return
+
+    # Join a scrape already running for this title rather than duplicating it
+    if details_single_flight.in_flight(cache_key):
+        result_data = await details_single_flight.run(
+            cache_key, fetch_and_cache_details, tmdb_id, media_type, api_key
+        )
+        record_access(cache_key)
+        async for event in _stream_cached_details(result_data):
+            yield event
+        return
+
+    started = asyncio.get_running_loop().create_future()
+    computation = details_single_flight.start(
+        cache_key, build_and_cache_streamed_details, started, tmdb_id, media_type, api_key
+    )
+    # The TMDB details and the external data tasks, once the scrape has started them
+    await asyncio.wait((started, computation), return_when=asyncio.FIRST_COMPLETED)
+    if not started.done():
+        computation.result()  # Raises the error that stopped the scrape
+    tmdb_data, tasks = started.result()
+    record_access(cache_key)
+
+    yield {"event": "tmdb", "data": tmdb_data}
+    yield {"event": "external", "data": {"imdb_url": get_imdb_url(tmdb_data)}}
+
+    pending_tasks = dict(tasks)
+    while pending_tasks:
+        await asyncio.wait(pending_tasks.values(), return_when=asyncio.FIRST_COMPLETED)
+        for fields, task in list(pending_tasks.items()):
+            if task.done():
+                del pending_tasks[fields]
+                yield {"event": "external", "data": get_task_fields(fields, task)}
+
+    # Complete once the details are cached
+    await asyncio.shield(computation)
+    logging.info("Streamed from external_data.py")
+    yield {"event": "complete", "data": None}
+
+
+async def build_and_cache_streamed_details(started, tmdb_id, media_type, api_key):
+    """
+    Build and cache the complete title details for a stream, handing the TMDB
+    details and the external data tasks to it through the started future.
+    """
+    tmdb_data = await fetch_title_details(tmdb_id, media_type, api_key)
+    tasks = await start_external_data_tasks(tmdb_id, tmdb_data, media_type)
+    started.set_result((tmdb_data, tasks))
+
+    external_data, pending_fields = await collect_external_data(tasks)
+    result_data = assemble_title_details(tmdb_data, external_data, pending_fields)
+    await cache_title_details(tmdb_id, media_type, result_data)
+    return result_data
+
+
+async def _stream_cached_details(details):
+    yield {"event": "tmdb", "data": details["tmdb_data"]}
+    yield {"event": "external", "data": details["external_data"]}
+    yield {"event": "complete", "data": None}
+
+
+def schedule_details_refresh(tmdb_id, media_type, api_key, cached_data=None):
+    """Refresh a details entry in the background, once per key at a time"""
+    cache_key = get_details_cache_key(tmdb_id, media_type)
+
+    # A miss for this key is already scraping, the refresh would duplicate it
+    if details_single_flight.in_flight(cache_key):
+        return False
+
+    # Refreshes yield to user requests in the per-host rate limits
+    with rate_limiter.background_priority():
+        return details_refresher.schedule(
+            cache_key, refresh_details, tmdb_id, media_type, api_key, cached_data
+        )
+
+
+async def refresh_details(tmdb_id, media_type, api_key, cached_data=None):
+    """
+    Rebuild a details entry, sending conditional requests for the pages whose
+    values are in the current entry (read from the cache unless given)
+    """
+    cache_key = get_details_cache_key(tmdb_id, media_type)
+    if cached_data is None:
+        cached_data, _ = await get_key_with_soft_expiry(cache_key)
+
+    with revalidating(cached_data):
+        return await details_single_flight.run(
+            cache_key, fetch_and_cache_details, tmdb_id, media_type, api_key
+        )
+
+
+async def prerefresh_popular_details(api_key):
+    """
+    Refresh the most read entries that are missing or reach their soft expiry
+    within PREREFRESH_WINDOW, most popular first, so that they are never served
+    stale or missed. Refreshes scheduled by every worker share an hourly budget.
+    """
+    prerefresh_stats["runs"] += 1
+    cache_keys = await get_popular_keys(PREREFRESH_TOP_TITLES)
+    if not cache_keys:
+        return 0
+
+    due_keys = await select_expiring_keys(cache_keys, PREREFRESH_WINDOW)
+    prerefresh_stats["due"] += len(due_keys)
+    if not due_keys:
+        return 0
+
+    budget_key = f"prerefresh_budget_{int(time.time() // 3600)}"
+    used = int(await redis_client.get(budget_key) or 0)
+    allowed_keys = due_keys[: max(0, PREREFRESH_BUDGET_PER_HOUR - used)]
+    prerefresh_stats["over_budget"] += len(due_keys) - len(allowed_keys)
+
+    scheduled = 0
+    for cache_key in allowed_keys:
+        tmdb_id, media_type = parse_details_cache_key(cache_key)
+        if schedule_details_refresh(tmdb_id, media_type, api_key):
+            scheduled += 1
+
+    if scheduled:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.incrby(budget_key, scheduled)
+            pipe.expire(budget_key, 2 * 60 * 60)
+            await pipe.execute()
+    prerefresh_stats["scheduled"] += scheduled
+    logging.info(
+        f"Pre-refresh: {len(due_keys)} of {len(cache_keys)} popular entries due, "
+        f"{scheduled} refreshes scheduled"
+    )
+    return scheduled
+
+
+def parse_details_cache_key(cache_key):
+    tmdb_id, media_type = cache_key[len("details_") :].rsplit("_", 1)
+    return tmdb_id, media_type
+
+
+def get_coalescing_stats():
+    """Counters of originating vs. coalesced details computations"""
+    return {
+        **details_single_flight.stats(),
+        "cross_worker": dict(cross_worker_stats),
+    }
+
+
+def get_refresh_stats():
+    """Counters of the background refreshes of stale details"""
+    return details_refresher.stats()
+
+
+def get_prerefresh_stats():
+    """Counters of the pre-refreshes of popular entries"""
+    return dict(prerefresh_stats)
+
+
+def get_backfill_stats():
+    """Counters of the background completions of partial details"""
+    return details_backfiller.stats()
@@ -0,0 +1,95 @@
+"""
+This module serves director filmographies from the Redis cache, calling the TMDB
+movie_credits API only on a miss. A filmography is cached for longer when the
+director has released nothing recently, and can be enriched with the ratings
+already cached for its titles, read in one MGET.
+"""
+import logging
+from datetime import datetime
+
+from environs import Env
+from app.redis_client import get_key, get_keys, set_key, unwrap_soft_expiry
+from app.tmdb_api import fetch_director_movies
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+DIRECTOR_CACHE_SECONDS = env.int("DIRECTOR_CACHE_SECONDS", 24 * 60 * 60)
+DIRECTOR_INACTIVE_CACHE_SECONDS = env.int(
+    "DIRECTOR_INACTIVE_CACHE_SECONDS", 30 * 24 * 60 * 60
+)
+# Directors with no release in this many years get the inactive TTL
+DIRECTOR_INACTIVE_YEARS = env.int("DIRECTOR_INACTIVE_YEARS", 3)
+RATING_FIELDS = ("imdb_rating", "metascore", "rottentomatoes_scores", "letterboxd_rating")
+
+director_stats = {"requests": 0, "cache_hits": 0, "upstream_calls": 0, "ratings_hits": 0}
+
+
+def get_director_cache_key(director_id):
+    return f"director_{director_id}"
+
+
+def determine_director_cache_duration(movies):
+    """A longer TTL for filmographies whose newest release is several years old"""
+    latest_year = max((int(movie["year"]) for movie in movies), default=None)
+    if latest_year is None:
+        return DIRECTOR_CACHE_SECONDS
+    if datetime.now().year - latest_year >= DIRECTOR_INACTIVE_YEARS:
+        return DIRECTOR_INACTIVE_CACHE_SECONDS
+    return DIRECTOR_CACHE_SECONDS
+
+
+async def get_director_movies(director_id, api_key, with_ratings=False):
+    """A director's movies, newest first, optionally with their cached ratings"""
+    director_stats["requests"] += 1
+    cache_key = get_director_cache_key(director_id)
+    movies = await get_key(cache_key)
+
+    if movies is not None:
+        director_stats["cache_hits"] += 1
+    else:
+        director_stats["upstream_calls"] += 1
+        movies = await fetch_director_movies(director_id, api_key)
+        try:
+            await set_key(
+                cache_key, movies, ex=determine_director_cache_duration(movies)
+            )
+        except Exception as e:
+            logging.error(
+                f"Error caching director's movies: {type(e).__name__}: {str(e)}."
+            )
+
+    if with_ratings:
+        return await add_cached_ratings(movies)
+    return movies
+
+
+async def add_cached_ratings(movies):
+    """
+    Add the ratings of each movie whose details are cached, read in one MGET.
+    Movies without cached details get "ratings": None; nothing is scraped.
+    """
+    if not movies:
+        return movies
+
+    cached_details = await get_keys(
+        [f"details_{movie['tmdb_id']}_{movie['media_type']}" for movie in movies]
+    )
+
+    enriched_movies = []
+    for movie, details in zip(movies, cached_details):
+        ratings = None
+        if details is not None:
+            details, _ = unwrap_soft_expiry(details)
+            external_data = details.get("external_data") or {}
+            ratings = {field: external_data.get(field) for field in RATING_FIELDS}
+            director_stats["ratings_hits"] += 1
+        enriched_movies.append({**movie, "ratings": ratings})
+    return enriched_movies
+
+
+def get_director_stats():
+    """Counters of director requests, cache hits and cached ratings found"""
+    return dict(director_stats)
@@ -1,4 +1,5 @@
 import asyncio
+import logging
 
 from app.data_collection import (
     get_imdb_rating,
@@ -11,93 +12,190 @@ from app.data_collection import (
     get_box_office_amounts,
     get_justwatch_page,
 )
+from app.external_ids import get_external_ids, save_external_ids
+from app.metrics import record_error
+
+EXTERNAL_DATA_FIELDS = (
+    "imdb_rating",
+    "metascore",
+    "rottentomatoes_url",
+    "rottentomatoes_scores",
+    "letterboxd_url",
+    "letterboxd_rating",
+    "commonsense_info",
+    "boxofficemojo_url",
+    "box_office_amounts",
+    "justwatch_page",
+)
 
 
 async def get_movie_data(
-    imdb_id: str, title: str, year: str, media_type: str, justwatch_url: str
+    imdb_id: str,
+    title: str,
+    year: str,
+    media_type: str,
+    justwatch_url: str,
+    tmdb_id: str = None,
 ) -> dict:
-    """Execute asynchronous tasks specifically for movies."""
-    # Initialize tasks
-    boxofficemojo_url = asyncio.create_task(get_boxofficemojo_url(imdb_id))
-    rottentomatoes_url = asyncio.create_task(
-        get_rottentomatoes_url(title, year, media_type)
+    """
+    Execute asynchronous tasks specifically for movies.
+    With a tmdb_id, pages already in the external ID index are not searched for.
+    """
+    external_ids = await get_external_ids(tmdb_id, media_type, imdb_id) if tmdb_id else {}
+    tasks = start_movie_tasks(
+        imdb_id, title, year, media_type, justwatch_url, external_ids
     )
-    letterboxd_url = asyncio.create_task(get_letterboxd_url(title, year))
-    justwatch_page = asyncio.create_task(get_justwatch_page(justwatch_url))
-    box_office_amounts = asyncio.create_task(get_box_office_amounts(imdb_id))
-    imdb_rating = asyncio.create_task(get_imdb_rating(imdb_id))
-    commonsense_info = asyncio.create_task(
-        get_commonsense_info(title, year, media_type)
+    external_data, _ = await collect_external_data(tasks)
+    if tmdb_id:
+        await save_external_ids(tmdb_id, media_type, imdb_id, external_data, external_ids)
+    return external_data
+
+
+async def get_tv_show_data(
+    imdb_id: str,
+    title: str,
+    year: str,
+    media_type: str,
+    justwatch_url: str,
+    tmdb_id: str = None,
+) -> dict:
+    """
+    Execute asynchronous tasks specifically for TV shows.
+    With a tmdb_id, pages already in the external ID index are not searched for.
+    """
+    external_ids = await get_external_ids(tmdb_id, media_type, imdb_id) if tmdb_id else {}
+    tasks = start_tv_show_tasks(
+        imdb_id, title, year, media_type, justwatch_url, external_ids
     )
+    external_data, _ = await collect_external_data(tasks)
+    if tmdb_id:
+        await save_external_ids(tmdb_id, media_type, imdb_id, external_data, external_ids)
+    return external_data
+
 
-    # Fetch scores immediately after URL is fetched
-    rottentomatoes_url = await rottentomatoes_url
-    rottentomatoes_scores = asyncio.create_task(
-        get_rottentomatoes_scores(rottentomatoes_url)
+def start_movie_tasks(
+    imdb_id, title, year, media_type, justwatch_url, external_ids=None
+):
+    """
+    Start the external data tasks for a movie, keyed by the fields each one fills.
+    Pages found in external_ids are used as they are instead of being searched for.
+    """
+    external_ids = external_ids or {}
+    rottentomatoes_url = _resolve(
+        external_ids, "rottentomatoes_url", get_rottentomatoes_url, title, year, media_type
     )
+    letterboxd_url = _resolve(
+        external_ids, "letterboxd_url", get_letterboxd_url, title, year
+    )
+
+    tasks = {
+        ("imdb_rating", "metascore"): _imdb_fields(imdb_id),
+        ("rottentomatoes_url",): rottentomatoes_url,
+        # Scores are fetched as soon as their URL is known
+        ("rottentomatoes_scores",): _then(rottentomatoes_url, get_rottentomatoes_scores),
+        ("letterboxd_url",): letterboxd_url,
+        ("letterboxd_rating",): _then(letterboxd_url, get_letterboxd_rating),
+        # The age rating changes, so it is scraped again even when the page is known
+        ("commonsense_info",): get_commonsense_info(
+            title, year, media_type, external_ids.get("commonsense_url")
+        ),
+        ("boxofficemojo_url",): get_boxofficemojo_url(imdb_id),
+        ("box_office_amounts",): get_box_office_amounts(imdb_id),
+    }
+    if justwatch_url:
+        tasks[("justwatch_page",)] = get_justwatch_page(justwatch_url)
+
+    return _as_tasks(tasks)
+
+
+def start_tv_show_tasks(
+    imdb_id, title, year, media_type, justwatch_url, external_ids=None
+):
+    """
+    Start the external data tasks for a TV show, keyed by the fields each one fills.
+    Pages found in external_ids are used as they are instead of being searched for.
+    """
+    external_ids = external_ids or {}
+    rottentomatoes_url = _resolve(
+        external_ids, "rottentomatoes_url", get_rottentomatoes_url, title, year, media_type
+    )
+
+    tasks = {
+        ("imdb_rating", "metascore"): _imdb_fields(imdb_id),
+        ("rottentomatoes_url",): rottentomatoes_url,
+        ("rottentomatoes_scores",): _then(rottentomatoes_url, get_rottentomatoes_scores),
+        ("commonsense_info",): get_commonsense_info(
+            title, year, media_type, external_ids.get("commonsense_url")
+        ),
+    }
+    if justwatch_url:
+        tasks[("justwatch_page",)] = get_justwatch_page(justwatch_url)
+
+    return _as_tasks(tasks)
 
-    # Fetch rating immediately after URL is fetched
-    letterboxd_url = await letterboxd_url
-    letterboxd_rating = asyncio.create_task(get_letterboxd_rating(letterboxd_url))
 
-    # Await tasks
-    imdb_data = await imdb_rating
-    boxofficemojo_url = await boxofficemojo_url
-    box_office_amounts = await box_office_amounts
-    commonsense_info = await commonsense_info
-    justwatch_page = await justwatch_page if justwatch_url else None
-    rottentomatoes_scores = await rottentomatoes_scores
-    letterboxd_rating = await letterboxd_rating
+async def collect_external_data(tasks, timeout=None):
+    """
+    Wait for the external data tasks, for at most timeout seconds when given.
+    Returns the external data and the fields whose tasks are still running;
+    those fields are None and their tasks are left running.
+    """
+    done = set()
+    if tasks:
+        done, _ = await asyncio.wait(tasks.values(), timeout=timeout)
 
+    external_data = dict.fromkeys(EXTERNAL_DATA_FIELDS)
+    pending_fields = []
+    for fields, task in tasks.items():
+        if task in done:
+            external_data.update(get_task_fields(fields, task))
+        else:
+            pending_fields.extend(fields)
+
+    return external_data, pending_fields
+
+
+def get_task_fields(fields, task):
+    """The field values of a finished external data task, None when it failed"""
+    if task.exception() is not None:
+        e = task.exception()
+        record_error("external_data", e)
+        logging.error(
+            f"Error fetching {', '.join(fields)}: {type(e).__name__}: {str(e)}."
+        )
+        return dict.fromkeys(fields)
+
+    result = task.result()
+    if len(fields) == 1:
+        return {fields[0]: result}
+    return result or dict.fromkeys(fields)
+
+
+async def _imdb_fields(imdb_id):
+    imdb_data = await get_imdb_rating(imdb_id)
     return {
         "imdb_rating": imdb_data["imdb_rating"] if imdb_data else None,
         "metascore": imdb_data["metascore"] if imdb_data else None,
-        "rottentomatoes_url": rottentomatoes_url,
-        "rottentomatoes_scores": rottentomatoes_scores,
-        "letterboxd_url": letterboxd_url,
-        "letterboxd_rating": letterboxd_rating,
-        "commonsense_info": commonsense_info,
-        "boxofficemojo_url": boxofficemojo_url,
-        "box_office_amounts": box_office_amounts,
-        "justwatch_page": justwatch_page,
     }
 
 
-async def get_tv_show_data(
-    imdb_id: str, title: str, year: str, media_type: str, justwatch_url: str
-) -> dict:
-    """Execute asynchronous tasks specifically for TV shows."""
-    # Initialize async tasks
-    justwatch_page = asyncio.create_task(get_justwatch_page(justwatch_url))
-    rottentomatoes_url = asyncio.create_task(
-        get_rottentomatoes_url(title, year, media_type)
-    )
-    imdb_rating = asyncio.create_task(get_imdb_rating(imdb_id))
-    commonsense_info = asyncio.create_task(
-        get_commonsense_info(title, year, media_type)
-    )
+def _resolve(external_ids, field, fetch, *args):
+    """A task for a page, from the external ID index when known, else fetched"""
+    if external_ids.get(field):
+        return asyncio.create_task(_known(external_ids[field]))
+    return asyncio.create_task(fetch(*args))
 
-    # Fetch scores immediately after URL is fetched
-    rottentomatoes_url = await rottentomatoes_url
-    rottentomatoes_scores = asyncio.create_task(
-        get_rottentomatoes_scores(rottentomatoes_url)
-    )
 
-    # Await tasks
-    imdb_data = await imdb_rating
-    commonsense_info = await commonsense_info
-    justwatch_page = await justwatch_page if justwatch_url else None
-    rottentomatoes_scores = await rottentomatoes_scores
+async def _known(value):
+    return value
+
 
+async def _then(task, fetch):
+    return await fetch(await task)
+
+
+def _as_tasks(tasks):
     return {
-        "imdb_rating": imdb_data["imdb_rating"] if imdb_data else None,
-        "metascore": imdb_data["metascore"] if imdb_data else None,
-        "rottentomatoes_url": rottentomatoes_url,
-        "rottentomatoes_scores": rottentomatoes_scores,
-        "commonsense_info": commonsense_info,
-        "justwatch_page": justwatch_page,
-        "letterboxd_url": None,
-        "letterboxd_rating": None,
-        "boxofficemojo_url": None,
-        "box_office_amounts": None,
+        fields: task if isinstance(task, asyncio.Task) else asyncio.create_task(task)
+        for fields, task in tasks.items()
     }
@@ -0,0 +1,193 @@
+"""
+This module keeps a durable index of the external pages resolved for each title
+(its Rotten Tomatoes, Letterboxd and Common Sense Media URLs), so that the Rotten
+Tomatoes and Letterboxd search pages are only scraped the first time a title is
+assembled. Entries are keyed by (media_type, tmdb_id), with an IMDb ID alias, and
+kept far longer than the ratings, which are scraped on every refresh: Common
+Sense Media ratings and JustWatch pages are never stored in the index.
+
+Bulk export and import, as JSON lines:
+    python -m app.external_ids export external_ids.jsonl
+    python -m app.external_ids import external_ids.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from environs import Env
+from app.redis_client import close_redis, get_keys, redis_client, set_keys
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+EXTERNAL_IDS_CACHE_SECONDS = env.int("EXTERNAL_IDS_CACHE_SECONDS", 365 * 24 * 60 * 60)
+EXTERNAL_ID_FIELDS = (
+    "rottentomatoes_url",
+    "letterboxd_url",
+    "commonsense_url",
+)
+BATCH_SIZE = 500
+
+external_ids_stats = {"lookups": 0, "hits": 0, "saved": 0, "imported": 0}
+
+
+def get_external_ids_key(tmdb_id, media_type):
+    return f"external_ids_{media_type}_{tmdb_id}"
+
+
+def get_imdb_alias_key(imdb_id):
+    return f"external_ids_imdb_{imdb_id}"
+
+
+async def get_external_ids(tmdb_id, media_type, imdb_id=None):
+    """The resolved external pages of a title, or an empty dict if none are known"""
+    external_ids_stats["lookups"] += 1
+    keys = [get_external_ids_key(tmdb_id, media_type)]
+    if imdb_id:
+        keys.append(get_imdb_alias_key(imdb_id))
+
+    try:
+        entries = await get_keys(keys)
+    except Exception as e:
+        logging.error(f"Error reading external IDs: {type(e).__name__}: {str(e)}.")
+        return {}
+
+    for entry in entries:
+        if entry:
+            external_ids_stats["hits"] += 1
+            return get_stored_ids(entry)
+    return {}
+
+
+def get_stored_ids(entry):
+    """
+    The indexed fields of an entry. Entries written before only the Common Sense
+    Media URL was indexed kept it in commonsense_info, with the rating.
+    """
+    stored_ids = {field: entry.get(field) for field in EXTERNAL_ID_FIELDS}
+    commonsense_info = entry.get("commonsense_info")
+    if not stored_ids["commonsense_url"] and isinstance(commonsense_info, dict):
+        stored_ids["commonsense_url"] = commonsense_info.get("url")
+    return stored_ids
+
+
+def get_resolved_ids(external_data):
+    """The stable page URLs of a title's external data, without its ratings"""
+    commonsense_info = external_data.get("commonsense_info") or {}
+    return {
+        "rottentomatoes_url": external_data.get("rottentomatoes_url"),
+        "letterboxd_url": external_data.get("letterboxd_url"),
+        "commonsense_url": commonsense_info.get("url"),
+    }
+
+
+async def save_external_ids(tmdb_id, media_type, imdb_id, external_data, known=None):
+    """Add the external pages resolved in external_data to the index, if any are new"""
+    resolved = {
+        field: value for field, value in get_resolved_ids(external_data).items() if value
+    }
+    if known is None:
+        known = await get_external_ids(tmdb_id, media_type, imdb_id)
+    known = {field: value for field, value in known.items() if value}
+    merged = {**known, **resolved}
+    if merged == known:
+        return False
+
+    entry = {"tmdb_id": tmdb_id, "media_type": media_type, "imdb_id": imdb_id, **merged}
+    try:
+        await set_keys(_entry_items(entry), EXTERNAL_IDS_CACHE_SECONDS)
+    except Exception as e:
+        logging.error(f"Error saving external IDs: {type(e).__name__}: {str(e)}.")
+        return False
+
+    external_ids_stats["saved"] += 1
+    return True
+
+
+async def export_external_ids():
+    """Yield every entry of the index (IMDb aliases excluded)"""
+    for media_type in ("movie", "tv"):
+        keys = []
+        async for key in redis_client.scan_iter(
+            match=f"external_ids_{media_type}_*", count=BATCH_SIZE
+        ):
+            keys.append(key.decode("utf-8") if isinstance(key, bytes) else key)
+            if len(keys) >= BATCH_SIZE:
+                for entry in await get_keys(keys):
+                    if entry:
+                        yield entry
+                keys = []
+        if keys:
+            for entry in await get_keys(keys):
+                if entry:
+                    yield entry
+
+
+async def import_external_ids(entries):
+    """Write entries to the index in pipelined batches, returning how many were written"""
+    imported = 0
+    items = []
+    for entry in entries:
+        if not entry.get("tmdb_id") or entry.get("media_type") not in ("movie", "tv"):
+            logging.warning(f"Skipping external IDs entry without a title: {entry}")
+            continue
+        entry = {
+            "tmdb_id": entry["tmdb_id"],
+            "media_type": entry["media_type"],
+            "imdb_id": entry.get("imdb_id"),
+            **get_stored_ids(entry),
+        }
+        items.extend(_entry_items(entry))
+        imported += 1
+        if len(items) >= BATCH_SIZE:
+            await set_keys(items, EXTERNAL_IDS_CACHE_SECONDS)
+            items = []
+
+    await set_keys(items, EXTERNAL_IDS_CACHE_SECONDS)
+    external_ids_stats["imported"] += imported
+    return imported
+
+
+def _entry_items(entry):
+    items = [(get_external_ids_key(entry["tmdb_id"], entry["media_type"]), entry)]
+    if entry["imdb_id"]:
+        items.append((get_imdb_alias_key(entry["imdb_id"]), entry))
+    return items
+
+
+def get_external_ids_stats():
+    """Counters of index lookups, hits and writes"""
+    return dict(external_ids_stats)
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import the external ID index")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", nargs="?", help="JSON lines file, stdin/stdout if omitted")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "export":
+            output = open(args.path, "w") if args.path else sys.stdout
+            count = 0
+            async for entry in export_external_ids():
+                output.write(json.dumps(entry) + "\n")
+                count += 1
+            if args.path:
+                output.close()
+            print(f"Exported {count} titles", file=sys.stderr)
+        else:
+            source = open(args.path) if args.path else sys.stdin
+            entries = (json.loads(line) for line in source if line.strip())
+            count = await import_external_ids(entries)
+            print(f"Imported {count} titles", file=sys.stderr)
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
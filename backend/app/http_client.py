@@ -0,0 +1,98 @@
+"""
+This module manages the long-lived HTTP clients used to talk to external sources.
+Each source gets its own httpx.AsyncClient with a keep-alive connection pool, so
+repeated page fetches to the same host reuse connections instead of paying a new
+TCP+TLS handshake per request. Clients are created at app startup and closed at
+shutdown, and lazily created if used outside the app lifespan (e.g. scripts).
+"""
+import httpx
+import importlib.util
+import logging
+
+from environs import Env
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+DEFAULT_SOURCE = "default"
+
+# HTTP/2 needs the optional h2 package (httpx[http2]); without it, clients use HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Pool sizes and timeouts per source, overridable with environment variables
+# such as IMDB_MAX_CONNECTIONS, IMDB_MAX_KEEPALIVE, IMDB_TIMEOUT or TMDB_HTTP2
+SOURCE_SETTINGS = {
+    "rottentomatoes": {"max_connections": 10, "max_keepalive": 5, "timeout": 15},
+    "letterboxd": {"max_connections": 10, "max_keepalive": 5, "timeout": 15},
+    "commonsensemedia": {"max_connections": 5, "max_keepalive": 3, "timeout": 15},
+    "imdb": {"max_connections": 10, "max_keepalive": 5, "timeout": 15},
+    "boxofficemojo": {"max_connections": 5, "max_keepalive": 3, "timeout": 15},
+    "justwatch": {"max_connections": 5, "max_keepalive": 3, "timeout": 15},
+    "tmdb": {"max_connections": 20, "max_keepalive": 10, "timeout": 10, "http2": True},
+    DEFAULT_SOURCE: {"max_connections": 10, "max_keepalive": 5, "timeout": 15},
+}
+
+KEEPALIVE_EXPIRY = 30  # seconds an idle connection is kept in the pool
+
+_clients = {}
+
+
+def get_source_settings(source):
+    """Get the pool and timeout settings for a source, applying env overrides"""
+    defaults = SOURCE_SETTINGS.get(source, SOURCE_SETTINGS[DEFAULT_SOURCE])
+    prefix = source.upper()
+    return {
+        "max_connections": env.int(
+            f"{prefix}_MAX_CONNECTIONS", defaults["max_connections"]
+        ),
+        "max_keepalive": env.int(f"{prefix}_MAX_KEEPALIVE", defaults["max_keepalive"]),
+        "timeout": env.float(f"{prefix}_TIMEOUT", defaults["timeout"]),
+        "http2": env.bool(f"{prefix}_HTTP2", defaults.get("http2", False))
+        and HTTP2_AVAILABLE,
+    }
+
+
+def create_client(source):
+    """Create a pooled AsyncClient configured for the given source"""
+    settings = get_source_settings(source)
+    return httpx.AsyncClient(
+        timeout=settings["timeout"],
+        http2=settings["http2"],
+        limits=httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive"],
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        follow_redirects=True,
+    )
+
+
+def get_client(source=DEFAULT_SOURCE):
+    """Get the shared client for a source, creating it on first use"""
+    client = _clients.get(source)
+    if client is None or client.is_closed:
+        client = create_client(source)
+        _clients[source] = client
+    return client
+
+
+async def start_http_clients():
+    """Create the clients for every configured source at app startup"""
+    for source in SOURCE_SETTINGS:
+        get_client(source)
+    logger.info(f"Started HTTP clients for {len(_clients)} sources")
+
+
+async def close_http_clients():
+    """Close every client and its connection pool at app shutdown"""
+    for source, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.error(
+                f"Error closing HTTP client for {source}: {type(e).__name__}: {str(e)}."
+            )
+    _clients.clear()
+    logger.info("Closed HTTP clients")
@@ -1,19 +1,64 @@
+import asyncio
+import json
 import logging
-import redis
+import redis.exceptions
+import time
 import traceback
+from functools import partial
 
 from environs import Env
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, field_validator
+from app.access_tracker import (
+    ACCESS_TRACKING_ENABLED,
+    get_access_stats,
+    run_access_flusher,
+)
 from app.cache_manager import start_scheduler, update_trending_movies_cache
-from app.external_data import get_movie_data, get_tv_show_data
-from app.redis_client import set_key, get_key
-from app.tmdb_api import (
-    fetch_title_details,
-    search_title,
-    fetch_trending_movies,
-    fetch_director_movies,
+from app.circuit_breakers import get_circuit_breaker_stats
+from app.data_collection import get_fetch_stats
+from app.director_manager import get_director_movies, get_director_stats
+from app.details_manager import (
+    MAX_BATCH_SIZE,
+    MEDIA_TYPES,
+    get_title_details_batch,
+    iter_title_details_batch,
+    get_title_details,
+    stream_title_details,
+    get_coalescing_stats,
+    get_refresh_stats,
+    get_backfill_stats,
+    get_prerefresh_stats,
+)
+from app.external_ids import get_external_ids_stats
+from app.http_client import start_http_clients, close_http_clients
+from app.metrics import (
+    record_error,
+    render_metrics,
+    request_latency,
+    set_warmup_queue_sizes,
+)
+from app.rate_limiter import get_rate_limit_stats
+from app.revalidation import get_revalidation_stats
+from app.tmdb_client import get_tmdb_client_stats
+from app.utils.server_timing_utils import recording_server_timing
+from app.search_manager import get_search_stats, index_trending_titles, search_titles
+from app.redis_client import (
+    LOCAL_CACHE_ENABLED,
+    set_key,
+    get_key,
+    close_redis,
+    get_local_cache_stats,
+    listen_for_invalidations,
+)
+from app.tmdb_api import fetch_trending_movies, warm_up_title
+from app.warmup_queue import (
+    WARMUP_CONSUMER_ENABLED,
+    WARMUP_QUEUE_ENABLED,
+    get_warmup_progress,
+    run_consumer,
 )
 
 # Set up logging
@@ -31,6 +76,10 @@ env.read_env()
 
 TMDB_API_KEY = env.str("TMDB_API_KEY")
 REFRESH_API_KEY = env.str("REFRESH_API_KEY")
+# Per-stage durations of /api/details in a Server-Timing header, and in the body
+# when requested with ?timing=true and SERVER_TIMING_DEBUG is set
+SERVER_TIMING_ENABLED = env.bool("SERVER_TIMING_ENABLED", True)
+SERVER_TIMING_DEBUG = env.bool("SERVER_TIMING_DEBUG", False)
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -48,8 +97,35 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def observe_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template so path parameters do not multiply the series
+    route = request.scope.get("route")
+    request_latency.labels(
+        request.method, route.path if route else "unmatched", response.status_code
+    ).observe(time.perf_counter() - started)
+    return response
+
+
 @app.on_event("startup")
 async def startup_event():
+    await start_http_clients()
+    app.state.invalidation_listener = (
+        asyncio.create_task(listen_for_invalidations()) if LOCAL_CACHE_ENABLED else None
+    )
+    app.state.access_flusher = (
+        asyncio.create_task(run_access_flusher()) if ACCESS_TRACKING_ENABLED else None
+    )
+    # Every worker consumes trending warm-up jobs, unless a dedicated process does
+    app.state.warmup_consumer = (
+        asyncio.create_task(
+            run_consumer(partial(warm_up_title, api_key=TMDB_API_KEY))
+        )
+        if WARMUP_QUEUE_ENABLED and WARMUP_CONSUMER_ENABLED
+        else None
+    )
     scheduler = start_scheduler()
     app.state.scheduler = scheduler
     # Uncomment below to run the cache update immediately on startup
@@ -57,23 +133,34 @@ async def startup_event():
 
 
 @app.on_event("shutdown")
-def shutdown_event():
+async def shutdown_event():
     app.state.scheduler.shutdown()
+    if app.state.invalidation_listener:
+        app.state.invalidation_listener.cancel()
+    if app.state.warmup_consumer:
+        app.state.warmup_consumer.cancel()
+    if app.state.access_flusher:
+        app.state.access_flusher.cancel()
+    await close_http_clients()
+    await close_redis()
 
 
 @app.get("/api/trending")
 async def trending_movies() -> dict:
     try:
         # Try to get cached movies first
-        cached_movies = get_key("trending_movies")
+        cached_movies = await get_key("trending_movies")
         if cached_movies:
+            # Trending titles seed the local search prefix index, once per list
+            index_trending_titles(cached_movies)
             return {"results": cached_movies}
 
         # If not in cache, fetch from TMDB API
         movies = await fetch_trending_movies(TMDB_API_KEY)
+        index_trending_titles(movies)
 
         # Cache the fetched movies
-        set_key("trending_movies", movies)
+        await set_key("trending_movies", movies)
 
         return {"results": movies}
     except redis.exceptions.ConnectionError:
@@ -81,6 +168,7 @@ async def trending_movies() -> dict:
         movies = await fetch_trending_movies(TMDB_API_KEY)
         return {"results": movies}
     except Exception as e:
+        record_error("api", e)
         logging.error(f"Search error: {type(e).__name__}: {str(e)}.")
         raise HTTPException(status_code=500, detail="Error fetching movies")
 
@@ -92,9 +180,11 @@ async def refresh_trending_movies(api_key: str) -> dict:
         raise HTTPException(status_code=403, detail="Invalid API Key")
     try:
         movies = await fetch_trending_movies(TMDB_API_KEY)
-        set_key("trending_movies", movies)
+        await set_key("trending_movies", movies)
+        index_trending_titles(movies)
         return {"message": "Trending movies cache refreshed"}
     except Exception as e:
+        record_error("api", e)
         logging.error(
             f"Error refreshing trending movies cache: {type(e).__name__}: {str(e)}."
         )
@@ -103,80 +193,123 @@ async def refresh_trending_movies(api_key: str) -> dict:
         )
 
 
+@app.get("/api/stats/{api_key}")
+async def cache_stats(api_key: str) -> dict:
+    if api_key != REFRESH_API_KEY:
+        raise HTTPException(status_code=403, detail="Invalid API Key")
+    return {
+        "local_cache": get_local_cache_stats(),
+        "details_coalescing": get_coalescing_stats(),
+        "details_refresh": get_refresh_stats(),
+        "details_backfill": get_backfill_stats(),
+        "details_prerefresh": get_prerefresh_stats(),
+        "access": get_access_stats(),
+        "fetch": get_fetch_stats(),
+        "rate_limits": get_rate_limit_stats(),
+        "tmdb": get_tmdb_client_stats(),
+        "circuit_breakers": get_circuit_breaker_stats(),
+        "search": get_search_stats(),
+        "director": get_director_stats(),
+        "external_ids": get_external_ids_stats(),
+        "revalidation": get_revalidation_stats(),
+        "warmup": await get_warmup_progress(),
+    }
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    # Queue sizes live in Redis, so they are read when scraped
+    set_warmup_queue_sizes(await get_warmup_progress())
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
 @app.get("/api/search")
 async def search(query: str) -> dict:
     try:
-        search_results = await search_title(query, TMDB_API_KEY)
+        search_results = await search_titles(query, TMDB_API_KEY)
         return {"results": search_results}
     except Exception as e:
+        record_error("api", e)
         logging.error(f"Search error: {type(e).__name__}: {str(e)}.")
         raise HTTPException(status_code=500, detail="Error performing search")
 
 
 @app.get("/api/director/{director_id}")
-async def director_movies(director_id: str) -> dict:
+async def director_movies(director_id: str, ratings: bool = False) -> dict:
     try:
-        movies = await fetch_director_movies(director_id, TMDB_API_KEY)
+        # Cached filmography, with the ratings of already cached titles if asked
+        movies = await get_director_movies(director_id, TMDB_API_KEY, ratings)
         return {"results": movies}
     except Exception as e:
+        record_error("api", e)
         logging.error(
             f"Error fetching director's movies: {type(e).__name__}: {str(e)}."
         )
         raise HTTPException(status_code=500, detail="Error fetching director's movies")
 
 
-@app.get("/api/details/{tmdb_id}/{media_type}")
-async def title_details(tmdb_id: str, media_type: str) -> dict:
-    cached_key = f"details_{tmdb_id}_{media_type}"
-    cached_data = get_key(cached_key)
+class BatchTitle(BaseModel):
+    tmdb_id: str
+    media_type: str
 
-    if cached_data:
-        logging.info("Fetched from redis cache")
-        return cached_data
+    # Trending, search and director results carry integer IDs
+    @field_validator("tmdb_id", mode="before")
+    @classmethod
+    def coerce_tmdb_id(cls, value):
+        return str(value) if isinstance(value, int) else value
 
-    try:
-        # Fetch title details from TMDB API
-        tmdb_data = await fetch_title_details(tmdb_id, media_type, TMDB_API_KEY)
-
-        # Only create imdb_url if imdb_id exists
-        imdb_url = (
-            f"https://www.imdb.com/title/{tmdb_data['imdb_id']}"
-            if tmdb_data["imdb_id"]
-            else None
+
+class BatchDetailsRequest(BaseModel):
+    titles: list[BatchTitle]
+    stream: bool = False
+
+
+@app.post("/api/details/batch")
+async def title_details_batch(request: BatchDetailsRequest):
+    if len(request.titles) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_SIZE} titles per batch"
         )
 
-        # Movie specific info
-        if media_type == "movie":
-            external_data = await get_movie_data(
-                tmdb_data["imdb_id"],
-                tmdb_data["title"],
-                tmdb_data["year"],
-                media_type,
-                tmdb_data["justwatch_url"],
-            )
-        # TV show specific info
-        elif media_type == "tv":
-            external_data = await get_tv_show_data(
-                tmdb_data["imdb_id"],
-                tmdb_data["title"],
-                tmdb_data["year"],
-                media_type,
-                tmdb_data["justwatch_url"],
-            )
-        else:
-            raise HTTPException(status_code=400, detail="Invalid media type")
-
-        external_data_model = {
-            "imdb_url": imdb_url,
-            **external_data,
-        }
-
-        result_data = {"tmdb_data": tmdb_data, "external_data": external_data_model}
-
-        set_key(cached_key, result_data)
-        logging.info("Fetched from external_data.py")
-        return result_data
+    titles = [(title.tmdb_id, title.media_type) for title in request.titles]
+
+    if request.stream:
+        # One NDJSON line per title as it resolves, with its index in the request
+        async def ndjson():
+            async for index, result in iter_title_details_batch(titles, TMDB_API_KEY):
+                yield json.dumps({"index": index, **result}) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    try:
+        return {"results": await get_title_details_batch(titles, TMDB_API_KEY)}
+    except Exception as e:
+        record_error("api", e)
+        logging.error(f"Error fetching batch details: {type(e).__name__}: {str(e)}.")
+        raise HTTPException(status_code=500, detail="Error fetching title details")
+
+
+@app.get("/api/details/{tmdb_id}/{media_type}")
+async def title_details(
+    tmdb_id: str, media_type: str, response: Response, timing: bool = False
+) -> dict:
+    if media_type not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid media type")
+
+    try:
+        # Served from cache, or from one shared scrape for concurrent misses
+        with recording_server_timing() as server_timing:
+            details = await get_title_details(tmdb_id, media_type, TMDB_API_KEY)
+
+        if SERVER_TIMING_ENABLED:
+            response.headers["Server-Timing"] = server_timing.header()
+        if SERVER_TIMING_DEBUG and timing:
+            # A copy, as cached details are shared with the local cache tier
+            return {**details, "server_timing": server_timing.as_dict()}
+        return details
     except Exception as e:
+        record_error("api", e)
         logging.error(f"Error fetching details: {type(e).__name__}: {str(e)}.")
         logging.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(
@@ -185,17 +318,55 @@ async def title_details(tmdb_id: str, media_type: str) -> dict:
         )
 
 
+@app.get("/api/details/{tmdb_id}/{media_type}/stream")
+async def title_details_stream(tmdb_id: str, media_type: str) -> StreamingResponse:
+    if media_type not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid media type")
+
+    events = stream_title_details(tmdb_id, media_type, TMDB_API_KEY)
+    try:
+        # The first event needs the TMDB call, so its errors still map to a 500
+        first_event = await events.__anext__()
+    except Exception as e:
+        record_error("api", e)
+        logging.error(f"Error streaming details: {type(e).__name__}: {str(e)}.")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error fetching title details: {type(e).__name__}: {str(e)}.",
+        )
+
+    async def ndjson():
+        yield json.dumps(first_event) + "\n"
+        try:
+            async for event in events:
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            record_error("api", e)
+            logging.error(f"Error streaming details: {type(e).__name__}: {str(e)}.")
+            yield json.dumps({"event": "error", "data": str(e)}) + "\n"
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 # Error handling
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     logging.error(f"An HTTP exception occurred: {exc}")
-    return {"error": str(exc), "status_code": exc.status_code}
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": str(exc), "status_code": exc.status_code},
+    )
 
 
 @app.exception_handler(Exception)
 async def internal_server_error(request: Request, exc: Exception):
     logging.error(f"An error occurred: {exc}")
-    return {"error": "Internal Server Error", "status_code": 500}
+    return JSONResponse(
+        status_code=500,
+        content={"error": "Internal Server Error", "status_code": 500},
+    )
 
 
 if __name__ == "__main__":
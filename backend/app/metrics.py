@@ -0,0 +1,160 @@
+"""
+This module defines the Prometheus metrics served at /metrics: request latency
+per endpoint, latency and in-flight count per external source and scraper, cache
+hits and misses per key family, Redis round-trip latency, warm-up progress and
+errors by exception type.
+
+Under gunicorn, every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(which must be set before the app starts) and /metrics aggregates all of them;
+gunicorn.conf.py removes the files of workers that exit.
+"""
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+PREFIX = "reelratings"
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Cache key families, matched on key prefixes; anything else is "other"
+KEY_FAMILIES = (
+    "trending_movies",
+    "details",
+    "search",
+    "director",
+    "external_ids",
+    "validators",
+)
+
+FETCH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+request_latency = Histogram(
+    f"{PREFIX}_http_request_duration_seconds",
+    "Time to the response headers of API requests",
+    ["method", "route", "status"],
+    buckets=FETCH_BUCKETS,
+)
+source_request_latency = Histogram(
+    f"{PREFIX}_source_request_duration_seconds",
+    "Duration of HTTP requests to external sources, TMDB included",
+    ["source", "outcome"],
+    buckets=FETCH_BUCKETS,
+)
+scrape_latency = Histogram(
+    f"{PREFIX}_scrape_duration_seconds",
+    "Duration of each external data function, fetch and parse",
+    ["function"],
+    buckets=FETCH_BUCKETS,
+)
+scrapes_in_flight = Gauge(
+    f"{PREFIX}_scrapes_in_flight",
+    "External data functions currently running",
+    ["function"],
+    multiprocess_mode="livesum",
+)
+cache_requests = Counter(
+    f"{PREFIX}_cache_requests",
+    "Cache reads per key family, by tier hit or miss",
+    ["family", "result"],
+)
+redis_latency = Histogram(
+    f"{PREFIX}_redis_duration_seconds",
+    "Round-trip time of Redis commands and pipelines",
+    ["command"],
+    buckets=REDIS_BUCKETS,
+)
+warmup_jobs = Counter(
+    f"{PREFIX}_warmup_jobs",
+    "Handled warm-up jobs by outcome",
+    ["outcome"],
+)
+warmup_queue_size = Gauge(
+    f"{PREFIX}_warmup_queue_size",
+    "Warm-up jobs queued, delayed for a retry, or dead-lettered",
+    ["queue"],
+    multiprocess_mode="mostrecent",
+)
+errors = Counter(
+    f"{PREFIX}_errors",
+    "Errors by component and exception type",
+    ["component", "exception"],
+)
+
+
+def get_key_family(key):
+    for family in KEY_FAMILIES:
+        if key.startswith(family):
+            return family
+    return "other"
+
+
+def record_cache_read(key, result):
+    """Count a cache read of key as a "local_hit", "hit" or "miss" """
+    cache_requests.labels(get_key_family(key), result).inc()
+
+
+def record_error(component, exc):
+    errors.labels(component, type(exc).__name__).inc()
+
+
+def record_source_request(source, duration, exc=None, outcome=None):
+    """Observe a request to a source; outcome defaults to "ok" or the exception type"""
+    outcome = outcome or ("ok" if exc is None else type(exc).__name__)
+    source_request_latency.labels(source, outcome).observe(duration)
+    if exc is not None:
+        record_error(source, exc)
+
+
+@contextmanager
+def time_redis(command):
+    """Observe the round-trip time of the enclosed Redis command"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        redis_latency.labels(command).observe(time.perf_counter() - started)
+
+
+def track_scrape(func):
+    """Time an external data coroutine function and count it while in flight"""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        in_flight = scrapes_in_flight.labels(func.__name__)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            in_flight.dec()
+            scrape_latency.labels(func.__name__).observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+def set_warmup_queue_sizes(progress):
+    for queue in ("queued", "delayed", "dead_letter"):
+        if queue in progress:
+            warmup_queue_size.labels(queue).set(progress[queue])
+
+
+def render_metrics():
+    """The metrics of every worker in the Prometheus text format, and its content type"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,113 @@
+"""
+This module rate limits outbound requests per external host with token buckets.
+Both user traffic and background work (trending warm-up, stale refreshes) share
+the same buckets, with user requests served first. Rates adapt to throttling
+responses (429/503 and Retry-After) and recover gradually on success.
+
+Buckets are kept per process: every gunicorn worker (with its warm-up consumer)
+and every dedicated warm-up worker has its own. The configured limits are for
+the whole deployment and are split evenly between RATE_LIMIT_PROCESSES
+processes, which defaults to gunicorn's WEB_CONCURRENCY.
+"""
+import contextvars
+import logging
+from contextlib import contextmanager
+
+from environs import Env
+from app.utils.rate_limit_utils import (
+    BACKGROUND_PRIORITY,
+    USER_PRIORITY,
+    TokenBucket,
+    parse_retry_after,
+)
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+RATE_LIMITING_ENABLED = env.bool("RATE_LIMITING_ENABLED", True)
+THROTTLED_STATUS_CODES = (429, 503)
+
+# Requests per second and burst size per source across all processes,
+# overridable with environment variables such as IMDB_RATE_LIMIT or IMDB_BURST
+RATE_LIMITS = {
+    "rottentomatoes": {"rate": 2, "burst": 6},
+    "letterboxd": {"rate": 2, "burst": 6},
+    "commonsensemedia": {"rate": 1, "burst": 4},
+    "imdb": {"rate": 2, "burst": 6},
+    "boxofficemojo": {"rate": 1, "burst": 4},
+    "justwatch": {"rate": 2, "burst": 6},
+    "tmdb": {"rate": 20, "burst": 40},
+    "default": {"rate": 2, "burst": 6},
+}
+
+# Processes sending requests to the sources, each limited to its share of the rates
+RATE_LIMIT_PROCESSES = max(
+    1, env.int("RATE_LIMIT_PROCESSES", env.int("WEB_CONCURRENCY", 1))
+)
+
+# Share of each bucket's burst that background requests leave for user requests
+BACKGROUND_RESERVE = 0.5
+
+request_priority = contextvars.ContextVar("request_priority", default=USER_PRIORITY)
+
+_buckets = {}
+
+
+def get_bucket(source):
+    """Get the token bucket for a source, creating it on first use"""
+    bucket = _buckets.get(source)
+    if bucket is None:
+        limits = RATE_LIMITS.get(source, RATE_LIMITS["default"])
+        prefix = source.upper()
+        rate = env.float(f"{prefix}_RATE_LIMIT", limits["rate"])
+        burst = env.int(f"{prefix}_BURST", limits["burst"])
+        rate /= RATE_LIMIT_PROCESSES
+        # A request takes a whole token, so every process can burst at least one
+        burst = max(1, burst / RATE_LIMIT_PROCESSES)
+        bucket = TokenBucket(
+            rate=rate,
+            capacity=burst,
+            max_rate=rate,
+            # Background requests must still fit in a full bucket
+            reserve=min(burst * BACKGROUND_RESERVE, burst - 1),
+        )
+        _buckets[source] = bucket
+    return bucket
+
+
+async def acquire(source):
+    """Wait for the source's rate limit, at the priority of the current context"""
+    if not RATE_LIMITING_ENABLED:
+        return
+    await get_bucket(source).acquire(request_priority.get())
+
+
+def record_response(source, response):
+    """Adapt the source's rate to the response status"""
+    bucket = get_bucket(source)
+    if response.status_code in THROTTLED_STATUS_CODES:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        bucket.on_throttled(retry_after)
+        logger.warning(
+            f"{source} throttled with {response.status_code}, "
+            f"rate lowered to {bucket.rate:.2f}/s"
+        )
+    else:
+        bucket.on_success()
+
+
+@contextmanager
+def background_priority():
+    """Run the enclosed requests (and tasks created within) at background priority"""
+    token = request_priority.set(BACKGROUND_PRIORITY)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def get_rate_limit_stats():
+    """Current rate, tokens and throttling counters per source"""
+    return {source: bucket.stats() for source, bucket in _buckets.items()}
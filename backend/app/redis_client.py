@@ -1,61 +1,135 @@
 from datetime import datetime, timedelta
-import json
+import asyncio
 import logging
-import redis
-import redis.exceptions
 import time
+import redis.asyncio as aioredis
+import redis.exceptions
 from environs import Env
+from app.metrics import record_cache_read, time_redis
+from app.utils.local_cache_utils import LocalCache, estimate_size
+from app.utils.server_timing_utils import timed
+from app.utils.serialization_utils import decode_value, encode_value
 
 logger = logging.getLogger(__name__)
 
 env = Env()
 env.read_env()
 
-QUICK_RETRY_DELAY = 0.1  # 100 milliseconds
-LONG_RETRY_DELAY = 2  # 2 seconds
+REDIS_MAX_CONNECTIONS = env.int("REDIS_MAX_CONNECTIONS", 50)
+REDIS_SOCKET_TIMEOUT = env.float("REDIS_SOCKET_TIMEOUT", 2)
+REDIS_HEALTH_CHECK_INTERVAL = 30  # seconds before an idle connection is re-checked
 
 # Cache duration
 SHORT_TERM_CACHE = timedelta(hours=23)
 MEDIUM_TERM_CACHE = timedelta(days=30)
 LONG_TERM_CACHE = timedelta(days=365)
 
+# How long an entry past its soft expiry can still be served while it is refreshed
+STALE_CACHE = timedelta(days=env.int("STALE_CACHE_DAYS", 7))
+
 # Convert cache duration to seconds for Redis
 SHORT_TERM_CACHE_SECONDS = int(SHORT_TERM_CACHE.total_seconds())
 MEDIUM_TERM_CACHE_SECONDS = int(MEDIUM_TERM_CACHE.total_seconds())
 LONG_TERM_CACHE_SECONDS = int(LONG_TERM_CACHE.total_seconds())
+STALE_CACHE_SECONDS = int(STALE_CACHE.total_seconds())
 
-redis_client = redis.from_url(env.str("REDIS_URL"), decode_responses=True)
+SOFT_EXPIRY_FIELD = "soft_expires_at"
 
+# In-process tier in front of Redis for hot keys. Writes publish the key on the
+# invalidation channel so every worker drops its local copy.
+LOCAL_CACHE_ENABLED = env.bool("LOCAL_CACHE_ENABLED", True)
+INVALIDATION_CHANNEL = "cache_invalidation"
+INVALIDATION_RETRY_DELAY = 2  # seconds before resubscribing after a connection error
 
-def ensure_connection():
-    """Ping Redis to ensure there is a connection, retry if connection error"""
-    global redis_client
-    try:
-        redis_client.ping()
-    except redis.exceptions.ConnectionError:
-        logger.warning(
-            f"Redis connection was lost. Attempting immediate reconnection..."
-        )
-        try:
-            time.sleep(QUICK_RETRY_DELAY)
-            redis_client = redis.from_url(env.str("REDIS_URL"), decode_responses=True)
-            redis_client.ping()
-            logger.info("Reconnected to Redis successfully.")
-        except redis.exceptions.ConnectionError:
-            logger.warning(
-                f"Immediate reconnection failed. Waiting {LONG_RETRY_DELAY} seconds before trying again..."
-            )
-            time.sleep(LONG_RETRY_DELAY)
-            redis_client = redis.from_url(env.str("REDIS_URL"), decode_responses=True)
+REDIS_URL = env.str("REDIS_URL")
 
+# Shared connection pool; connections are checked out per command and broken
+# connections are replaced by the pool, so no PING is needed before each call
+connection_pool = aioredis.ConnectionPool.from_url(
+    REDIS_URL,
+    decode_responses=False,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+    retry_on_timeout=True,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+)
+redis_client = aioredis.Redis(connection_pool=connection_pool)
 
-def set_key(key, value, ex=SHORT_TERM_CACHE_SECONDS):
+local_cache = LocalCache(
+    max_entries=env.int("LOCAL_CACHE_MAX_ENTRIES", 500),
+    max_bytes=env.int("LOCAL_CACHE_MAX_BYTES", 20_000_000),
+    ttl=env.int("LOCAL_CACHE_TTL_SECONDS", 60),
+)
+
+
+async def close_redis():
+    """Close the Redis connection pool at app shutdown"""
+    await connection_pool.disconnect()
+
+
+async def set_key(key, value, ex=None):
     """
     Set a key-value pair in Redis with expiration based on the movie's age and data completeness.
+    An explicit expiration (in seconds) can be given with ex.
     Falls back to short-term caching if any errors occur.
     """
-    ensure_connection()
+    if ex is not None:
+        cache_duration = ex
+    else:
+        try:
+            cache_duration = determine_cache_duration(value)
+        except Exception as e:
+            logging.error(
+                f"Error determining cache duration: {type(e).__name__}: {str(e)}. Falling back to short-term cache."
+            )
+            cache_duration = SHORT_TERM_CACHE_SECONDS
+
+    return await write_key(key, encode_value(value), cache_duration)
+
+
+async def set_keys(items, ex):
+    """Write many (key, value) pairs with the same expiration in one pipelined round trip"""
+    if not items:
+        return []
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key, value in items:
+            local_cache.invalidate(key)
+            pipe.set(key, encode_value(value), ex=ex)
+            pipe.publish(INVALIDATION_CHANNEL, key)
+        with time_redis("set_many"):
+            results = await pipe.execute()
+    return results[::2]
+
+
+async def set_key_with_soft_expiry(key, value):
+    """
+    Set a value that is fresh until its soft expiry (the usual cache duration), then
+    stale but still servable for STALE_CACHE until Redis expires it (hard expiry).
+    """
+    serialized_value, ex = build_soft_expiry_entry(value)
+    return await write_key(key, serialized_value, ex)
 
+
+async def set_keys_with_soft_expiry(items):
+    """Write many (key, value) pairs with soft expiry in one pipelined round trip"""
+    if not items:
+        return []
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key, value in items:
+            local_cache.invalidate(key)
+            serialized_value, ex = build_soft_expiry_entry(value)
+            pipe.set(key, serialized_value, ex=ex)
+            pipe.publish(INVALIDATION_CHANNEL, key)
+        with time_redis("set_many"):
+            results = await pipe.execute()
+    return results[::2]
+
+
+def build_soft_expiry_entry(value):
+    """Serialize a value with its soft expiry, returning it with its hard expiry"""
     try:
         cache_duration = determine_cache_duration(value)
     except Exception as e:
@@ -64,7 +138,37 @@ def set_key(key, value, ex=SHORT_TERM_CACHE_SECONDS):
         )
         cache_duration = SHORT_TERM_CACHE_SECONDS
 
-    return redis_client.set(key, json.dumps(value), ex=cache_duration)
+    envelope = {"value": value, SOFT_EXPIRY_FIELD: time.time() + cache_duration}
+    with timed("serialize"):
+        serialized_value = encode_value(envelope)
+    return serialized_value, cache_duration + STALE_CACHE_SECONDS
+
+
+async def write_key(key, serialized_value, ex):
+    """Write a serialized value and invalidate the local copies of every worker"""
+    local_cache.invalidate(key)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.set(key, serialized_value, ex=ex)
+        pipe.publish(INVALIDATION_CHANNEL, key)
+        with time_redis("set"), timed("cache_write"):
+            results = await pipe.execute()
+    return results[0]
+
+
+def unwrap_soft_expiry(data):
+    """Return the value and whether it is past its soft expiry"""
+    if isinstance(data, dict) and SOFT_EXPIRY_FIELD in data and "value" in data:
+        return data["value"], time.time() >= data[SOFT_EXPIRY_FIELD]
+
+    # Values cached without a soft expiry are fresh until Redis expires them
+    return data, False
+
+
+def get_soft_expires_at(data):
+    """Timestamp of a value's soft expiry, or None if it was cached without one"""
+    if isinstance(data, dict) and SOFT_EXPIRY_FIELD in data and "value" in data:
+        return data[SOFT_EXPIRY_FIELD]
+    return None
 
 
 def determine_cache_duration(data):
@@ -92,6 +196,8 @@ def is_eligible_for_extended_cache(data):
     try:
         return (
             data["tmdb_data"]["media_type"] == "movie"
+            # Partial entries are completed by a backfill, keep them short-term
+            and not data["external_data"].get("pending_fields")
             and data["external_data"].get("letterboxd_url")
             and data["external_data"].get("rottentomatoes_url")
             and data["external_data"].get("imdb_url")
@@ -104,18 +210,146 @@ def is_eligible_for_extended_cache(data):
         return False
 
 
-def get_key(key):
-    """Get a value from Redis by key"""
-    ensure_connection()
+async def get_key(key):
+    """Get a value by key, from the local cache tier first and then Redis"""
+    if LOCAL_CACHE_ENABLED:
+        value = local_cache.get(key)
+        if value is not None:
+            record_cache_read(key, "local_hit")
+            return value
+
+    # Invalidations arriving during the GET must not be undone by the fill
+    generation = local_cache.generation
     try:
-        value = redis_client.get(key)
-        return json.loads(value) if value else None
-    except redis.exceptions.ConnectionError:
-        logger.error("Redis connection error. Falling bak to TMDB API")
+        with time_redis("get"):
+            serialized_value = await redis_client.get(key)
+        if not serialized_value:
+            record_cache_read(key, "miss")
+            return None
+
+        record_cache_read(key, "hit")
+        value = decode_value(serialized_value)
+        if LOCAL_CACHE_ENABLED:
+            local_cache.set(key, value, estimate_size(value), generation=generation)
+        return value
+    except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError):
+        logger.error("Redis connection error. Falling back to TMDB API")
+        return None
+    except ValueError as e:
+        # Undecodable values are treated as misses and rewritten by the caller
+        logger.error(f"Error decoding cached value for {key}: {type(e).__name__}: {str(e)}.")
         return None
 
 
-def delete_key(key):
-    """Delete a key from Redis"""
-    ensure_connection()
-    return redis_client.delete(key)
+async def get_keys(keys):
+    """Get many values, from the local cache tier first and then a single MGET"""
+    values = {}
+    if LOCAL_CACHE_ENABLED:
+        for key in keys:
+            value = local_cache.get(key)
+            if value is not None:
+                values[key] = value
+                record_cache_read(key, "local_hit")
+
+    missing_keys = [key for key in keys if key not in values]
+    if missing_keys:
+        generation = local_cache.generation
+        try:
+            with time_redis("mget"):
+                serialized_values = await redis_client.mget(missing_keys)
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError):
+            logger.error("Redis connection error. Falling back to TMDB API")
+            serialized_values = [None] * len(missing_keys)
+
+        for key, serialized_value in zip(missing_keys, serialized_values):
+            record_cache_read(key, "hit" if serialized_value else "miss")
+            if not serialized_value:
+                continue
+            try:
+                value = decode_value(serialized_value)
+            except ValueError as e:
+                logger.error(
+                    f"Error decoding cached value for {key}: {type(e).__name__}: {str(e)}."
+                )
+                continue
+            values[key] = value
+            if LOCAL_CACHE_ENABLED:
+                local_cache.set(key, value, estimate_size(value), generation=generation)
+
+    return [values.get(key) for key in keys]
+
+
+async def get_ttls(keys):
+    """Get the remaining TTL in seconds of many keys in one pipelined round trip"""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.ttl(key)
+        with time_redis("ttl_many"):
+            return await pipe.execute()
+
+
+async def get_key_with_soft_expiry(key):
+    """Get a value set with set_key_with_soft_expiry, and whether it is stale"""
+    return unwrap_soft_expiry(await get_key(key))
+
+
+async def delete_key(key):
+    """Delete a key from Redis and invalidate the local copies of every worker"""
+    local_cache.invalidate(key)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.delete(key)
+        pipe.publish(INVALIDATION_CHANNEL, key)
+        results = await pipe.execute()
+    return results[0]
+
+
+def create_subscriber_client():
+    """
+    A client with a connection of its own for the invalidation subscription.
+    The channel can be idle for long, so its reads never time out (a timeout
+    would resubscribe and lose the messages published meanwhile); TCP
+    keepalive and health checks detect a dead connection instead.
+    """
+    return aioredis.Redis.from_url(
+        REDIS_URL,
+        decode_responses=False,
+        socket_timeout=None,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    )
+
+
+async def listen_for_invalidations(client=None):
+    """
+    Drop local cache entries when any worker writes or deletes their key.
+    If the subscription is lost, invalidations may have been missed, so the
+    local cache is cleared before resubscribing.
+    """
+    subscriber = client or create_subscriber_client()
+    try:
+        while True:
+            pubsub = subscriber.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        local_cache.invalidate(message["data"].decode("utf-8"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    f"Cache invalidation listener error: {type(e).__name__}: {str(e)}."
+                )
+                local_cache.clear()
+                await asyncio.sleep(INVALIDATION_RETRY_DELAY)
+            finally:
+                await pubsub.aclose()
+    finally:
+        if client is None:
+            await subscriber.aclose()
+
+
+def get_local_cache_stats():
+    """Hit, miss and eviction counters of the local cache tier"""
+    return local_cache.stats()
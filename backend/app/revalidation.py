@@ -0,0 +1,210 @@
+"""
+This module revalidates fetched pages instead of redownloading them. The
+validators (ETag, Last-Modified) of fetched URLs that send them are kept in
+Redis with a fingerprint of the value extracted from the page. Within
+revalidating(previous_details) (the stale refresh and warm-up paths), a page
+whose value in the previous details entry still has that fingerprint is
+requested with If-None-Match / If-Modified-Since, and a 304 reuses the value
+from the entry without downloading or parsing the page.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import redis.exceptions
+from contextlib import contextmanager
+
+from environs import Env
+from app.redis_client import redis_client
+from app.utils.serialization_utils import decode_value, encode_value
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+REVALIDATION_ENABLED = env.bool("CONDITIONAL_REVALIDATION", True)
+VALIDATORS_CACHE_SECONDS = env.int("VALIDATORS_CACHE_SECONDS", 30 * 24 * 60 * 60)
+
+revalidating_details = contextvars.ContextVar("revalidating_details", default=None)
+
+revalidation_stats = {
+    "refresh_requests": 0,
+    "refresh_bytes": 0,
+    "conditional_requests": 0,
+    "not_modified": 0,
+    "unchanged": 0,
+    "changed": 0,
+    "bytes_saved": 0,
+}
+
+
+@contextmanager
+def revalidating(previous_details):
+    """
+    Send conditional requests for the enclosed fetches (and tasks created within)
+    of the pages whose values are in previous_details, the details entry being
+    refreshed. Nothing is revalidated when it is None.
+    """
+    token = revalidating_details.set(previous_details)
+    try:
+        yield
+    finally:
+        revalidating_details.reset(token)
+
+
+def get_validators_key(url, *extract_args):
+    """
+    The key of a URL's validators. Search URLs only carry the title,
+    so the arguments the value was extracted with (year, media type) are part
+    of it: titles sharing a name must not reuse each other's search result.
+    """
+    # URLs can carry API keys, so only their hash is stored
+    identity = json.dumps([url, *extract_args], default=str)
+    return f"validators_{hashlib.sha1(identity.encode('utf-8')).hexdigest()}"
+
+
+def fingerprint_value(value):
+    serialized = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(serialized.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def get_previous_value(details, fields):
+    """
+    The value a page was extracted into in a details entry: its tmdb_data, one
+    external data field, or a dict of several. None when the entry lacks it.
+    """
+    if not details:
+        return None
+    if fields == "tmdb_data":
+        return details.get("tmdb_data")
+
+    external_data = details.get("external_data") or {}
+    field_names = (fields,) if isinstance(fields, str) else fields
+    pending_fields = external_data.get("pending_fields") or ()
+    if any(field in pending_fields for field in field_names):
+        return None
+    if isinstance(fields, str):
+        return external_data.get(fields)
+    value = {field: external_data.get(field) for field in fields}
+    return value if any(item is not None for item in value.values()) else None
+
+
+def get_refreshed_value(fields):
+    """The value of fields in the details entry being refreshed, None outside a refresh"""
+    return get_previous_value(revalidating_details.get(), fields)
+
+
+class ConditionalFetch:
+    """The validators of a URL and its value in the details being refreshed, for one fetch"""
+
+    def __init__(self, url, previous=None, extract_args=(), previous_value=None):
+        self.url = url
+        self.key = get_validators_key(url, *extract_args)
+        self.previous = previous
+        self.previous_value = previous_value
+        self.revalidating = revalidating_details.get() is not None
+        self.not_modified = False
+        self.validators = {}
+        self.bytes = 0
+
+    @property
+    def can_revalidate(self):
+        """Whether the previous value is the one the stored validators were sent with"""
+        return (
+            self.previous is not None
+            and self.previous_value is not None
+            and self.previous.get("fingerprint") == fingerprint_value(self.previous_value)
+        )
+
+    def request_headers(self):
+        """Conditional request headers, when revalidating a URL fetched before"""
+        if not self.can_revalidate:
+            return {}
+
+        headers = {}
+        if self.previous.get("etag"):
+            headers["If-None-Match"] = self.previous["etag"]
+        if self.previous.get("last_modified"):
+            headers["If-Modified-Since"] = self.previous["last_modified"]
+        if headers:
+            revalidation_stats["conditional_requests"] += 1
+        return headers
+
+    def record_response(self, response):
+        """Read the validators of a response, or mark the fetch as not modified on 304"""
+        if response.status_code == 304 and self.can_revalidate:
+            self.not_modified = True
+            revalidation_stats["not_modified"] += 1
+            revalidation_stats["bytes_saved"] += self.previous.get("bytes", 0)
+            return
+
+        self.validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+    async def reuse_previous_value(self):
+        """The previous value of an unchanged page, keeping its validators for longer"""
+        try:
+            await redis_client.expire(self.key, VALIDATORS_CACHE_SECONDS)
+        except redis.exceptions.RedisError as e:
+            logging.error(f"Error extending validators: {type(e).__name__}: {str(e)}.")
+        return self.previous_value
+
+    def record_body(self, bytes_downloaded):
+        """Count the bytes downloaded for the page, the cost of a refresh"""
+        self.bytes = bytes_downloaded
+        if self.revalidating:
+            revalidation_stats["refresh_requests"] += 1
+            revalidation_stats["refresh_bytes"] += bytes_downloaded
+
+    async def save(self, value):
+        """
+        Store the validators of the page with a fingerprint of the value extracted
+        from it. Pages sent without validators store nothing, and drop the
+        validators they had when revalidated.
+        """
+        fingerprint = fingerprint_value(value)
+        if self.previous is not None:
+            unchanged = self.previous.get("fingerprint") == fingerprint
+            revalidation_stats["unchanged" if unchanged else "changed"] += 1
+
+        try:
+            if self.validators.get("etag") or self.validators.get("last_modified"):
+                entry = {**self.validators, "fingerprint": fingerprint, "bytes": self.bytes}
+                await redis_client.set(
+                    self.key, encode_value(entry), ex=VALIDATORS_CACHE_SECONDS
+                )
+            elif self.previous is not None:
+                await redis_client.delete(self.key)
+        except redis.exceptions.RedisError as e:
+            logging.error(f"Error saving validators: {type(e).__name__}: {str(e)}.")
+
+
+async def start_conditional_fetch(url, *extract_args, fields):
+    """
+    A ConditionalFetch for url, with its previous validators and value when
+    revalidating. extract_args are the arguments the page's value is extracted
+    with, and fields where the value is kept in the details (see get_previous_value).
+    """
+    if not REVALIDATION_ENABLED:
+        return None
+
+    previous = None
+    previous_value = get_previous_value(revalidating_details.get(), fields)
+    if previous_value is not None:
+        try:
+            serialized_entry = await redis_client.get(
+                get_validators_key(url, *extract_args)
+            )
+            previous = decode_value(serialized_entry) if serialized_entry else None
+        except (redis.exceptions.RedisError, ValueError) as e:
+            logging.error(f"Error reading validators: {type(e).__name__}: {str(e)}.")
+
+    return ConditionalFetch(url, previous, extract_args, previous_value)
+
+
+def get_revalidation_stats():
+    """Refresh cost, conditional requests, 304s and estimated bytes saved"""
+    return dict(revalidation_stats)
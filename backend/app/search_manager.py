@@ -0,0 +1,109 @@
+"""
+This module answers title searches from, in order: an in-memory prefix index of
+recently seen and trending titles (short queries only), the Redis search cache
+keyed by the normalized query, and the TMDB search API.
+"""
+import logging
+import time
+
+from environs import Env
+from app.redis_client import get_key, set_key
+from app.tmdb_api import search_title
+from app.utils.latency_utils import LatencyRecorder
+from app.utils.prefix_index_utils import PrefixIndex, normalize_query
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+SEARCH_CACHE_SECONDS = env.int("SEARCH_CACHE_SECONDS", 6 * 60 * 60)
+# Queries up to this long are answered from the prefix index when it has enough matches
+LOCAL_PREFIX_MAX_LENGTH = env.int("SEARCH_LOCAL_PREFIX_MAX_LENGTH", 3)
+LOCAL_MIN_RESULTS = env.int("SEARCH_LOCAL_MIN_RESULTS", 5)
+MAX_RESULTS = 20  # one page of TMDB search/multi
+
+search_index = PrefixIndex(max_entries=env.int("SEARCH_INDEX_MAX_ENTRIES", 5000))
+search_latency = LatencyRecorder()
+search_stats = {"requests": 0, "index_hits": 0, "cache_hits": 0, "upstream_calls": 0}
+# Keys of the trending list last indexed by this worker
+indexed_trending = {"keys": None}
+
+
+def get_search_cache_key(normalized_query):
+    return f"search_{normalized_query}"
+
+
+async def search_titles(query, api_key):
+    """Search movies and TV shows, calling TMDB only when neither cache tier can answer"""
+    started = time.perf_counter()
+    search_stats["requests"] += 1
+    try:
+        return await _search_titles(query, api_key)
+    finally:
+        search_latency.record(time.perf_counter() - started)
+
+
+async def _search_titles(query, api_key):
+    normalized_query = normalize_query(query)
+    if not normalized_query:
+        return []
+
+    if len(normalized_query) <= LOCAL_PREFIX_MAX_LENGTH:
+        local_results = search_index.search(normalized_query, MAX_RESULTS)
+        if len(local_results) >= LOCAL_MIN_RESULTS:
+            search_stats["index_hits"] += 1
+            return local_results
+
+    cache_key = get_search_cache_key(normalized_query)
+    cached_results = await get_key(cache_key)
+    if cached_results is not None:
+        search_stats["cache_hits"] += 1
+        return cached_results
+
+    search_stats["upstream_calls"] += 1
+    results = await search_title(query, api_key)
+    index_titles(results)
+
+    try:
+        await set_key(cache_key, results, ex=SEARCH_CACHE_SECONDS)
+    except Exception as e:
+        logging.error(f"Error caching search results: {type(e).__name__}: {str(e)}.")
+    return results
+
+
+def get_index_key(title):
+    return f"{title['media_type']}_{title['tmdb_id']}"
+
+
+def index_titles(titles):
+    """Add search or trending results to the prefix index"""
+    for title in titles:
+        search_index.add(get_index_key(title), title["title"], title)
+
+
+def index_trending_titles(movies):
+    """
+    Add the trending list to the prefix index when it differs from the one last
+    indexed, or some of its titles were evicted since. It is read on every
+    /api/trending hit, and indexing it costs far more than the read.
+    """
+    keys = [get_index_key(movie) for movie in movies]
+    if keys == indexed_trending["keys"] and all(key in search_index for key in keys):
+        return False
+
+    index_titles(movies)
+    indexed_trending["keys"] = keys
+    return True
+
+
+def get_search_stats():
+    """Search counters, the share answered without TMDB, and latency percentiles"""
+    requests = search_stats["requests"]
+    local_requests = requests - search_stats["upstream_calls"]
+    return {
+        **search_stats,
+        "upstream_call_reduction": round(local_requests / requests, 3) if requests else None,
+        "indexed_titles": len(search_index),
+        **search_latency.stats(),
+    }
@@ -1,27 +1,57 @@
 import asyncio
-import httpx
 import logging
+import time
 
-from datetime import datetime
 from app.external_data import get_movie_data
+from app import rate_limiter
+from app.revalidation import revalidating, start_conditional_fetch
+from app.tmdb_client import tmdb_client
 from app.utils.format_runtime_utils import format_runtime
+from app.utils.server_timing_utils import timed
 from app.utils.throttled_fetch_utils import throttled_fetch
-from app.redis_client import set_key, get_key
+from app.warmup_queue import WARMUP_QUEUE_ENABLED, enqueue_warm_up
+from app.utils.trending_diff_utils import diff_titles, get_title_key
+from app.redis_client import (
+    STALE_CACHE_SECONDS,
+    get_key,
+    get_keys,
+    get_ttls,
+    get_soft_expires_at,
+    set_key_with_soft_expiry,
+    set_keys_with_soft_expiry,
+    unwrap_soft_expiry,
+)
+
+# Trending titles whose cache entry expires within this window are re-warmed
+WARM_UP_REFRESH_WINDOW = 6 * 60 * 60  # 6 hours
+# Warmed details are written back in pipelined batches of this size
+WARM_UP_WRITE_BATCH_SIZE = 10
 
 # --------- HOMEPAGE - TRENDING MOVIES -------------- #
 
 
 async def fetch_trending_movies(api_key):
+    """Fetch top 100 trending movies of the week and warm up their details"""
+    filtered_movies = await fetch_trending_list(api_key)
+
+    try:
+        # Fetch and cache details for each movie
+        await cache_trending_movie_details(filtered_movies, api_key)
+        logging.info("Completed caching process for trending movies")
+    except Exception as e:
+        logging.error(f"Error caching movie details: {type(e).__name__}: {str(e)}.")
+
+    return filtered_movies
+
+
+async def fetch_trending_list(api_key):
     """Fetch top 100 trending movies of the week using the TMDB API"""
     base_url = f"https://api.themoviedb.org/3/trending/movie/week"
     poster_size = "w500"
 
     async def fetch_page(page):
         url = f"{base_url}?language=en-US&api_key={api_key}&page={page}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            return response.json()["results"]
+        return (await tmdb_client.get_json(url))["results"]
 
     # Fetch 5 pages concurrently
     pages = await asyncio.gather(*[fetch_page(i) for i in range(1, 6)])
@@ -33,85 +63,221 @@ async def fetch_trending_movies(api_key):
     compatible_data = {"results": all_movies}
 
     # Filter and process the results
-    filtered_movies = filter_api_data(compatible_data, poster_size)
+    return filter_api_data(compatible_data, poster_size)
 
-    try:
-        # Fetch and cache details for each movie
-        await cache_trending_movie_details(filtered_movies, api_key)
-        logging.info("Completed caching process for trending movies")
-    except Exception as e:
-        logging.error(f"Error caching movie details: {type(e).__name__}: {str(e)}.")
 
-    return filtered_movies
+def needs_warm_up(cached_details, ttl, window=WARM_UP_REFRESH_WINDOW):
+    """Check if a cached details entry is missing or expires within the window"""
+    if not cached_details:
+        return True
+
+    # Entries cached without a soft expiry expire with their Redis TTL
+    soft_expires_at = get_soft_expires_at(cached_details)
+    expires_in = soft_expires_at - time.time() if soft_expires_at else ttl
+    return expires_in < window
+
+
+def needs_warm_up_by_ttl(ttl, window=WARM_UP_REFRESH_WINDOW):
+    """
+    Check from its TTL alone if an entry may be missing or expire within window.
+    Taking every entry to have a soft expiry (its TTL includes the stale period)
+    also selects entries cached without one, so needs_warm_up confirms them.
+    """
+    if ttl == -1:  # persisted without an expiry
+        return False
+    return ttl == -2 or ttl - STALE_CACHE_SECONDS < window
+
+
+async def select_titles_to_warm(movies):
+    """The titles whose details are missing or expire within the refresh window"""
+    # Resolve which titles are already cached with one MGET and one TTL pipeline
+    cache_keys = [
+        f"details_{movie['tmdb_id']}_{movie['media_type']}" for movie in movies
+    ]
+    cached_entries = await get_keys(cache_keys)
+    ttls = await get_ttls(cache_keys)
+
+    return [
+        movie
+        for movie, cached_details, ttl in zip(movies, cached_entries, ttls)
+        if needs_warm_up(cached_details, ttl)
+    ]
+
+
+async def select_expiring_keys(cache_keys, window=WARM_UP_REFRESH_WINDOW):
+    """
+    The keys whose entries are missing or expire within window. Their TTLs rule
+    out the entries that are certainly fresh, and only the rest are read.
+    """
+    ttls = await get_ttls(cache_keys)
+    candidates = [
+        (cache_key, ttl)
+        for cache_key, ttl in zip(cache_keys, ttls)
+        if needs_warm_up_by_ttl(ttl, window)
+    ]
+    if not candidates:
+        return []
+
+    cached_entries = await get_keys([cache_key for cache_key, _ in candidates])
+    return [
+        cache_key
+        for (cache_key, ttl), cached_details in zip(candidates, cached_entries)
+        if needs_warm_up(cached_details, ttl, window)
+    ]
+
+
+async def select_expiring_titles(movies):
+    """The titles whose entries expire within the refresh window"""
+    cache_keys = {
+        f"details_{movie['tmdb_id']}_{movie['media_type']}": movie for movie in movies
+    }
+    expiring_keys = await select_expiring_keys(list(cache_keys))
+    return [cache_keys[cache_key] for cache_key in expiring_keys]
 
 
 async def cache_trending_movie_details(movies, api_key):
+    movies_to_cache = await select_titles_to_warm(movies)
+    logging.info(
+        f"{len(movies_to_cache)} of {len(movies)} trending movies need caching"
+    )
+    await warm_up_titles(movies_to_cache, api_key)
+
+
+async def refresh_trending_incrementally(previous, movies, api_key):
+    """
+    Warm up only what changed since the previous trending list: new titles that
+    are not cached yet, and kept titles whose entries expire within the refresh
+    window (screened by their TTLs, reading only the entries that may be due).
+    Titles are warmed in trending rank order. Returns the per-run counts.
+    """
+    diff = diff_titles(previous, movies)
+    new_to_cache = await select_titles_to_warm(diff["new"]) if diff["new"] else []
+    expiring = await select_expiring_titles(diff["kept"]) if diff["kept"] else []
+
+    selected = {get_title_key(movie) for movie in new_to_cache + expiring}
+    movies_to_cache = [movie for movie in movies if get_title_key(movie) in selected]
+    await warm_up_titles(movies_to_cache, api_key)
+
+    counts = {
+        "new": len(diff["new"]),
+        "kept": len(diff["kept"]),
+        "dropped": len(diff["dropped"]),
+        "refreshed": len(expiring),
+        "warmed_new": len(new_to_cache),
+    }
+    logging.info(
+        "Incremental trending refresh: "
+        + ", ".join(f"{count} {name}" for name, count in counts.items())
+    )
+    return counts
+
+
+async def warm_up_titles(movies_to_cache, api_key):
+    """Warm up the details of titles, in order, through the queue or inline"""
+    # Queued titles are warmed up by the consumers of app.warmup_queue
+    if WARMUP_QUEUE_ENABLED:
+        if movies_to_cache:
+            await enqueue_warm_up(movies_to_cache)
+        return
+
+    pending_writes = []
+
+    async def flush_writes():
+        if not pending_writes:
+            return
+        items = pending_writes[:]
+        pending_writes.clear()
+        await set_keys_with_soft_expiry(items)
+        logging.info(f"Cached full details for {len(items)} movies")
+
     async def fetch_and_cache(movie):
         tmdb_id = movie["tmdb_id"]
         media_type = movie["media_type"]
-        cache_key = f"details_{tmdb_id}_{media_type}"
-
-        # Check if details are already in cache
-        cached_details = get_key(cache_key)
-        if cached_details:
-            return
 
+        # Pages whose values are in the current entry are revalidated
+        cached_details, _ = unwrap_soft_expiry(
+            await get_key(f"details_{tmdb_id}_{media_type}")
+        )
         try:
-            # Fetch TMDB details
-            tmdb_data = await fetch_title_details(tmdb_id, media_type, api_key)
-            logging.info(f"Successfully fetched TMDB data for movie {tmdb_id}")
-
-            try:
-                # Fetch external data
-                external_data = await get_movie_data(
-                    tmdb_data["imdb_id"],
-                    tmdb_data["title"],
-                    tmdb_data["year"],
-                    media_type,
-                    tmdb_data["justwatch_url"],
-                )
-                logging.info(f"Successfully fetched external data for movie {tmdb_id}")
-
-                # Add IMDB url to external_data
-                imdb_url = (
-                    f"https://www.imdb.com/title/{tmdb_data['imdb_id']}"
-                    if tmdb_data["imdb_id"]
-                    else None
-                )
-                external_data_model = {
-                    "imdb_url": imdb_url,
-                    **external_data,
-                }
-
-                # Combine TMDB and external data
-                full_details = {
-                    "tmdb_data": tmdb_data,
-                    "external_data": external_data_model,
-                }
-
-                # Cache the combined data
-                set_key(cache_key, full_details)
-                logging.info(
-                    f"Cached full details for movie: {tmdb_data['title']} ({tmdb_data['year']})"
-                )
-            except Exception as e:
-                logging.error(
-                    f"Error processing external data for {tmdb_data['title']} - TMDB ID {tmdb_id}: {type(e).__name__}: {str(e)}.",
-                    exc_info=True,
-                )
-
+            with revalidating(cached_details):
+                full_details = await fetch_full_details(tmdb_id, media_type, api_key)
         except Exception as e:
             logging.error(
-                f"Error fetching TMDB data for movie {tmdb_id}: {type(e).__name__}: {str(e)}.",
+                f"Error warming up movie {tmdb_id}: {type(e).__name__}: {str(e)}.",
                 exc_info=True,
             )
+            return
+
+        # Queue the combined data for the next pipelined write
+        pending_writes.append((f"details_{tmdb_id}_{media_type}", full_details))
+        if len(pending_writes) >= WARM_UP_WRITE_BATCH_SIZE:
+            await flush_writes()
 
     # # Process only the first 'limit' movies for testing
-    # limited_movies = movies[30:35]
+    # limited_movies = movies_to_cache[30:35]
     # await throttled_fetch(fetch_and_cache, limited_movies)
-    await throttled_fetch(fetch_and_cache, movies)
+    if movies_to_cache:
+        # Warm-up requests yield to user requests
+        with rate_limiter.background_priority():
+            await throttled_fetch(fetch_and_cache, movies_to_cache)
+    await flush_writes()
+
+    logging.info(f"Processed {len(movies_to_cache)} movies for caching")
+
+
+async def fetch_full_details(tmdb_id, media_type, api_key):
+    """Fetch the TMDB details and external data of a title, as cached in details_*"""
+    # Fetch TMDB details
+    tmdb_data = await fetch_title_details(tmdb_id, media_type, api_key)
+    logging.info(f"Successfully fetched TMDB data for movie {tmdb_id}")
+
+    # Fetch external data
+    external_data = await get_movie_data(
+        tmdb_data["imdb_id"],
+        tmdb_data["title"],
+        tmdb_data["year"],
+        media_type,
+        tmdb_data["justwatch_url"],
+        tmdb_id=tmdb_id,
+    )
+    logging.info(f"Successfully fetched external data for movie {tmdb_id}")
 
-    logging.info(f"Processed {len(movies)} movies for caching")
+    # Add IMDB url to external_data
+    imdb_url = (
+        f"https://www.imdb.com/title/{tmdb_data['imdb_id']}"
+        if tmdb_data["imdb_id"]
+        else None
+    )
+    external_data_model = {
+        "imdb_url": imdb_url,
+        **external_data,
+    }
+
+    logging.info(
+        f"Fetched full details for movie: {tmdb_data['title']} ({tmdb_data['year']})"
+    )
+    # Combine TMDB and external data
+    return {
+        "tmdb_data": tmdb_data,
+        "external_data": external_data_model,
+    }
+
+
+async def warm_up_title(tmdb_id, media_type, api_key):
+    """
+    Fetch and cache the details of one title, unless another run cached them
+    since it was queued. Returns whether the title was fetched.
+    """
+    cache_key = f"details_{tmdb_id}_{media_type}"
+    cached_details = await get_key(cache_key)
+    ttls = await get_ttls([cache_key])
+    if not needs_warm_up(cached_details, ttls[0]):
+        return False
+
+    with revalidating(unwrap_soft_expiry(cached_details)[0]):
+        full_details = await fetch_full_details(tmdb_id, media_type, api_key)
+    await set_key_with_soft_expiry(cache_key, full_details)
+    return True
 
 
 # --------- SEARCH FOR MOVIE OR TV SERIES -------------- #
@@ -121,19 +287,12 @@ async def search_title(user_input, api_key):
     """Look up movie, TV shows, and people using the TMDB API"""
     title = user_input.replace(" ", "%20")
     url = f"https://api.themoviedb.org/3/search/multi?api_key={api_key}&query={title}&include_adult=false&language=en-US&page=1"
-    search_results = await fetch_api_data(url)
+    search_results = await tmdb_client.get_json(url)
     poster_size = "w185"
     filtered_results = filter_api_data(search_results, poster_size)
     return filtered_results
 
 
-async def fetch_api_data(url):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        return response.json()
-
-
 def filter_api_data(api_data, poster_size):
     """Filter the API data based on media type"""
     poster_base_url = f"https://www.themoviedb.org/t/p/{poster_size}"
@@ -270,7 +429,12 @@ async def fetch_title_details(tmdb_id, media_type, api_key):
     try:
         """Fetch the details for the selected title and filter the results"""
         url = f"https://api.themoviedb.org/3/{media_type}/{tmdb_id}?api_key={api_key}&language=en-US&append_to_response=release_dates,watch/providers,external_ids,credits"
-        media_details = await fetch_api_data(url)
+        conditional = await start_conditional_fetch(url, fields="tmdb_data")
+        with timed("tmdb"):
+            media_details = await tmdb_client.get_json(url, conditional)
+        if conditional is not None and conditional.not_modified:
+            return await conditional.reuse_previous_value()
+
         poster_img, justwatch_url = get_common_details(media_details)
 
         if media_type == "movie":
@@ -303,6 +467,8 @@ async def fetch_title_details(tmdb_id, media_type, api_key):
         else:
             raise ValueError(f"Invalid media type: {media_type}")
 
+        if conditional is not None:
+            await conditional.save(filtered_details)
         return filtered_details
     except Exception as e:
         logging.error(f"Error in fetch_title_details for {tmdb_id}")
@@ -314,20 +480,18 @@ async def fetch_title_details(tmdb_id, media_type, api_key):
 
 async def fetch_director_movies(director_id, api_key):
     url = f"https://api.themoviedb.org/3/person/{director_id}/movie_credits?api_key={api_key}&language=en-US"
-    data = await fetch_api_data(url)
+    data = await tmdb_client.get_json(url)
 
-    # Filter for movies where the person was a director
-    directed_movies = [movie for movie in data["crew"] if movie["job"] == "Director"]
+    # Filter for dated movies where the person was a director
+    directed_movies = [
+        movie
+        for movie in data["crew"]
+        if movie["job"] == "Director" and movie.get("release_date")
+    ]
 
-    # Sort movies by release date (newest first)
+    # Sort movies by release date (newest first); ISO dates sort as strings
     sorted_movies = sorted(
-        directed_movies,
-        key=lambda x: (
-            datetime.strptime(x["release_date"], "%Y-%m-%d")
-            if x["release_date"]
-            else datetime.min
-        ),
-        reverse=True,
+        directed_movies, key=lambda movie: movie["release_date"], reverse=True
     )
 
     # Format the results
@@ -335,7 +499,7 @@ async def fetch_director_movies(director_id, api_key):
         {
             "tmdb_id": movie["id"],
             "title": movie["title"],
-            "year": movie["release_date"][:4] if movie["release_date"] else None,
+            "year": movie["release_date"][:4],
             "media_type": "movie",
             "poster_img": (
                 f"https://image.tmdb.org/t/p/w185{movie['poster_path']}"
@@ -344,7 +508,6 @@ async def fetch_director_movies(director_id, api_key):
             ),
         }
         for movie in sorted_movies
-        if movie["release_date"] and movie["release_date"][:4]
     ]
 
     return formatted_movies
@@ -0,0 +1,142 @@
+"""
+This module holds the client every TMDB API request goes through. It uses the
+pooled "tmdb" client from app.http_client, which speaks HTTP/2 when the h2
+package is installed so concurrent requests share one connection. Requests wait
+for the TMDB rate limit. 429 and 5xx responses and transport errors are retried
+with exponential backoff, or after Retry-After when TMDB sends it.
+"""
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+from environs import Env
+from app import rate_limiter
+from app.http_client import get_client
+from app.metrics import record_error, record_source_request
+from app.utils.rate_limit_utils import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+TMDB_MAX_RETRIES = env.int("TMDB_MAX_RETRIES", 3)
+TMDB_RETRY_BASE_DELAY = env.float("TMDB_RETRY_BASE_DELAY", 0.5)
+# Retry-After values above this are not waited for; the error is raised instead
+TMDB_MAX_RETRY_DELAY = env.float("TMDB_MAX_RETRY_DELAY", 10)
+# Deadline of one call to get_json, retries included
+TMDB_REQUEST_TIMEOUT = env.float("TMDB_REQUEST_TIMEOUT", 30)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class TMDBClient:
+    """TMDB API GETs with rate limiting, retries and a per-call deadline"""
+
+    def __init__(
+        self,
+        source="tmdb",
+        max_retries=TMDB_MAX_RETRIES,
+        retry_base_delay=TMDB_RETRY_BASE_DELAY,
+        max_retry_delay=TMDB_MAX_RETRY_DELAY,
+        request_timeout=TMDB_REQUEST_TIMEOUT,
+    ):
+        self.source = source
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.max_retry_delay = max_retry_delay
+        self.request_timeout = request_timeout
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def get_json(self, url, conditional=None):
+        """
+        GET a TMDB API URL and return its JSON. With a ConditionalFetch, the request
+        is conditional when revalidating, and a 304 returns None with not_modified set.
+        """
+        headers = conditional.request_headers() if conditional is not None else None
+        self.requests += 1
+        try:
+            response = await asyncio.wait_for(
+                self._get_with_retries(url, headers), self.request_timeout
+            )
+            if conditional is not None:
+                conditional.record_response(response)
+                conditional.record_body(response.num_bytes_downloaded)
+                if conditional.not_modified:
+                    return None
+            response.raise_for_status()
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            self.failures += 1
+            record_error(self.source, e)
+            raise
+        return response.json()
+
+    async def _get_with_retries(self, url, headers):
+        client = get_client(self.source)
+        for attempt in range(self.max_retries + 1):
+            await rate_limiter.acquire(self.source)
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+            except httpx.TransportError as e:
+                record_source_request(
+                    self.source, time.perf_counter() - started, outcome=type(e).__name__
+                )
+                if attempt == self.max_retries:
+                    raise
+                delay = self.get_backoff_delay(attempt)
+                logging.warning(
+                    f"TMDB request error, retrying in {delay:.2f}s: {type(e).__name__}: {str(e)}."
+                )
+            else:
+                record_source_request(
+                    self.source,
+                    time.perf_counter() - started,
+                    outcome="ok" if response.is_success else str(response.status_code),
+                )
+                rate_limiter.record_response(self.source, response)
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt == self.max_retries
+                ):
+                    return response
+
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None and retry_after > self.max_retry_delay:
+                    return response
+                delay = (
+                    retry_after
+                    if retry_after is not None
+                    else self.get_backoff_delay(attempt)
+                )
+                logging.warning(
+                    f"TMDB responded {response.status_code}, retrying in {delay:.2f}s."
+                )
+                await response.aclose()
+
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def get_backoff_delay(self, attempt):
+        """Exponential backoff with full jitter, capped at max_retry_delay"""
+        return random.uniform(
+            0, min(self.max_retry_delay, self.retry_base_delay * 2**attempt)
+        )
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+
+
+tmdb_client = TMDBClient()
+
+
+def get_tmdb_client_stats():
+    """Counters of TMDB API calls, retried attempts and failed calls"""
+    return tmdb_client.stats()
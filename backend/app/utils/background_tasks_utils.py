@@ -0,0 +1,67 @@
+import asyncio
+import logging
+
+
+class BackgroundTaskRunner:
+    """
+    Run fire-and-forget coroutines in the background, deduplicated by key and
+    with bounded concurrency. Scheduling a key that is already pending or
+    running is a no-op, and new work is dropped once max_pending is reached.
+    """
+
+    def __init__(self, max_concurrent=4, max_pending=100):
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self._semaphore = None
+        self._tasks = {}
+        self.scheduled = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def schedule(self, key, func, *args, **kwargs):
+        """Schedule func(*args, **kwargs) under key, returning whether it was scheduled"""
+        if key in self._tasks:
+            self.deduplicated += 1
+            return False
+
+        if len(self._tasks) >= self.max_pending:
+            self.dropped += 1
+            logging.warning(f"Background task queue full, dropping {key}")
+            return False
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        self.scheduled += 1
+        task = asyncio.create_task(self._run(key, func, *args, **kwargs))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return True
+
+    async def _run(self, key, func, *args, **kwargs):
+        async with self._semaphore:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                self.failed += 1
+                logging.error(
+                    f"Error in background task {key}: {type(e).__name__}: {str(e)}."
+                )
+
+    def pending(self, key):
+        return key in self._tasks
+
+    async def wait(self):
+        """Wait for every scheduled task to finish"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    def stats(self):
+        return {
+            "pending": len(self._tasks),
+            "scheduled": self.scheduled,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -0,0 +1,119 @@
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker over a sliding window of the most recent calls.
+
+    The circuit opens when, over at least min_calls calls, the failure rate or
+    the rate of calls slower than slow_call_duration reaches its threshold.
+    While open, calls fail fast. After open_duration it lets half_open_calls
+    probe calls through: a successful probe closes it, a failed one reopens it.
+    """
+
+    def __init__(
+        self,
+        window_size=20,
+        min_calls=5,
+        failure_rate_threshold=0.5,
+        slow_call_duration=5.0,
+        slow_call_rate_threshold=0.8,
+        open_duration=30.0,
+        half_open_calls=1,
+    ):
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.opened_at = 0
+        self.probes_in_flight = 0
+        self._calls = deque(maxlen=window_size)
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow_request(self):
+        """Check if a call may go through, counting it as a probe when half-open"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_duration:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_calls:
+                self.rejected += 1
+                return False
+            self.probes_in_flight += 1
+
+        return True
+
+    def record_success(self, duration):
+        self._record(failed=False, duration=duration)
+
+    def record_failure(self, duration):
+        self._record(failed=True, duration=duration)
+
+    def release(self):
+        """Forget an allowed call that finished without an outcome (e.g. cancelled)"""
+        if self.state == HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def _record(self, failed, duration):
+        slow = duration >= self.slow_call_duration
+
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if failed or slow:
+                self._open()
+            else:
+                self._close()
+            return
+
+        if self.state == OPEN:
+            return
+
+        self._calls.append((failed, slow))
+        if len(self._calls) < self.min_calls:
+            return
+
+        failure_rate = sum(failed for failed, _ in self._calls) / len(self._calls)
+        slow_rate = sum(slow for _, slow in self._calls) / len(self._calls)
+        if (
+            failure_rate >= self.failure_rate_threshold
+            or slow_rate >= self.slow_call_rate_threshold
+        ):
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._calls.clear()
+
+    def _close(self):
+        self.state = CLOSED
+        self._calls.clear()
+
+    def stats(self):
+        calls = len(self._calls)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failure_rate": (
+                round(sum(failed for failed, _ in self._calls) / calls, 3)
+                if calls
+                else 0
+            ),
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
@@ -0,0 +1,28 @@
+class ForwardDecay:
+    """
+    Exponentially decayed counts with forward decay: an event at time t adds
+    2 ** ((t - landmark) / half_life) to its item's score, so scores never need
+    rewriting as time passes and rank items by their decayed count. Weights grow
+    with t, so scores are rescaled onto a newer landmark once in a while.
+    """
+
+    def __init__(self, half_life, max_exponent=40):
+        self.half_life = half_life
+        self.max_exponent = max_exponent
+
+    def weight(self, timestamp, landmark):
+        """Score added by one event at timestamp"""
+        return 2 ** ((timestamp - landmark) / self.half_life)
+
+    def needs_rescale(self, timestamp, landmark):
+        """Whether weights have grown enough to move the landmark to timestamp"""
+        return (timestamp - landmark) / self.half_life > self.max_exponent
+
+    def rescale_factor(self, landmark, new_landmark):
+        """Factor that converts scores from landmark onto new_landmark"""
+        return 2 ** (-(new_landmark - landmark) / self.half_life)
+
+    def decayed_count(self, score, timestamp, landmark):
+        """The decayed count a score stands for at timestamp"""
+        return score / self.weight(timestamp, landmark)
+
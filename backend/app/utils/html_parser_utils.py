@@ -0,0 +1,53 @@
+import importlib.util
+
+from bs4 import BeautifulSoup, SoupStrainer
+from environs import Env
+
+env = Env()
+env.read_env()
+
+# Prefer the C-backed lxml parser when it is installed
+DEFAULT_HTML_PARSER = (
+    "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+)
+HTML_PARSER = env.str("HTML_PARSER", DEFAULT_HTML_PARSER)
+
+
+def parse_html(content, parse_only=None, parser=None):
+    """Parse HTML with the configured parser, optionally keeping only parse_only matches"""
+    return BeautifulSoup(content, parser or HTML_PARSER, parse_only=parse_only)
+
+
+def element_strainer(*elements):
+    """
+    Build a SoupStrainer that keeps only the given elements (and their children).
+    Each element is a (tag name, attrs) pair; a "class" value matches when all of
+    its classes are on the tag, as with find_all(class_=...).
+    """
+
+    def matches(name, attrs):
+        return any(
+            _matches_element(name, attrs, element_name, element_attrs)
+            for element_name, element_attrs in elements
+        )
+
+    return SoupStrainer(matches)
+
+
+def _matches_element(name, attrs, element_name, element_attrs):
+    if name != element_name:
+        return False
+
+    for attr_name, expected in element_attrs.items():
+        value = attrs.get(attr_name)
+        if value is None:
+            return False
+
+        if attr_name == "class":
+            classes = value if isinstance(value, list) else value.split()
+            if not set(expected.split()).issubset(classes):
+                return False
+        elif value != expected:
+            return False
+
+    return True
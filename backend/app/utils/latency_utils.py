@@ -0,0 +1,25 @@
+from collections import deque
+
+
+class LatencyRecorder:
+    """Keeps the most recent latencies (in seconds) and reports percentiles in ms"""
+
+    def __init__(self, max_samples=1000):
+        self._samples = deque(maxlen=max_samples)
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+
+    def percentile(self, percent):
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return round(ordered[index] * 1000, 2)
+
+    def stats(self):
+        return {
+            "samples": len(self._samples),
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+        }
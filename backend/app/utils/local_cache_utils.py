@@ -0,0 +1,130 @@
+import sys
+import time
+from collections import OrderedDict
+
+# Keys whose latest invalidation is remembered to check fills against
+MAX_TRACKED_INVALIDATIONS = 1024
+
+
+def estimate_size(value):
+    """Approximate memory size in bytes of a decoded JSON-compatible value"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with a per-entry TTL.
+    Entries are evicted least recently used first once either max_entries or
+    max_bytes (sum of the sizes given to set, see estimate_size) is exceeded.
+    Cached values are shared between callers and must be treated as read-only.
+
+    A value fetched from the shared cache may be invalidated while it is being
+    fetched, so fills pass the generation read before fetching it and are
+    dropped if its key was invalidated since.
+    """
+
+    def __init__(self, max_entries=500, max_bytes=20_000_000, ttl=60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.generation = 0
+        # Generation of the latest invalidation of each recently invalidated key;
+        # older ones are only known to be no later than _forgotten_generation
+        self._invalidated = OrderedDict()
+        self._forgotten_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.dropped_fills = 0
+
+    def get(self, key):
+        """Get a value, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, size, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, size, ttl=None, generation=None):
+        """
+        Store a value with its approximate size in bytes. With the generation
+        read before the value was fetched, a value invalidated since is dropped.
+        """
+        if generation is not None and self.invalidated_since(key, generation):
+            self.dropped_fills += 1
+            return
+        if size > self.max_bytes:
+            return
+
+        self._remove(key)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, size, expires_at)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self.generation += 1
+        self._invalidated[key] = self.generation
+        self._invalidated.move_to_end(key)
+        if len(self._invalidated) > MAX_TRACKED_INVALIDATIONS:
+            _, self._forgotten_generation = self._invalidated.popitem(last=False)
+
+        if self._remove(key):
+            self.invalidations += 1
+
+    def invalidated_since(self, key, generation):
+        """Whether key may have been invalidated after generation was read"""
+        if self._forgotten_generation > generation:
+            return True
+        return self._invalidated.get(key, 0) > generation
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self.generation += 1
+        self._invalidated.clear()
+        self._forgotten_generation = self.generation
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1]
+        return True
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "dropped_fills": self.dropped_fills,
+        }
@@ -0,0 +1,95 @@
+import itertools
+import re
+from collections import OrderedDict
+
+from unidecode import unidecode
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_query(text):
+    """Fold case, diacritics, punctuation and whitespace so equivalent queries match"""
+    return _NON_ALPHANUMERIC.sub(" ", unidecode(text or "").lower()).strip()
+
+
+class PrefixIndex:
+    """
+    In-memory prefix index of titles for answering short search queries locally.
+
+    Every word prefix (up to max_prefix_length characters) of a normalized title
+    maps to the titles containing it, so a lookup is a single dict access. The
+    index holds at most max_entries titles, evicting the least recently added
+    first. Titles that start with the query rank before titles where only a
+    later word does, then by most recently added.
+    """
+
+    def __init__(self, max_entries=5000, max_prefix_length=8):
+        self.max_entries = max_entries
+        self.max_prefix_length = max_prefix_length
+        self._entries = OrderedDict()
+        self._prefixes = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def add(self, key, title, value):
+        """Index value under the prefixes of title, replacing any entry for key"""
+        self.remove(key)
+        normalized_title = normalize_query(title)
+        prefixes = self._title_prefixes(normalized_title)
+        self._entries[key] = (normalized_title, value, prefixes, next(self._counter))
+        for prefix in prefixes:
+            self._prefixes.setdefault(prefix, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self.remove(next(iter(self._entries)))
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for prefix in entry[2]:
+            keys = self._prefixes.get(prefix)
+            keys.discard(key)
+            if not keys:
+                del self._prefixes[prefix]
+
+    def search(self, query, limit=20):
+        """Values of the indexed titles matching a query, best matches first"""
+        normalized_query = normalize_query(query)
+        if not normalized_query:
+            return []
+
+        words = normalized_query.split()
+        candidates = None
+        for word in words:
+            keys = self._prefixes.get(word[: self.max_prefix_length], set())
+            candidates = keys if candidates is None else candidates & keys
+            if not candidates:
+                return []
+
+        # Prefixes are truncated in the index, so confirm each word against the title
+        matches = []
+        for key in candidates:
+            normalized_title, value, _, added = self._entries[key]
+            title_words = normalized_title.split()
+            if all(
+                any(title_word.startswith(word) for title_word in title_words)
+                for word in words
+            ):
+                starts_with_query = normalized_title.startswith(normalized_query)
+                matches.append((not starts_with_query, -added, value))
+
+        matches.sort(key=lambda match: match[:2])
+        return [value for _, _, value in matches[:limit]]
+
+    def _title_prefixes(self, normalized_title):
+        return {
+            word[:length]
+            for word in normalized_title.split()
+            for length in range(1, min(len(word), self.max_prefix_length) + 1)
+        }
@@ -0,0 +1,151 @@
+import asyncio
+import heapq
+import itertools
+import time
+from email.utils import parsedate_to_datetime
+
+USER_PRIORITY = 0
+BACKGROUND_PRIORITY = 1
+
+
+class TokenBucket:
+    """
+    Asynchronous token bucket with priorities and AIMD rate adaptation.
+
+    Tokens refill at `rate` per second up to `capacity`. Waiters are served in
+    priority order (lower first), and background requests leave `reserve`
+    tokens in the bucket so user requests can always burst. Throttling
+    responses halve the rate and pause the bucket (for Retry-After when given),
+    and every success adds back increase / rate, up to max_rate.
+    """
+
+    def __init__(
+        self,
+        rate,
+        capacity,
+        min_rate=None,
+        max_rate=None,
+        reserve=0,
+        increase=1.0,
+        decrease_factor=0.5,
+        pause=1.0,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate or rate / 10
+        self.max_rate = max_rate or rate
+        self.reserve = reserve
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.pause = pause
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0
+        self.last_decrease = 0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._wakeup_handle = None
+        self.acquired = 0
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        return now
+
+    def _required_tokens(self, priority):
+        return 1 + (self.reserve if priority > USER_PRIORITY else 0)
+
+    async def acquire(self, priority=USER_PRIORITY):
+        """Wait for a token, serving higher priority waiters first"""
+        now = self._refill()
+        if (
+            not self._waiters
+            and now >= self.paused_until
+            and self.tokens >= self._required_tokens(priority)
+        ):
+            self.tokens -= 1
+            self.acquired += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._schedule_wakeup(0)
+        await future
+
+    def _schedule_wakeup(self, delay):
+        if self._wakeup_handle is not None:
+            self._wakeup_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._wakeup_handle = loop.call_later(max(delay, 0), self._wakeup)
+
+    def _wakeup(self):
+        self._wakeup_handle = None
+        now = self._refill()
+
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            if now < self.paused_until:
+                self._schedule_wakeup(self.paused_until - now)
+                return
+
+            required = self._required_tokens(priority)
+            if self.tokens < required:
+                self._schedule_wakeup((required - self.tokens) / self.rate)
+                return
+
+            heapq.heappop(self._waiters)
+            self.tokens -= 1
+            self.acquired += 1
+            future.set_result(None)
+
+    def on_success(self):
+        """Additive increase of the rate after a successful response"""
+        self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttled(self, retry_after=None):
+        """Multiplicative decrease of the rate and a pause after a throttling response"""
+        now = time.monotonic()
+        self.throttled += 1
+        self.paused_until = max(
+            self.paused_until, now + (retry_after if retry_after else self.pause)
+        )
+        self.tokens = 0
+        self.updated_at = now
+
+        # Responses to requests sent before the last decrease carry no new signal
+        if now - self.last_decrease >= 1 / self.rate:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.last_decrease = now
+
+    def stats(self):
+        return {
+            "rate": round(self.rate, 3),
+            "tokens": round(self.tokens, 3),
+            "waiting": len(self._waiters),
+            "paused_for": round(max(0, self.paused_until - time.monotonic()), 3),
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+        }
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,133 @@
+"""
+Versioned binary envelope for cached values.
+
+An encoded value is a 6-byte header followed by the payload:
+    NUL "RR" | version | codec | compression
+Legacy values (plain JSON text written before the envelope existed) never start
+with a NUL byte, so they are still read transparently.
+"""
+import json
+import zlib
+
+from environs import Env
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+env = Env()
+env.read_env()
+
+MAGIC = b"\x00RR"
+VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+CODECS = {"json": 1, "msgpack": 2}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+DEFAULT_CODEC = "msgpack" if msgpack is not None else "json"
+DEFAULT_COMPRESSION = "zstd" if zstandard is not None else "zlib"
+
+CACHE_CODEC = env.str("CACHE_CODEC", DEFAULT_CODEC)
+CACHE_COMPRESSION = env.str("CACHE_COMPRESSION", DEFAULT_COMPRESSION)
+# Payloads smaller than this are stored uncompressed
+COMPRESSION_THRESHOLD = env.int("CACHE_COMPRESSION_THRESHOLD", 1024)
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+class SerializationError(ValueError):
+    pass
+
+
+def encode_value(value, codec=None, compression=None):
+    """Encode a JSON-compatible value into the versioned envelope"""
+    codec = codec or CACHE_CODEC
+    compression = compression or CACHE_COMPRESSION
+
+    payload = _dumps(value, codec)
+    if compression == "none" or len(payload) < COMPRESSION_THRESHOLD:
+        compression = "none"
+    else:
+        payload = _compress(payload, compression)
+
+    header = MAGIC + bytes([VERSION, CODECS[codec], COMPRESSIONS[compression]])
+    return header + payload
+
+
+def decode_value(data):
+    """Decode an enveloped value, or a legacy plain JSON value"""
+    if isinstance(data, str):
+        return json.loads(data)
+
+    if not data.startswith(MAGIC):
+        return json.loads(data)
+
+    version, codec_id, compression_id = data[len(MAGIC) : HEADER_SIZE]
+    if version != VERSION:
+        raise SerializationError(f"Unsupported cache envelope version: {version}")
+
+    try:
+        payload = _decompress(data[HEADER_SIZE:], compression_id)
+        return _loads(payload, codec_id)
+    except SerializationError:
+        raise
+    except Exception as e:
+        raise SerializationError(f"Corrupt cached value: {type(e).__name__}: {e}") from e
+
+
+def _dumps(value, codec):
+    if codec == "msgpack":
+        if msgpack is None:
+            raise SerializationError("msgpack is not installed")
+        return msgpack.packb(value, use_bin_type=True)
+    if codec == "json":
+        if orjson is not None:
+            return orjson.dumps(value)
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+    raise SerializationError(f"Unknown cache codec: {codec}")
+
+
+def _loads(payload, codec_id):
+    if codec_id == CODECS["msgpack"]:
+        if msgpack is None:
+            raise SerializationError("msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    if codec_id == CODECS["json"]:
+        if orjson is not None:
+            return orjson.loads(payload)
+        return json.loads(payload)
+    raise SerializationError(f"Unknown cache codec id: {codec_id}")
+
+
+def _compress(payload, compression):
+    if compression == "zstd":
+        if zstandard is None:
+            raise SerializationError("zstandard is not installed")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    if compression == "zlib":
+        return zlib.compress(payload, ZLIB_LEVEL)
+    raise SerializationError(f"Unknown cache compression: {compression}")
+
+
+def _decompress(payload, compression_id):
+    if compression_id == COMPRESSIONS["none"]:
+        return payload
+    if compression_id == COMPRESSIONS["zlib"]:
+        return zlib.decompress(payload)
+    if compression_id == COMPRESSIONS["zstd"]:
+        if zstandard is None:
+            raise SerializationError("zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise SerializationError(f"Unknown cache compression id: {compression_id}")
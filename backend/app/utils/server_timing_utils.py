@@ -0,0 +1,57 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+current_server_timing = contextvars.ContextVar("current_server_timing", default=None)
+
+
+class ServerTiming:
+    """
+    Durations of the stages of one request, for its Server-Timing header.
+    Stages recorded more than once (two pages from the same source) are summed;
+    stages that ran concurrently overlap, so they do not add up to the total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0) + duration
+
+    def as_dict(self):
+        """Stage durations in milliseconds, with the total so far"""
+        durations = {
+            name: round(duration * 1000, 1) for name, duration in self.durations.items()
+        }
+        durations["total"] = round((time.perf_counter() - self.started) * 1000, 1)
+        return durations
+
+    def header(self):
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_dict().items())
+
+
+@contextmanager
+def recording_server_timing():
+    """Record the stages timed within the block (and tasks created in it)"""
+    timing = ServerTiming()
+    token = current_server_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        current_server_timing.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Time the enclosed stage into the current request's ServerTiming, if any"""
+    timing = current_server_timing.get()
+    if timing is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - started)
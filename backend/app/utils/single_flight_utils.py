@@ -0,0 +1,46 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one in-flight computation.
+    The first caller for a key starts the work, later callers await its result.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self.originating = 0
+        self.coalesced = 0
+
+    async def run(self, key, func, *args, **kwargs):
+        task = self.start(key, func, *args, **kwargs)
+
+        # Shield so a cancelled caller (e.g. client disconnect) does not cancel
+        # the computation shared with the other callers
+        return await asyncio.shield(task)
+
+    def start(self, key, func, *args, **kwargs):
+        """The task computing key, started with func unless one is in flight"""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.originating += 1
+            task = asyncio.create_task(func(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return task
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def in_flight(self, key):
+        return key in self._in_flight
+
+    def stats(self):
+        return {
+            "originating": self.originating,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
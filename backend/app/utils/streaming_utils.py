@@ -0,0 +1,52 @@
+class StreamTarget:
+    """
+    Describes when a streamed page has been read far enough to extract a value.
+    The stream can stop once every (start, end) marker pair has been seen (the
+    end marker after its start marker), once any stop marker has been seen, or
+    once byte_budget decoded bytes have been read.
+    """
+
+    def __init__(self, markers, stop_markers=(), byte_budget=1_000_000):
+        self.markers = markers
+        self.stop_markers = stop_markers
+        self.byte_budget = byte_budget
+
+    def scanner(self):
+        return StreamScanner(self)
+
+
+class StreamScanner:
+    """Incrementally scans a growing buffer for the markers of a StreamTarget"""
+
+    def __init__(self, target):
+        self.target = target
+        self.found = [None] * len(target.markers)
+        self.complete = [False] * len(target.markers)
+        self.scanned = 0
+
+    def reached(self, buffer):
+        """Check the bytes added to buffer since the last call"""
+        longest_marker = max(
+            [len(marker) for pair in self.target.markers for marker in pair]
+            + [len(marker) for marker in self.target.stop_markers]
+            + [0]
+        )
+        start = max(0, self.scanned - longest_marker)
+        self.scanned = len(buffer)
+
+        for marker in self.target.stop_markers:
+            if buffer.find(marker, start) != -1:
+                return True
+
+        for i, (start_marker, end_marker) in enumerate(self.target.markers):
+            if self.complete[i]:
+                continue
+            if self.found[i] is None:
+                position = buffer.find(start_marker, start)
+                if position == -1:
+                    continue
+                self.found[i] = position + len(start_marker)
+            if buffer.find(end_marker, max(self.found[i], start)) != -1:
+                self.complete[i] = True
+
+        return all(self.complete) or len(buffer) >= self.target.byte_budget
@@ -1,17 +1,17 @@
 import asyncio
 import logging
-import random
 
 
-async def throttled_fetch(fetch_func, items, target_duration=300, max_concurrent=3):
+async def throttled_fetch(fetch_func, items, max_concurrent=3):
+    """
+    Process items with at most max_concurrent in flight. Requests are paced by
+    the per-host rate limits in app.rate_limiter rather than fixed delays.
+    """
     semaphore = asyncio.Semaphore(max_concurrent)
     total_items = len(items)
-    average_delay = (target_duration / total_items) * max_concurrent
 
     async def fetch_with_throttle(item, item_index):
         async with semaphore:
-            delay = random.uniform(average_delay * 0.5, average_delay * 1.5)
-            await asyncio.sleep(delay)
             start_time = asyncio.get_event_loop().time()
             try:
                 result = await fetch_func(item)
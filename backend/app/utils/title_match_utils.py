@@ -0,0 +1,150 @@
+"""
+Title matching for picking the right row out of a search results page.
+
+Titles are normalized once, every candidate is scored in one batched call, and
+the best row wins rather than the first one over the threshold. A candidate
+matches when its title score is over MATCH_THRESHOLD within a year of the
+release; the year distance only lowers its rank. The title score is the best of the edit-distance
+similarity of the titles and of their sorted words (so "Godfather, The" matches
+"The Godfather"). rapidfuzz computes it in C when installed; the pure Python
+fallback gives the same scores with a bit-parallel LCS.
+"""
+import re
+from functools import lru_cache
+
+from unidecode import unidecode
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    fuzz = process = None
+
+MATCH_THRESHOLD = 0.79
+MAX_YEAR_DISTANCE = 1
+# Ranking score taken off per year between the candidate and the release year
+YEAR_PENALTY = 0.05
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+_LEADING_ARTICLE = re.compile(r"^(the|a|an) ")
+_TRAILING_ARTICLE = re.compile(r"^(.*), (the|a|an)$")
+
+
+@lru_cache(maxsize=4096)
+def normalize_title(title):
+    """Fold diacritics, case, punctuation and a leading (or ", The" trailing) article"""
+    title = unidecode(title or "").lower().replace("&", " and ").strip()
+    title = _TRAILING_ARTICLE.sub(r"\2 \1", title)
+    title = _NON_ALPHANUMERIC.sub(" ", title).strip()
+    return _LEADING_ARTICLE.sub("", title)
+
+
+def title_scores(title, candidates):
+    """Similarity (0 to 1) of title to each candidate title, in one batched call"""
+    query = normalize_title(title)
+    normalized = [normalize_title(candidate) for candidate in candidates]
+    if not normalized:
+        return []
+
+    # Word order only matters for candidates whose sorted words differ
+    query_sorted = _sort_words(query)
+    reordered = {}
+    for index, candidate in enumerate(normalized):
+        candidate_sorted = _sort_words(candidate)
+        if candidate_sorted != candidate or query_sorted != query:
+            reordered[index] = candidate_sorted
+
+    if process is not None:
+        scores = _extract_ratios(query, normalized)
+        sorted_scores = _extract_ratios(query_sorted, list(reordered.values()))
+        for index, score in zip(reordered, sorted_scores):
+            scores[index] = max(scores[index], score)
+        return [score / 100 for score in scores]
+
+    query_masks = _char_masks(query)
+    scores = [_indel_ratio(query, query_masks, candidate) for candidate in normalized]
+    if reordered:
+        query_sorted_masks = _char_masks(query_sorted)
+        for index, candidate_sorted in reordered.items():
+            scores[index] = max(
+                scores[index],
+                _indel_ratio(query_sorted, query_sorted_masks, candidate_sorted),
+            )
+    return scores
+
+
+def rank_candidates(
+    title,
+    year,
+    candidates,
+    threshold=MATCH_THRESHOLD,
+    max_year_distance=MAX_YEAR_DISTANCE,
+):
+    """
+    Rank (title, year) candidates against a title and year, best first, as
+    (index, score) pairs. Candidates further than max_year_distance from year
+    or with a title score not over threshold are left out; a year of None is
+    not checked. The score ranked on is the title score less the year penalty.
+    """
+    # Only titles within the year window are scored
+    distances = {}
+    for index, (_, candidate_year) in enumerate(candidates):
+        if year is None or candidate_year is None:
+            distances[index] = 0
+            continue
+        distance = abs(int(candidate_year) - int(year))
+        if distance <= max_year_distance:
+            distances[index] = distance
+
+    scores = title_scores(title, [candidates[index][0] for index in distances])
+
+    ranked = []
+    for (index, distance), score in zip(distances.items(), scores):
+        if score > threshold:
+            ranked.append((index, score - distance * YEAR_PENALTY))
+
+    ranked.sort(key=lambda ranking: (-ranking[1], ranking[0]))
+    return ranked
+
+
+def best_match(title, year, candidates, **kwargs):
+    """Index of the best (title, year) candidate for a title and year, or None"""
+    ranked = rank_candidates(title, year, candidates, **kwargs)
+    return ranked[0][0] if ranked else None
+
+
+def _extract_ratios(query, choices):
+    if not choices:
+        return []
+    ratios = [0] * len(choices)
+    for _, ratio, index in process.extract(
+        query, choices, scorer=fuzz.ratio, limit=None
+    ):
+        ratios[index] = ratio
+    return ratios
+
+
+def _sort_words(title):
+    return " ".join(sorted(title.split()))
+
+
+def _char_masks(text):
+    masks = {}
+    for i, char in enumerate(text):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def _indel_ratio(a, a_masks, b):
+    """2 * LCS / (len(a) + len(b)), as rapidfuzz's fuzz.ratio / 100"""
+    total = len(a) + len(b)
+    if not total:
+        return 1.0
+
+    # Hyyro's bit-parallel LCS: each zero bit of v is a matched character of a
+    all_ones = (1 << len(a)) - 1
+    v = all_ones
+    for char in b:
+        u = v & a_masks.get(char, 0)
+        v = ((v + u) | (v - u)) & all_ones
+    lcs = len(a) - bin(v).count("1")
+    return 2 * lcs / total
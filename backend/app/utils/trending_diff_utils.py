@@ -0,0 +1,19 @@
+def get_title_key(title):
+    return (title["media_type"], str(title["tmdb_id"]))
+
+
+def diff_titles(previous, current):
+    """
+    Compare two ranked title lists. Returns the titles of current that are new
+    and those that were already in previous (both in current's rank order), and
+    the titles of previous that dropped out.
+    """
+    previous_keys = {get_title_key(title) for title in previous}
+    current_keys = {get_title_key(title) for title in current}
+    return {
+        "new": [title for title in current if get_title_key(title) not in previous_keys],
+        "kept": [title for title in current if get_title_key(title) in previous_keys],
+        "dropped": [
+            title for title in previous if get_title_key(title) not in current_keys
+        ],
+    }
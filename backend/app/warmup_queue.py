@@ -0,0 +1,267 @@
+"""
+This module runs the trending warm-up as jobs in a Redis Stream, one per title,
+so that it survives worker restarts and scales with the number of consumers.
+
+Each run adds its titles to the stream and starts a progress hash. Consumers in
+every app worker (and any dedicated process, see app.warmup_worker) read jobs
+through a consumer group and acknowledge them once handled:
+- a failed job is retried with exponential backoff from a delayed-jobs ZSET,
+  and moved to a dead-letter stream after WARMUP_MAX_ATTEMPTS;
+- jobs left unacknowledged by a crashed consumer are claimed by another one
+  with XAUTOCLAIM after WARMUP_CLAIM_IDLE_SECONDS.
+"""
+import asyncio
+import json
+import logging
+import socket
+import time
+import uuid
+
+import redis.exceptions
+from environs import Env
+from app import rate_limiter
+from app.metrics import record_error, warmup_jobs
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+env = Env()
+env.read_env()
+
+WARMUP_QUEUE_ENABLED = env.bool("WARMUP_QUEUE_ENABLED", True)
+WARMUP_CONSUMER_ENABLED = env.bool("WARMUP_CONSUMER_ENABLED", True)
+WARMUP_CONSUMER_CONCURRENCY = env.int("WARMUP_CONSUMER_CONCURRENCY", 3)
+WARMUP_MAX_ATTEMPTS = env.int("WARMUP_MAX_ATTEMPTS", 4)
+WARMUP_RETRY_BASE_DELAY = env.float("WARMUP_RETRY_BASE_DELAY", 30)
+# A job unacknowledged this long is taken to belong to a crashed consumer
+WARMUP_CLAIM_IDLE_SECONDS = env.int("WARMUP_CLAIM_IDLE_SECONDS", 10 * 60)
+
+STREAM_KEY = "warmup_jobs"
+GROUP_NAME = "warmup_workers"
+DELAYED_KEY = "warmup_delayed"
+DEAD_LETTER_KEY = "warmup_dead_letter"
+CURRENT_RUN_KEY = "warmup_current_run"
+STREAM_MAX_LENGTH = 10_000
+PROGRESS_CACHE_SECONDS = 7 * 24 * 60 * 60
+# Kept below REDIS_SOCKET_TIMEOUT so a blocking read is not taken for a dead connection
+READ_BLOCK_MS = 1000
+ERROR_RETRY_DELAY = 5  # seconds before reading again after a Redis error
+
+
+def get_progress_key(run_id):
+    return f"warmup_progress_{run_id}"
+
+
+def get_consumer_name():
+    return f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+
+
+def get_retry_delay(attempt):
+    """Backoff before retrying a job that failed attempt times"""
+    return WARMUP_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+
+
+async def ensure_consumer_group():
+    try:
+        await redis_client.xgroup_create(STREAM_KEY, GROUP_NAME, id="0", mkstream=True)
+    except redis.exceptions.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def enqueue_warm_up(movies):
+    """Add one job per title to the queue as a new run, returning its run ID"""
+    run_id = uuid.uuid4().hex[:12]
+    now = time.time()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for movie in movies:
+            pipe.xadd(
+                STREAM_KEY,
+                _job_fields(movie["tmdb_id"], movie["media_type"], run_id),
+                maxlen=STREAM_MAX_LENGTH,
+                approximate=True,
+            )
+        progress_key = get_progress_key(run_id)
+        pipe.hset(
+            progress_key,
+            mapping={
+                "run_id": run_id,
+                "total": len(movies),
+                "done": 0,
+                "skipped": 0,
+                "retried": 0,
+                "dead": 0,
+                "started_at": now,
+                "updated_at": now,
+            },
+        )
+        pipe.expire(progress_key, PROGRESS_CACHE_SECONDS)
+        pipe.set(CURRENT_RUN_KEY, run_id, ex=PROGRESS_CACHE_SECONDS)
+        await pipe.execute()
+
+    logging.info(f"Queued {len(movies)} titles for warm-up run {run_id}")
+    return run_id
+
+
+async def run_consumer(handler, consumer_name=None, concurrency=None, stop=None):
+    """
+    Handle warm-up jobs until stop is set (or the task is cancelled).
+    handler(tmdb_id, media_type) returns whether the title was fetched, and
+    raises to have the job retried.
+    """
+    consumer_name = consumer_name or get_consumer_name()
+    concurrency = concurrency or WARMUP_CONSUMER_CONCURRENCY
+    stop = stop or asyncio.Event()
+    logging.info(f"Warm-up consumer {consumer_name} started")
+
+    while not stop.is_set():
+        try:
+            await ensure_consumer_group()
+            await promote_due_jobs()
+            jobs = await claim_stale_jobs(consumer_name, concurrency)
+            if not jobs:
+                jobs = await read_jobs(consumer_name, concurrency)
+            await asyncio.gather(*(handle_job(handler, *job) for job in jobs))
+        except asyncio.CancelledError:
+            raise
+        except redis.exceptions.RedisError as e:
+            logging.error(f"Warm-up queue error: {type(e).__name__}: {str(e)}.")
+            await asyncio.sleep(ERROR_RETRY_DELAY)
+
+    logging.info(f"Warm-up consumer {consumer_name} stopped")
+
+
+async def read_jobs(consumer_name, count):
+    response = await redis_client.xreadgroup(
+        GROUP_NAME, consumer_name, {STREAM_KEY: ">"}, count=count, block=READ_BLOCK_MS
+    )
+    return [
+        (message_id, _decode_fields(fields))
+        for _, messages in response or []
+        for message_id, fields in messages
+    ]
+
+
+async def claim_stale_jobs(consumer_name, count):
+    """Take over the jobs of consumers that stopped before acknowledging them"""
+    _, messages, *_ = await redis_client.xautoclaim(
+        STREAM_KEY,
+        GROUP_NAME,
+        consumer_name,
+        min_idle_time=WARMUP_CLAIM_IDLE_SECONDS * 1000,
+        count=count,
+    )
+    jobs = [
+        (message_id, _decode_fields(fields))
+        for message_id, fields in messages
+        if fields is not None
+    ]
+    if jobs:
+        logging.warning(f"Claimed {len(jobs)} stale warm-up jobs")
+    for message_id, job in jobs:
+        # Each delivery to a consumer that crashed counts as a failed attempt
+        pending = await redis_client.xpending_range(
+            STREAM_KEY, GROUP_NAME, min=message_id, max=message_id, count=1
+        )
+        if pending:
+            deliveries = pending[0]["times_delivered"]
+            job["attempt"] = str(int(job["attempt"]) + deliveries - 1)
+    return jobs
+
+
+async def promote_due_jobs():
+    """Move delayed retries whose backoff has elapsed back onto the stream"""
+    due_jobs = await redis_client.zrangebyscore(DELAYED_KEY, 0, time.time())
+    for serialized_job in due_jobs:
+        # Only the consumer whose ZREM succeeds re-adds the job
+        if await redis_client.zrem(DELAYED_KEY, serialized_job):
+            await redis_client.xadd(
+                STREAM_KEY,
+                json.loads(serialized_job),
+                maxlen=STREAM_MAX_LENGTH,
+                approximate=True,
+            )
+
+
+async def handle_job(handler, message_id, job):
+    attempt = int(job["attempt"])
+    try:
+        if attempt > WARMUP_MAX_ATTEMPTS:
+            raise RuntimeError(f"Abandoned by its consumer {attempt - 1} times")
+        # Warm-up requests yield to user requests
+        with rate_limiter.background_priority():
+            fetched = await handler(job["tmdb_id"], job["media_type"])
+        outcome = "done" if fetched else "skipped"
+    except Exception as e:
+        logging.error(
+            f"Warm-up job {job['media_type']} {job['tmdb_id']} failed "
+            f"(attempt {attempt}): {type(e).__name__}: {str(e)}."
+        )
+        record_error("warmup", e)
+        outcome = await retry_or_dead_letter(job, attempt, e)
+
+    warmup_jobs.labels(outcome).inc()
+
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.xack(STREAM_KEY, GROUP_NAME, message_id)
+        pipe.xdel(STREAM_KEY, message_id)
+        progress_key = get_progress_key(job["run_id"])
+        pipe.hincrby(progress_key, outcome, 1)
+        pipe.hset(progress_key, "updated_at", time.time())
+        pipe.expire(progress_key, PROGRESS_CACHE_SECONDS)
+        await pipe.execute()
+
+
+async def retry_or_dead_letter(job, attempt, error):
+    if attempt >= WARMUP_MAX_ATTEMPTS:
+        await redis_client.xadd(
+            DEAD_LETTER_KEY,
+            {**job, "error": f"{type(error).__name__}: {str(error)}"},
+            maxlen=STREAM_MAX_LENGTH,
+            approximate=True,
+        )
+        return "dead"
+
+    retry_job = _job_fields(job["tmdb_id"], job["media_type"], job["run_id"], attempt + 1)
+    await redis_client.zadd(
+        DELAYED_KEY, {json.dumps(retry_job): time.time() + get_retry_delay(attempt)}
+    )
+    return "retried"
+
+
+async def get_warmup_progress(run_id=None):
+    """Progress counters of a warm-up run (the latest by default), and queue sizes"""
+    try:
+        if run_id is None:
+            run_id = await redis_client.get(CURRENT_RUN_KEY)
+        progress = {}
+        if run_id:
+            progress = _decode_fields(
+                await redis_client.hgetall(get_progress_key(_decode(run_id)))
+            )
+        return {
+            **progress,
+            "queued": await redis_client.xlen(STREAM_KEY),
+            "delayed": await redis_client.zcard(DELAYED_KEY),
+            "dead_letter": await redis_client.xlen(DEAD_LETTER_KEY),
+        }
+    except redis.exceptions.RedisError as e:
+        logging.error(f"Error reading warm-up progress: {type(e).__name__}: {str(e)}.")
+        return {}
+
+
+def _job_fields(tmdb_id, media_type, run_id, attempt=1):
+    return {
+        "tmdb_id": str(tmdb_id),
+        "media_type": media_type,
+        "run_id": run_id,
+        "attempt": str(attempt),
+    }
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _decode_fields(fields):
+    return {_decode(name): _decode(value) for name, value in fields.items()}
@@ -0,0 +1,46 @@
+"""
+Dedicated warm-up consumer process, for running warm-up jobs outside the app
+workers (set WARMUP_CONSUMER_ENABLED=false on the app to leave them all to it):
+    python -m app.warmup_worker
+Each one has its own outbound rate limits, so count them in RATE_LIMIT_PROCESSES
+(on the app workers and here) to keep the total within the configured rates.
+"""
+import asyncio
+import logging
+import signal
+from functools import partial
+
+from environs import Env
+from app.http_client import close_http_clients, start_http_clients
+from app.redis_client import close_redis
+from app.tmdb_api import warm_up_title
+from app.warmup_queue import run_consumer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+env = Env()
+env.read_env()
+
+TMDB_API_KEY = env.str("TMDB_API_KEY")
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    await start_http_clients()
+    try:
+        await run_consumer(partial(warm_up_title, api_key=TMDB_API_KEY), stop=stop)
+    finally:
+        await close_http_clients()
+        await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
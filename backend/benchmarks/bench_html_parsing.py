@@ -0,0 +1,84 @@
+"""
+Micro-benchmark of HTML parsing for each extractor in app.data_collection:
+ms per page and peak allocated memory for the full-page html.parser tree
+(the previous make_request) versus lxml and the per-source PARSE_ONLY
+strainers, checking every mode extracts the same value.
+
+Run from the backend directory:
+    python -m benchmarks.bench_html_parsing
+"""
+import importlib.util
+import time
+import tracemalloc
+
+from app.data_collection import (
+    PARSE_ONLY,
+    extract_box_office_amounts,
+    extract_commonsense_info,
+    extract_imdb_rating,
+    extract_justwatch_page,
+    extract_letterboxd_rating,
+    extract_letterboxd_url,
+    extract_rottentomatoes_scores,
+    extract_rottentomatoes_url,
+)
+from app.utils.html_parser_utils import parse_html
+from benchmarks.fixtures import load_page
+
+ITERATIONS = 10
+
+EXTRACTORS = {
+    "imdb_title": extract_imdb_rating,
+    "rottentomatoes_title": extract_rottentomatoes_scores,
+    "letterboxd_film": extract_letterboxd_rating,
+    "rottentomatoes_search": lambda soup: extract_rottentomatoes_url(
+        soup, "Film 12", "2012", "movie"
+    ),
+    "letterboxd_search": lambda soup: extract_letterboxd_url(soup, "2012"),
+    "commonsensemedia_search": lambda soup: extract_commonsense_info(
+        soup, "Film 12", "2012", "movie"
+    ),
+    "boxofficemojo_title": extract_box_office_amounts,
+    "justwatch_page": extract_justwatch_page,
+}
+
+
+def measure(content, extractor, parser, parse_only):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        value = extractor(parse_html(content, parse_only, parser))
+    ms_per_page = (time.perf_counter() - start) * 1000 / ITERATIONS
+
+    tracemalloc.start()
+    extractor(parse_html(content, parse_only, parser))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return value, ms_per_page, peak / 1024
+
+
+def main():
+    parsers = ["html.parser"]
+    if importlib.util.find_spec("lxml") is not None:
+        parsers.append("lxml")
+
+    modes = [(parser, strained) for strained in (False, True) for parser in parsers]
+
+    print(f"{'page':<25}{'parser':<13}{'strained':<10}{'ms/page':>9}{'peak KB':>10}")
+    for name, extractor in EXTRACTORS.items():
+        content = load_page(name)
+        baseline = None
+        for parser, strained in modes:
+            parse_only = PARSE_ONLY[name] if strained else None
+            value, ms_per_page, peak_kb = measure(content, extractor, parser, parse_only)
+            if baseline is None:
+                baseline = value
+            match = "" if value == baseline else "  MISMATCH"
+            print(
+                f"{name:<25}{parser:<13}{str(strained):<10}"
+                f"{ms_per_page:>9.1f}{peak_kb:>10.0f}{match}"
+            )
+
+
+if __name__ == "__main__":
+    main()
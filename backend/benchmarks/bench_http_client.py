@@ -0,0 +1,92 @@
+"""
+Benchmark cold-miss latency and connection count of the scraper fan-out,
+comparing a throwaway AsyncClient per request (the previous make_request)
+against the shared per-source clients from app.http_client.
+
+Run from the backend directory:
+    python -m benchmarks.bench_http_client
+"""
+import asyncio
+import statistics
+import time
+
+import httpx
+from bs4 import BeautifulSoup
+
+from app import http_client, rate_limiter
+from app.data_collection import make_request
+from benchmarks.stub_server import StubServer
+
+# Requests made by one cold movie lookup in get_movie_data, per source
+COLD_MISS_REQUESTS = [
+    "rottentomatoes",
+    "rottentomatoes",
+    "letterboxd",
+    "letterboxd",
+    "commonsensemedia",
+    "imdb",
+    "boxofficemojo",
+    "justwatch",
+]
+COLD_MISSES = 20
+
+
+async def make_request_per_call_client(url, headers=None, source=None):
+    """The previous make_request: a new client (and connection) per request"""
+    async with httpx.AsyncClient(
+        timeout=15, limits=httpx.Limits(max_connections=10)
+    ) as client:
+        response = await client.get(url, headers=headers, follow_redirects=True)
+        response.raise_for_status()
+        return BeautifulSoup(response.content, "html.parser")
+
+
+async def run(fetch, servers):
+    latencies = []
+    for _ in range(COLD_MISSES):
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                fetch(f"{servers[source].base_url}/page", None, source)
+                for source in COLD_MISS_REQUESTS
+            )
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+    connections = sum(server.connections for server in servers.values())
+    return latencies, connections
+
+
+def report(label, latencies, connections):
+    print(
+        f"{label:<22} p50 {statistics.median(latencies):7.1f} ms   "
+        f"max {max(latencies):7.1f} ms   connections {connections}"
+    )
+
+
+async def main():
+    # Measure the fetch path itself, not the per-host rate limits
+    rate_limiter.RATE_LIMITING_ENABLED = False
+
+    servers = {}
+    for source in set(COLD_MISS_REQUESTS):
+        servers[source] = await StubServer().start()
+
+    print(f"{COLD_MISSES} cold misses x {len(COLD_MISS_REQUESTS)} requests")
+
+    latencies, connections = await run(make_request_per_call_client, servers)
+    report("per-request client", latencies, connections)
+
+    for server in servers.values():
+        server.reset_counters()
+
+    await http_client.start_http_clients()
+    latencies, connections = await run(make_request, servers)
+    report("shared pooled clients", latencies, connections)
+    await http_client.close_http_clients()
+
+    for server in servers.values():
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+"""
+Benchmark /api/search upstream calls and latency over a keystroke-driven query
+log, comparing the previous behaviour (every query calls TMDB) with the search
+cache and the local prefix index. TMDB is simulated with a fixed latency, and
+the trending list seeds the index as the /api/trending endpoint does.
+
+Requires a Redis server at REDIS_URL. Run from the backend directory:
+    python -m benchmarks.bench_search
+"""
+import asyncio
+import random
+import time
+
+from app import search_manager
+from app.redis_client import close_redis, redis_client
+from app.utils.latency_utils import LatencyRecorder
+
+UPSTREAM_LATENCY = 0.12  # seconds, a typical TMDB search/multi round trip
+SESSIONS = 300
+
+TITLES = [
+    "The Matrix",
+    "Mad Max: Fury Road",
+    "Amélie",
+    "Dune",
+    "Dune: Part Two",
+    "Oppenheimer",
+    "Barbie",
+    "Interstellar",
+    "Inception",
+    "The Dark Knight",
+    "Parasite",
+    "Spirited Away",
+    "Everything Everywhere All at Once",
+    "Whiplash",
+    "La La Land",
+    "The Godfather",
+    "Pulp Fiction",
+    "Alien",
+    "Aliens",
+    "Arrival",
+    "Blade Runner 2049",
+    "Her",
+    "Moonlight",
+    "Get Out",
+    "Joker",
+    "Up",
+    "Coco",
+    "WALL·E",
+    "Ratatouille",
+    "The Grand Budapest Hotel",
+]
+
+
+def catalog():
+    return [
+        {
+            "tmdb_id": 600000 + i,
+            "title": name,
+            "year": "2020",
+            "media_type": "movie",
+            "poster_img": "",
+        }
+        for i, name in enumerate(TITLES)
+    ]
+
+
+async def simulated_search_title(query, api_key):
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    words = search_manager.normalize_query(query).split()
+
+    def matches(movie):
+        title_words = search_manager.normalize_query(movie["title"]).split()
+        return all(
+            any(title_word.startswith(word) for title_word in title_words)
+            for word in words
+        )
+
+    return [movie for movie in catalog() if matches(movie)]
+
+
+def query_log(seed=7):
+    """Users typing popular titles one keystroke at a time, in varied case"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(TITLES))]
+    queries = []
+    for _ in range(SESSIONS):
+        name = rng.choices(TITLES, weights)[0]
+        typed = name.lower() if rng.random() < 0.5 else name
+        stop = rng.randint(min(3, len(typed)), len(typed))
+        queries.extend(typed[:length] for length in range(1, stop + 1))
+    return queries
+
+
+async def run(queries, cached):
+    latencies = LatencyRecorder(max_samples=len(queries))
+    upstream_calls = 0
+    for query in queries:
+        start = time.perf_counter()
+        if cached:
+            await search_manager.search_titles(query, "key")
+        else:
+            await simulated_search_title(query, "key")
+            upstream_calls += 1
+        latencies.record(time.perf_counter() - start)
+    if cached:
+        upstream_calls = search_manager.search_stats["upstream_calls"]
+    return upstream_calls, latencies.stats()
+
+
+async def main():
+    search_manager.search_title = simulated_search_title
+    keys = [key async for key in redis_client.scan_iter("search_*")]
+    if keys:
+        await redis_client.delete(*keys)
+    search_manager.index_titles(catalog())
+
+    queries = query_log()
+    print(f"{len(queries)} queries from {SESSIONS} typing sessions")
+    print(f"{'mode':<22}{'upstream calls':>15}{'p50 ms':>9}{'p99 ms':>9}")
+    for label, cached in (("uncached", False), ("cache + prefix index", True)):
+        upstream_calls, stats = await run(queries, cached)
+        print(f"{label:<22}{upstream_calls:>15}{stats['p50_ms']:>9}{stats['p99_ms']:>9}")
+    print(search_manager.get_search_stats())
+    await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
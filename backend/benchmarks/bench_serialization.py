@@ -0,0 +1,68 @@
+"""
+Benchmark bytes per key and encode/decode time of cached values, comparing the
+previous plain json.dumps strings with the versioned envelope codecs over a
+corpus of details payloads and the trending_movies list.
+
+Run from the backend directory:
+    python -m benchmarks.bench_serialization
+"""
+import json
+import time
+
+from app.utils import serialization_utils
+from app.utils.serialization_utils import decode_value, encode_value
+from benchmarks.fixtures import details_payload, trending_movies
+
+CORPUS_SIZE = 2000
+
+
+def legacy_encode(value):
+    return json.dumps(value).encode("utf-8")
+
+
+def modes():
+    yield "legacy json", legacy_encode
+    codecs = ["json"] + (["msgpack"] if serialization_utils.msgpack else [])
+    compressions = ["none", "zlib"] + (["zstd"] if serialization_utils.zstandard else [])
+    for codec in codecs:
+        for compression in compressions:
+            yield f"{codec}+{compression}", (
+                lambda value, c=codec, z=compression: encode_value(value, c, z)
+            )
+
+
+def measure(values, encode):
+    start = time.perf_counter()
+    encoded = [encode(value) for value in values]
+    encode_us = (time.perf_counter() - start) * 1e6 / len(values)
+
+    start = time.perf_counter()
+    for data in encoded:
+        decode_value(data)
+    decode_us = (time.perf_counter() - start) * 1e6 / len(values)
+
+    bytes_per_key = sum(len(data) for data in encoded) / len(values)
+    return bytes_per_key, encode_us, decode_us
+
+
+def main():
+    corpora = {
+        "details_*": [details_payload(i) for i in range(CORPUS_SIZE)],
+        "trending_movies": [trending_movies()] * 50,
+    }
+    print(
+        f"orjson: {bool(serialization_utils.orjson)}, "
+        f"compression threshold: {serialization_utils.COMPRESSION_THRESHOLD} bytes"
+    )
+    print(f"{'corpus':<17}{'mode':<16}{'bytes/key':>10}{'encode us':>11}{'decode us':>11}")
+    for corpus, values in corpora.items():
+        for mode, encode in modes():
+            bytes_per_key, encode_us, decode_us = measure(values, encode)
+            print(
+                f"{corpus:<17}{mode:<16}{bytes_per_key:>10.0f}"
+                f"{encode_us:>11.1f}{decode_us:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark bytes downloaded and time-to-value for the single-element extractors,
+comparing a full-page fetch (make_request) with the early-terminating streamed
+fetch (make_streaming_request) against a bandwidth-limited local stub server.
+
+Run from the backend directory:
+    python -m benchmarks.bench_streaming_fetch
+"""
+import asyncio
+import time
+
+from app import data_collection, http_client, rate_limiter
+from app.data_collection import (
+    PARSE_ONLY,
+    STREAM_TARGETS,
+    extract_imdb_rating,
+    extract_letterboxd_rating,
+    extract_rottentomatoes_scores,
+    make_request,
+    make_streaming_request,
+)
+from benchmarks.fixtures import load_page
+from benchmarks.stub_server import StubServer
+
+BYTES_PER_SECOND = 2_000_000
+RUNS = 5
+
+PAGES = {
+    "imdb_title": ("imdb", extract_imdb_rating),
+    "rottentomatoes_title": ("rottentomatoes", extract_rottentomatoes_scores),
+    "letterboxd_film": ("letterboxd", extract_letterboxd_rating),
+}
+
+
+async def measure(fetch, url, source, name, extractor):
+    data_collection.fetch_stats.clear()
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        value = extractor(
+            await fetch(url, None, source, PARSE_ONLY[name], STREAM_TARGETS[name])
+        )
+    elapsed_ms = (time.perf_counter() - start) * 1000 / RUNS
+    bytes_downloaded = data_collection.fetch_stats[source]["bytes_downloaded"] / RUNS
+    return value, elapsed_ms, bytes_downloaded
+
+
+async def full_fetch(url, headers, source, parse_only, target):
+    return await make_request(url, headers, source, parse_only)
+
+
+async def main():
+    # Measure the fetch path itself, not the per-host rate limits
+    rate_limiter.RATE_LIMITING_ENABLED = False
+
+    server = StubServer(connect_delay=0.01, bytes_per_second=BYTES_PER_SECOND)
+    for name in PAGES:
+        server.add_route(f"/{name}", load_page(name))
+    await server.start()
+    await http_client.start_http_clients()
+
+    print(f"{'page':<22}{'mode':<10}{'KB downloaded':>15}{'time-to-value':>16}")
+    for name, (source, extractor) in PAGES.items():
+        url = f"{server.base_url}/{name}"
+        for mode, fetch in (("full", full_fetch), ("streamed", make_streaming_request)):
+            value, elapsed_ms, bytes_downloaded = await measure(
+                fetch, url, source, name, extractor
+            )
+            print(
+                f"{name:<22}{mode:<10}{bytes_downloaded / 1024:>15.0f}"
+                f"{elapsed_ms:>13.0f} ms   {value}"
+            )
+
+    await http_client.close_http_clients()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
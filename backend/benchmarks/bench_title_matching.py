@@ -0,0 +1,66 @@
+"""
+Benchmark accuracy and candidates/second of search result title matching,
+comparing the previous first-match-wins difflib comparison with the batched
+ranking of app.utils.title_match_utils (with and without rapidfuzz), over the
+labelled cases in benchmarks.fixtures.TITLE_MATCH_CASES.
+
+Run from the backend directory:
+    python -m benchmarks.bench_title_matching
+"""
+import time
+from difflib import SequenceMatcher
+
+from unidecode import unidecode
+
+from app.utils import title_match_utils
+from benchmarks.fixtures import TITLE_MATCH_CASES
+
+ROUNDS = 200
+
+
+def previous_match(title, year, candidates):
+    """The previous matching: the first result within a year scoring over 0.79"""
+    title = unidecode(title).lower()
+    for index, (candidate_title, candidate_year) in enumerate(candidates):
+        if abs(candidate_year - year) <= 1:
+            if SequenceMatcher(None, title, candidate_title.lower()).ratio() > 0.79:
+                return index
+    return None
+
+
+def measure(match):
+    correct = sum(
+        match(title, year, candidates) == expected
+        for title, year, candidates, expected in TITLE_MATCH_CASES
+    )
+    candidates_per_round = sum(len(case[2]) for case in TITLE_MATCH_CASES)
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for title, year, candidates, _ in TITLE_MATCH_CASES:
+            match(title, year, candidates)
+    elapsed = time.perf_counter() - start
+
+    return correct, candidates_per_round * ROUNDS / elapsed
+
+
+def main():
+    rapidfuzz_process = title_match_utils.process
+    matchers = [("difflib first match", previous_match)]
+    if rapidfuzz_process is not None:
+        matchers.append(("ranked (rapidfuzz)", title_match_utils.best_match))
+    matchers.append(("ranked (pure Python)", None))
+
+    print(f"{len(TITLE_MATCH_CASES)} labelled cases")
+    print(f"{'matcher':<22}{'accuracy':>10}{'candidates/s':>14}")
+    for label, match in matchers:
+        if match is None:
+            title_match_utils.process = None
+            match = title_match_utils.best_match
+        correct, rate = measure(match)
+        print(f"{label:<22}{correct / len(TITLE_MATCH_CASES):>10.1%}{rate:>14,.0f}")
+    title_match_utils.process = rapidfuzz_process
+
+
+if __name__ == "__main__":
+    main()
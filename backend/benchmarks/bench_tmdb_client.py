@@ -0,0 +1,104 @@
+"""
+Benchmark the TMDB calls of a trending refresh (the 5 trending pages, then 100
+title details) against a local stub that throttles every 25th request with a
+429 and Retry-After, comparing a throwaway AsyncClient per call without retries
+(the previous fetch_api_data) against the pooled, retrying TMDBClient.
+
+Run from the backend directory:
+    python -m benchmarks.bench_tmdb_client
+"""
+import asyncio
+import json
+import time
+
+import httpx
+
+from app import http_client, rate_limiter
+from app.tmdb_client import TMDBClient
+from benchmarks.stub_server import StubServer
+
+TRENDING_PAGES = 5
+DETAIL_FETCHES = 100
+CONCURRENCY = 10  # concurrent detail fetches, as in the trending warm-up
+THROTTLE_EVERY = 25
+RETRY_AFTER = "0.2"
+
+
+class TMDBStub(StubServer):
+    async def respond(self, path, request_headers):
+        if self.requests % THROTTLE_EVERY == 0:
+            return 429, b"", {"Retry-After": RETRY_AFTER}
+        return 200, json.dumps({"path": path, "results": [{}] * 20}).encode(), {}
+
+
+async def get_json_per_call_client(url):
+    """The previous fetch_api_data: a new client per call and no retries"""
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url)
+        response.raise_for_status()
+        return response.json()
+
+
+async def run(get_json, base_url):
+    failures = 0
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def fetch(url):
+        nonlocal failures
+        async with semaphore:
+            try:
+                await get_json(url)
+            except httpx.HTTPError:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            fetch(f"{base_url}/3/trending/movie/week?page={page}")
+            for page in range(1, TRENDING_PAGES + 1)
+        )
+    )
+    trending_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(fetch(f"{base_url}/3/movie/{tmdb_id}") for tmdb_id in range(DETAIL_FETCHES))
+    )
+    details_ms = (time.perf_counter() - start) * 1000
+    return trending_ms, details_ms, failures
+
+
+def report(label, server, trending_ms, details_ms, failures, retries="-"):
+    print(
+        f"{label:<26}{trending_ms:>12.1f}{details_ms:>12.1f}"
+        f"{server.connections:>13}{failures:>10}{retries:>9}"
+    )
+
+
+async def main():
+    # Measure the client itself, not the TMDB token bucket
+    rate_limiter.RATE_LIMITING_ENABLED = False
+    server = await TMDBStub(connect_delay=0.03, response_delay=0.04).start()
+
+    print(
+        f"{TRENDING_PAGES} trending pages, then {DETAIL_FETCHES} details "
+        f"({CONCURRENCY} concurrent), 1 in {THROTTLE_EVERY} throttled"
+    )
+    print(
+        f"{'mode':<26}{'trending ms':>12}{'details ms':>12}"
+        f"{'connections':>13}{'failures':>10}{'retries':>9}"
+    )
+
+    report("per-call client", server, *await run(get_json_per_call_client, server.base_url))
+
+    server.reset_counters()
+    client = TMDBClient()
+    results = await run(client.get_json, server.base_url)
+    report("pooled TMDBClient", server, *results, client.retries)
+
+    await http_client.close_http_clients()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,230 @@
+"""
+Synthetic HTML pages for the benchmarks, shaped like the pages each extractor
+in app.data_collection reads: realistic size, a large head of scripts and
+styles, and the target elements at roughly the position they appear in the
+live page. A real page saved as benchmarks/fixtures/<name>.html is used instead
+when present.
+"""
+import json
+import os
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+random.seed(7)
+
+
+def _filler(count, tag="div"):
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "film", "cast", "review"]
+    return "".join(
+        f'<{tag} class="ipc-block c{i % 17}" data-id="{i}"><a href="/x/{i}">'
+        f'{" ".join(random.choice(words) for _ in range(12))}</a>'
+        f'<span class="meta">{i}</span></{tag}>'
+        for i in range(count)
+    )
+
+
+def _head(extra="", script_kb=120):
+    script = "var a=" + json.dumps(["x" * 60] * (script_kb * 1024 // 64)) + ";"
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Page</title>"
+        f"{extra}<style>{'.c{color:red}' * 2000}</style>"
+        f"<script>{script}</script></head>"
+    )
+
+
+def imdb_title():
+    hero = (
+        '<div data-testid="hero-rating-bar__aggregate-rating__score">'
+        "<span>8.8</span><span>/10</span></div>"
+        '<a data-testid="reviewContent-all-reviews" href="/reviews">Reviews</a>'
+        '<span class="metacritic-score-box" style="x">74</span>'
+    )
+    return _head() + "<body>" + _filler(300) + hero + _filler(1500) + "</body></html>"
+
+
+def rottentomatoes_title():
+    scorecard = json.dumps(
+        {
+            "criticsScore": {"certified": True, "sentiment": "POSITIVE", "score": "87"},
+            "audienceScore": {"certified": True, "sentiment": "POSITIVE", "score": "91"},
+        }
+    )
+    return (
+        _head()
+        + "<body>"
+        + _filler(600)
+        + f'<script id="media-scorecard-json" type="application/json">{scorecard}</script>'
+        + _filler(1200)
+        + "</body></html>"
+    )
+
+
+def letterboxd_film():
+    meta = '<meta name="twitter:data2" content="4.21 out of 5">'
+    return _head(extra=meta, script_kb=20) + "<body>" + _filler(900) + "</body></html>"
+
+
+def rottentomatoes_search():
+    rows = "".join(
+        f'<search-page-media-row release-year="{2000 + i}">'
+        f'<a data-qa="thumbnail-link" href="https://www.rottentomatoes.com/m/film_{i}"></a>'
+        f'<a data-qa="info-name">Film {i}</a></search-page-media-row>'
+        for i in range(20)
+    )
+    return _head() + "<body>" + _filler(400) + rows + _filler(400) + "</body></html>"
+
+
+def letterboxd_search():
+    rows = "".join(
+        f'<span class="film-title-wrapper"><a href="/film/film-{i}/">Film {i}</a>'
+        f'<small class="metadata">{2000 + i}</small></span>'
+        for i in range(20)
+    )
+    return _head(script_kb=20) + "<body>" + _filler(300) + rows + "</body></html>"
+
+
+def commonsensemedia_search():
+    rows = "".join(
+        f'<div class="site-search-teaser"><a href="/movie-reviews/film-{i}"></a>'
+        f'<div class="review-teaser-type caption">MOVIE</div>'
+        f'<h3 class="review-teaser-title">Film {i}</h3>'
+        f'<div class="review-product-summary">Drama ({2000 + i})</div>'
+        f'<span class="rating__age">age {10 + i % 8}+</span></div>'
+        for i in range(20)
+    )
+    return _head() + "<body>" + _filler(500) + rows + _filler(500) + "</body></html>"
+
+
+def boxofficemojo_title():
+    amounts = "".join(
+        f'<span class="a-size-medium a-text-bold">${i},000,000</span>' for i in range(3)
+    )
+    return _head(script_kb=40) + "<body>" + _filler(200) + amounts + _filler(800) + "</body></html>"
+
+
+def justwatch_page():
+    link = '<div class="homepage"><a href="https://www.justwatch.com/us/movie/film">JustWatch</a></div>'
+    return _head() + "<body>" + _filler(400) + link + _filler(400) + "</body></html>"
+
+
+PAGES = {
+    "imdb_title": imdb_title,
+    "rottentomatoes_title": rottentomatoes_title,
+    "letterboxd_film": letterboxd_film,
+    "rottentomatoes_search": rottentomatoes_search,
+    "letterboxd_search": letterboxd_search,
+    "commonsensemedia_search": commonsensemedia_search,
+    "boxofficemojo_title": boxofficemojo_title,
+    "justwatch_page": justwatch_page,
+}
+
+
+def load_page(name):
+    """Load a saved page from benchmarks/fixtures, or build the synthetic one"""
+    path = os.path.join(FIXTURES_DIR, f"{name}.html")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return PAGES[name]().encode("utf-8")
+
+
+def details_payload(i):
+    """A /api/details payload shaped like the ones cached under details_* keys"""
+    year = str(1970 + i % 55)
+    title = " ".join(random.choice(["The", "Last", "Night", "City", "Dream", "Amélie"]) for _ in range(3))
+    return {
+        "tmdb_data": {
+            "director": [{"id": 1000 + i, "name": f"Director {i}"}],
+            "imdb_id": f"tt{1000000 + i}",
+            "media_type": "movie",
+            "title": title,
+            "year": year,
+            "runtime": f"{1 + i % 3}h {i % 60}m",
+            "certification": random.choice(["G", "PG", "PG-13", "R"]),
+            "poster_img": f"https://image.tmdb.org/t/p/w500/{i:08x}abcdefghijklmnop.jpg",
+            "justwatch_url": f"https://www.themoviedb.org/movie/{i}-film/watch?locale=US",
+        },
+        "external_data": {
+            "imdb_url": f"https://www.imdb.com/title/tt{1000000 + i}",
+            "imdb_rating": f"{random.uniform(4, 9):.1f}",
+            "metascore": str(random.randint(20, 99)),
+            "rottentomatoes_url": f"https://www.rottentomatoes.com/m/film_{i}",
+            "rottentomatoes_scores": {
+                "tomatometer": str(random.randint(0, 100)),
+                "tomatometer_state": "fresh",
+                "audience_score": str(random.randint(0, 100)),
+                "audience_state": "upright",
+            },
+            "letterboxd_url": f"https://letterboxd.com/film/film-{i}/",
+            "letterboxd_rating": round(random.uniform(1, 5), 1),
+            "commonsense_info": {
+                "url": f"https://www.commonsensemedia.org/movie-reviews/film-{i}",
+                "rating": f"age {random.randint(6, 17)}+",
+            },
+            "boxofficemojo_url": f"https://www.boxofficemojo.com/title/tt{1000000 + i}/",
+            "box_office_amounts": [f"${random.randint(1, 900):,},000,000" for _ in range(3)],
+            "justwatch_page": f"https://www.justwatch.com/us/movie/film-{i}",
+        },
+    }
+
+
+def trending_movies(count=100):
+    """A trending_movies list as cached by the trending job"""
+    return [
+        {
+            "tmdb_id": 500000 + i,
+            "title": f"Trending Film {i}",
+            "year": str(2020 + i % 5),
+            "media_type": "movie",
+            "poster_img": f"https://www.themoviedb.org/t/p/w500/{i:08x}abcdefghijklmnop.jpg",
+        }
+        for i in range(count)
+    ]
+
+
+# Labelled search results for title matching: (title, year, [(result title,
+# result year), ...], index of the correct result or None if it is not listed).
+# Results are in the order the sites list them, confusers first where they rank first.
+TITLE_MATCH_CASES = [
+    ("The Godfather", 1972, [("The Godfather Part II", 1974), ("The Godfather", 1972)], 1),
+    ("Godfather", 1972, [("The Godfather", 1972), ("Godfather, The", 1972)], 0),
+    ("Dune", 2021, [("Dune: Part Two", 2024), ("Dune", 1984), ("Dune", 2021)], 2),
+    ("Dune", 1984, [("Dune", 2021), ("Dune", 1984), ("Jodorowsky's Dune", 2013)], 1),
+    ("Amélie", 2001, [("Amelie", 2001), ("Amélie from Montmartre", 2002)], 0),
+    ("Alien", 1979, [("Aliens", 1986), ("Alien", 1979), ("Alien 3", 1992)], 1),
+    ("Aliens", 1986, [("Alien", 1979), ("Aliens", 1986)], 1),
+    ("Her", 2013, [("Here", 2024), ("Her", 2013), ("Hereditary", 2018)], 1),
+    ("Up", 2009, [("Up in the Air", 2009), ("Up", 2009)], 1),
+    ("Heat", 1995, [("Heat", 1986), ("The Heat", 2013), ("Heat", 1995)], 2),
+    ("Fast & Furious", 2009, [("Fast and Furious", 2009), ("The Fast and the Furious", 2001)], 0),
+    ("The Fast and the Furious", 2001, [("Fast & Furious", 2009), ("The Fast and the Furious", 2001)], 1),
+    ("Spider-Man", 2002, [("Spider-Man 2", 2004), ("Spider-Man", 2002), ("Spider-Man 3", 2007)], 1),
+    ("Se7en", 1995, [("Seven", 1995), ("Se7en", 1995)], 1),
+    ("WALL·E", 2008, [("WALL-E", 2008), ("Wall Street", 1987)], 0),
+    ("Léon: The Professional", 1994, [("Leon: The Professional", 1994), ("The Professional", 1981)], 0),
+    ("Mission: Impossible", 1996, [("Mission: Impossible II", 2000), ("Mission: Impossible", 1996)], 1),
+    ("The Thing", 1982, [("The Thing", 2011), ("The Thing", 1982), ("The Thing from Another World", 1951)], 1),
+    ("It", 2017, [("It Follows", 2015), ("It", 1990), ("It", 2017)], 2),
+    ("Moonlight", 2016, [("Moonlight Mile", 2002), ("Moonlight", 2016)], 1),
+    ("Joker", 2019, [("Joker: Folie à Deux", 2024), ("Joker", 2019)], 1),
+    ("Coco", 2017, [("Coco Before Chanel", 2009), ("Coco", 2017)], 1),
+    ("Parasite", 2019, [("Parasite", 1982), ("Parasites", 2016), ("Parasite", 2019)], 2),
+    ("Arrival", 2016, [("The Arrival", 1996), ("Arrival", 2016)], 1),
+    ("Crash", 2005, [("Crash", 1996), ("Crash", 2004)], 1),
+    ("Les Misérables", 2012, [("Les Miserables", 1998), ("Les Misérables", 2012), ("Les Misérables", 2019)], 1),
+    ("Blade Runner 2049", 2017, [("Blade Runner", 1982), ("Blade Runner 2049", 2017)], 1),
+    ("Ratatouille", 2007, [("Ratatouille", 2007), ("Rat Race", 2001)], 0),
+    ("Oppenheimer", 2023, [("To End All War: Oppenheimer & the Atomic Bomb", 2023)], None),
+    ("Barbie", 2023, [("Barbie as Rapunzel", 2002), ("Barbie & Ken", 2023)], None),
+    ("Interstellar", 2014, [("Interstate 60", 2002), ("Interstellar", 2014)], 1),
+    ("La La Land", 2016, [("Lala", 2016), ("La La Land", 2016)], 1),
+    ("Whiplash", 2014, [("Whiplash", 2013), ("Whiplash", 2014)], 1),
+    ("The Batman", 2022, [("Batman", 1989), ("The Batman", 2022)], 1),
+    ("Scream", 2022, [("Scream", 1996), ("Scream 2", 1997), ("Scream", 2022)], 2),
+    ("Halloween", 2018, [("Halloween", 2007), ("Halloween II", 2009), ("Halloween", 2018)], 2),
+    ("Dunkirk", 2017, [("Dune", 2017), ("Dunkirk", 2017)], 1),
+    ("Toy Story 3", 2010, [("Toy Story 2", 1999), ("Toy Story 4", 2019), ("Toy Story 3", 2010)], 2),
+    ("Nope", 2022, [("Hope", 2022), ("Nope", 2022)], 1),
+    ("Past Lives", 2023, [("Past Life", 2023), ("Past Lives", 2023)], 1),
+]
@@ -0,0 +1,108 @@
+"""
+Minimal HTTP/1.1 keep-alive stub server used by the benchmarks.
+It counts accepted connections and requests, and can simulate the cost of a
+new connection (TCP+TLS handshake), of the response itself and a limited
+bandwidth for the response body.
+"""
+import asyncio
+
+
+class StubServer:
+    CHUNK_SIZE = 16 * 1024
+
+    def __init__(
+        self,
+        body=b"<html></html>",
+        connect_delay=0.03,
+        response_delay=0.01,
+        bytes_per_second=None,
+    ):
+        self.body = body
+        self.connect_delay = connect_delay
+        self.response_delay = response_delay
+        self.bytes_per_second = bytes_per_second
+        self.connections = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self.routes = {}
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def add_route(self, path, body, status=200, headers=None):
+        """Serve a specific body (and optional status/headers) for a path"""
+        self.routes[path] = (status, body, headers or {})
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def reset_counters(self):
+        self.connections = 0
+        self.requests = 0
+        self.bytes_sent = 0
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(self.connect_delay)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                request_headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    request_headers[name.strip().lower()] = value.strip()
+
+                self.requests += 1
+                path = request_line.split()[1].decode("latin-1")
+                status, body, headers = await self.respond(path, request_headers)
+                await asyncio.sleep(self.response_delay)
+
+                head = f"HTTP/1.1 {status} OK\r\nContent-Length: {len(body)}\r\n"
+                head += "Content-Type: text/html\r\n"
+                for name, value in headers.items():
+                    head += f"{name}: {value}\r\n"
+                writer.write(head.encode("latin-1") + b"\r\n")
+                await self._write_body(writer, body)
+        except (ConnectionResetError, BrokenPipeError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write_body(self, writer, body):
+        if not self.bytes_per_second:
+            writer.write(body)
+            self.bytes_sent += len(body)
+            await writer.drain()
+            return
+
+        for start in range(0, len(body), self.CHUNK_SIZE):
+            if writer.is_closing() or writer.transport.is_closing():
+                break
+            chunk = body[start : start + self.CHUNK_SIZE]
+            writer.write(chunk)
+            self.bytes_sent += len(chunk)
+            await writer.drain()
+            await asyncio.sleep(len(chunk) / self.bytes_per_second)
+
+    async def respond(self, path, request_headers):
+        """Return (status, body, headers) for a request; override for custom behaviour"""
+        route = self.routes.get(path.split("?")[0])
+        if route:
+            return route
+        return 200, self.body, {}
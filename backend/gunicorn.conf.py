@@ -0,0 +1,22 @@
+"""
+Gunicorn settings for the multi-process Prometheus metrics: the metrics files
+of previous runs are cleared at startup, and those of exited workers are marked
+dead so their live gauges stop counting.
+"""
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from app.utils.background_tasks_utils import BackgroundTaskRunner
+
+
+@pytest.mark.asyncio
+async def test_duplicate_keys_are_scheduled_once():
+    runner = BackgroundTaskRunner(max_concurrent=2)
+    calls = []
+
+    async def refresh(key):
+        await asyncio.sleep(0.01)
+        calls.append(key)
+
+    assert runner.schedule("details_1_movie", refresh, "details_1_movie")
+    assert not runner.schedule("details_1_movie", refresh, "details_1_movie")
+    assert runner.schedule("details_2_movie", refresh, "details_2_movie")
+    await runner.wait()
+
+    assert sorted(calls) == ["details_1_movie", "details_2_movie"]
+    assert runner.stats()["deduplicated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    runner = BackgroundTaskRunner(max_concurrent=2)
+    running = 0
+    peak = 0
+
+    async def refresh():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    for i in range(6):
+        runner.schedule(f"details_{i}_movie", refresh)
+    await runner.wait()
+
+    assert peak == 2
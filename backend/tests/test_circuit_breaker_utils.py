@@ -0,0 +1,51 @@
+import time
+from app.utils.circuit_breaker_utils import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def test_opens_on_failure_rate_and_fails_fast():
+    breaker = CircuitBreaker(min_calls=4, failure_rate_threshold=0.5)
+    for failed in (False, True, False, True):
+        assert breaker.allow_request()
+        if failed:
+            breaker.record_failure(0.1)
+        else:
+            breaker.record_success(0.1)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_opens_on_slow_calls():
+    breaker = CircuitBreaker(min_calls=3, slow_call_duration=1, slow_call_rate_threshold=1)
+    for _ in range(3):
+        breaker.record_success(2)
+
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker(min_calls=1, open_duration=0.01, half_open_calls=1)
+    breaker.record_failure(0.1)
+    time.sleep(0.02)
+
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+
+    time.sleep(0.02)
+    assert breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+
+
+def test_released_probe_frees_the_slot():
+    breaker = CircuitBreaker(min_calls=1, open_duration=0.01, half_open_calls=1)
+    breaker.record_failure(0.1)
+    time.sleep(0.02)
+
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.allow_request()
@@ -0,0 +1,261 @@
+import json
+import fakeredis
+import pytest
+from app import circuit_breakers, data_collection, revalidation
+from app.revalidation import revalidating
+from app.utils.html_parser_utils import parse_html
+
+CACHED_DETAILS = {
+    "tmdb_data": {"title": "Heat", "year": "1995"},
+    "external_data": {
+        "imdb_rating": "8.3",
+        "metascore": "76",
+        "letterboxd_rating": "4.1",
+        "pending_fields": [],
+    },
+}
+
+
+@pytest.fixture
+def open_circuit(monkeypatch):
+    monkeypatch.setattr(revalidation, "redis_client", fakeredis.aioredis.FakeRedis())
+    monkeypatch.setattr(circuit_breakers, "allow_request", lambda source: False)
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_returns_none_outside_a_refresh(open_circuit):
+    assert await data_collection.get_imdb_rating("tt0113277") is None
+    assert await data_collection.get_letterboxd_rating("https://lb/film/heat") is None
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_keeps_the_refreshed_values(open_circuit):
+    with revalidating(CACHED_DETAILS):
+        imdb_data = await data_collection.get_imdb_rating("tt0113277")
+        letterboxd_rating = await data_collection.get_letterboxd_rating(
+            "https://lb/film/heat"
+        )
+        scores = await data_collection.get_rottentomatoes_scores("https://rt/m/heat")
+
+    assert imdb_data == {"imdb_rating": "8.3", "metascore": "76"}
+    assert letterboxd_rating == "4.1"
+    assert scores is None
+
+
+def page(body, head=""):
+    return (
+        f"<html><head><title>Page</title>{head}</head><body>"
+        f'<div class="nav"><a href="/home">Home</a></div>{body}'
+        '<footer><span class="a-size-medium">Footer</span></footer></body></html>'
+    )
+
+
+@pytest.fixture(params=["strained", "full"])
+def parse(request):
+    """Parse a page as the scraper does, and without the strainer for comparison"""
+
+    def parse(html, page_name):
+        if request.param == "full":
+            return parse_html(html, parser="html.parser")
+        return parse_html(html, data_collection.PARSE_ONLY[page_name])
+
+    return parse
+
+
+IMDB_TITLE = page(
+    '<div data-testid="hero-rating-bar__aggregate-rating__score">'
+    "<span>8.3</span><span>/10</span></div>"
+    '<span class="metacritic-score-box" style="x"> 76 </span>'
+)
+
+ROTTENTOMATOES_SEARCH = page(
+    '<search-page-media-row release-year="1986">'
+    '<a data-qa="thumbnail-link" href="https://www.rottentomatoes.com/m/heat_1986"></a>'
+    '<a data-qa="info-name">Heat</a></search-page-media-row>'
+    '<search-page-media-row release-year="1995">'
+    '<a data-qa="thumbnail-link" href="https://www.rottentomatoes.com/m/heat_1995"></a>'
+    '<a data-qa="info-name"> Heat </a></search-page-media-row>'
+    '<search-page-media-row startyear="2008">'
+    '<a data-qa="thumbnail-link" href="https://www.rottentomatoes.com/tv/breaking_bad"></a>'
+    '<a data-qa="info-name">Breaking Bad</a></search-page-media-row>'
+)
+
+LETTERBOXD_SEARCH = page(
+    '<span class="film-title-wrapper"><a href="/film/heat-1986/">Heat</a>'
+    '<small class="metadata">1986</small></span>'
+    '<span class="film-title-wrapper"><a href="/film/heat-1995/">Heat</a>'
+    '<small class="metadata">1995</small></span>'
+)
+
+
+def commonsense_teaser(href, media_type, title, summary, rating):
+    return (
+        f'<div class="site-search-teaser"><a href="{href}"></a>'
+        f'<div class="review-teaser-type caption">{media_type}</div>'
+        f'<h3 class="review-teaser-title">{title}</h3>'
+        f'<div class="review-product-summary">{summary}</div>'
+        + (f'<span class="rating__age">{rating}</span>' if rating else "")
+        + "</div>"
+    )
+
+
+COMMONSENSE_SEARCH = page(
+    commonsense_teaser("/tv-reviews/heat", "TV", "Heat", "Drama (1995)", "age 14+")
+    + commonsense_teaser("/movie-reviews/heat-2", "MOVIE", "Heat", "Crime (1995)", None)
+    + commonsense_teaser("/movie-reviews/heat", "MOVIE", "Heat", "Crime (1995)", "age 16+")
+    + commonsense_teaser("/movie-reviews/heat-86", "MOVIE", "Heat", "Crime (1986)", "age 15+")
+)
+
+BOXOFFICEMOJO_TITLE = page(
+    '<span class="a-size-medium a-text-bold">$67,436,818</span>'
+    '<span class="a-size-medium a-text-bold"> $120,000,000 </span>'
+    '<span class="a-size-medium a-text-bold">$187,436,818</span>'
+)
+
+JUSTWATCH_PAGE = page(
+    '<div class="homepage"><a href="https://www.justwatch.com/us/movie/heat">Watch</a></div>'
+)
+
+LETTERBOXD_FILM = page("", head='<meta name="twitter:data2" content="4.26 out of 5">')
+
+
+def rottentomatoes_title(scorecard):
+    return page(
+        f'<script id="media-scorecard-json" type="application/json">{json.dumps(scorecard)}</script>'
+    )
+
+
+def test_extract_imdb_rating(parse):
+    assert data_collection.extract_imdb_rating(parse(IMDB_TITLE, "imdb_title")) == {
+        "imdb_rating": "8.3",
+        "metascore": "76",
+    }
+    assert data_collection.extract_imdb_rating(parse(page(""), "imdb_title")) == {
+        "imdb_rating": None,
+        "metascore": None,
+    }
+
+
+def test_extract_rottentomatoes_url(parse):
+    soup = parse(ROTTENTOMATOES_SEARCH, "rottentomatoes_search")
+
+    assert (
+        data_collection.extract_rottentomatoes_url(soup, "Heat", "1995", "movie")
+        == "https://www.rottentomatoes.com/m/heat_1995"
+    )
+    # TV rows carry their first year in startyear
+    assert (
+        data_collection.extract_rottentomatoes_url(soup, "Breaking Bad", "2008", "tv")
+        == "https://www.rottentomatoes.com/tv/breaking_bad"
+    )
+    assert data_collection.extract_rottentomatoes_url(soup, "Heat", "2013", "movie") is None
+    empty = parse(page(""), "rottentomatoes_search")
+    assert data_collection.extract_rottentomatoes_url(empty, "Heat", "1995", "movie") is None
+
+
+def test_extract_letterboxd_url(parse):
+    soup = parse(LETTERBOXD_SEARCH, "letterboxd_search")
+
+    assert (
+        data_collection.extract_letterboxd_url(soup, "1995")
+        == "https://letterboxd.com/film/heat-1995/"
+    )
+    # A year off is accepted when no result has the exact year
+    assert (
+        data_collection.extract_letterboxd_url(soup, "1987")
+        == "https://letterboxd.com/film/heat-1986/"
+    )
+    assert data_collection.extract_letterboxd_url(soup, "2013") is None
+    empty = parse(page(""), "letterboxd_search")
+    assert data_collection.extract_letterboxd_url(empty, "1995") is None
+
+
+def test_extract_commonsense_info(parse):
+    soup = parse(COMMONSENSE_SEARCH, "commonsensemedia_search")
+
+    # Other media types and results without a rating are skipped
+    assert data_collection.extract_commonsense_info(soup, "Heat", "1995", "movie") == {
+        "url": "https://www.commonsensemedia.org/movie-reviews/heat",
+        "rating": "age 16+",
+    }
+    assert data_collection.extract_commonsense_info(soup, "Heat", "1995", "tv") == {
+        "url": "https://www.commonsensemedia.org/tv-reviews/heat",
+        "rating": "age 14+",
+    }
+    assert (
+        data_collection.extract_commonsense_info(
+            soup,
+            "Heat",
+            "1995",
+            "movie",
+            "https://www.commonsensemedia.org/movie-reviews/heat-86",
+        )["rating"]
+        == "age 15+"
+    )
+    assert data_collection.extract_commonsense_info(soup, "Heat", "2013", "movie") is None
+    empty = parse(page(""), "commonsensemedia_search")
+    assert data_collection.extract_commonsense_info(empty, "Heat", "1995", "movie") is None
+
+
+def test_extract_box_office_amounts(parse):
+    soup = parse(BOXOFFICEMOJO_TITLE, "boxofficemojo_title")
+
+    assert data_collection.extract_box_office_amounts(soup) == [
+        "$67,436,818",
+        "$120,000,000",
+        "$187,436,818",
+    ]
+    empty = parse(page(""), "boxofficemojo_title")
+    assert data_collection.extract_box_office_amounts(empty) == []
+
+
+def test_extract_justwatch_page(parse):
+    soup = parse(JUSTWATCH_PAGE, "justwatch_page")
+
+    assert (
+        data_collection.extract_justwatch_page(soup)
+        == "https://www.justwatch.com/us/movie/heat"
+    )
+    assert data_collection.extract_justwatch_page(parse(page(""), "justwatch_page")) is None
+
+
+def test_extract_rottentomatoes_scores(parse):
+    scorecard = {
+        "criticsScore": {"certified": True, "sentiment": "POSITIVE", "score": "88"},
+        "audienceScore": {"certified": False, "sentiment": "NEGATIVE", "score": "45"},
+    }
+    soup = parse(rottentomatoes_title(scorecard), "rottentomatoes_title")
+
+    assert data_collection.extract_rottentomatoes_scores(soup) == {
+        "tomatometer": "88",
+        "tomatometer_state": "certified-fresh",
+        "audience_score": "45",
+        "audience_state": "spilled",
+    }
+
+
+def test_extract_rottentomatoes_scores_without_scores(parse):
+    unscored = {
+        "criticsScore": {"certified": False},
+        "audienceScore": {"certified": False, "sentiment": "POSITIVE", "score": "91"},
+    }
+    soup = parse(rottentomatoes_title(unscored), "rottentomatoes_title")
+
+    assert data_collection.extract_rottentomatoes_scores(soup) == {
+        "tomatometer": None,
+        "tomatometer_state": None,
+        "audience_score": "91",
+        "audience_state": "upright",
+    }
+    no_scores = parse(rottentomatoes_title({"title": "Heat"}), "rottentomatoes_title")
+    assert data_collection.extract_rottentomatoes_scores(no_scores) is None
+    empty = parse(page(""), "rottentomatoes_title")
+    assert data_collection.extract_rottentomatoes_scores(empty) is None
+
+
+def test_extract_letterboxd_rating(parse):
+    soup = parse(LETTERBOXD_FILM, "letterboxd_film")
+
+    assert data_collection.extract_letterboxd_rating(soup) == 4.3
+    empty = parse(page(""), "letterboxd_film")
+    assert data_collection.extract_letterboxd_rating(empty) is None
@@ -0,0 +1,449 @@
+import asyncio
+import time
+import fakeredis
+import pytest
+from app import access_tracker, details_manager, external_ids, redis_client
+from app.details_manager import get_details_cache_key
+from app.utils.serialization_utils import encode_value
+
+TMDB_DATA = {
+    "imdb_id": "tt0113277",
+    "media_type": "movie",
+    "title": "Heat",
+    "year": "1995",
+    "justwatch_url": None,
+}
+
+
+class FakeSources:
+    """Stands in for TMDB and the external sources, each released on demand"""
+
+    def __init__(self):
+        self.tmdb_calls = 0
+        self.scrapes = 0
+        self.tmdb_error = None
+        self.released = {
+            ("imdb_rating", "metascore"): asyncio.Event(),
+            ("letterboxd_rating",): asyncio.Event(),
+        }
+
+    async def fetch_title_details(self, tmdb_id, media_type, api_key):
+        self.tmdb_calls += 1
+        if self.tmdb_error is not None:
+            raise self.tmdb_error
+        return dict(TMDB_DATA)
+
+    async def start_external_data_tasks(self, tmdb_id, tmdb_data, media_type):
+        self.scrapes += 1
+        return {
+            fields: asyncio.create_task(self._scrape(fields))
+            for fields in self.released
+        }
+
+    async def _scrape(self, fields):
+        await self.released[fields].wait()
+        if len(fields) == 1:
+            return 3.9
+        return {"imdb_rating": "8.3", "metascore": "76"}
+
+    def release(self, *fields):
+        for key in fields or self.released:
+            self.released[key].set()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    for module in (redis_client, details_manager, external_ids, access_tracker):
+        monkeypatch.setattr(module, "redis_client", client)
+    redis_client.local_cache.clear()
+    return client
+
+
+@pytest.fixture
+def sources(monkeypatch, fake_redis):
+    fake_sources = FakeSources()
+    monkeypatch.setattr(
+        details_manager, "fetch_title_details", fake_sources.fetch_title_details
+    )
+    monkeypatch.setattr(
+        details_manager,
+        "start_external_data_tasks",
+        fake_sources.start_external_data_tasks,
+    )
+    return fake_sources
+
+
+async def cached_details(tmdb_id="949", media_type="movie"):
+    return await redis_client.get_key_with_soft_expiry(
+        get_details_cache_key(tmdb_id, media_type)
+    )
+
+
+async def until(predicate, timeout=5):
+    async def wait():
+        while not await predicate():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait(), timeout)
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_tmdb_then_each_source_then_complete(sources):
+    events = details_manager.stream_title_details("949", "movie", "key")
+
+    assert await events.__anext__() == {"event": "tmdb", "data": TMDB_DATA}
+    assert (await events.__anext__())["data"] == {
+        "imdb_url": "https://www.imdb.com/title/tt0113277"
+    }
+
+    sources.release(("letterboxd_rating",))
+    assert (await events.__anext__())["data"] == {"letterboxd_rating": 3.9}
+    sources.release(("imdb_rating", "metascore"))
+    assert (await events.__anext__())["data"] == {
+        "imdb_rating": "8.3",
+        "metascore": "76",
+    }
+    assert await events.__anext__() == {"event": "complete", "data": None}
+
+    cached_data, is_stale = await cached_details()
+    assert not is_stale
+    assert cached_data["external_data"]["letterboxd_rating"] == 3.9
+    assert cached_data["external_data"]["pending_fields"] == []
+
+
+@pytest.mark.asyncio
+async def test_stream_replays_cached_details(sources):
+    sources.release()
+    [event async for event in details_manager.stream_title_details("949", "movie", "key")]
+
+    events = [
+        event async for event in details_manager.stream_title_details("949", "movie", "key")
+    ]
+
+    assert [event["event"] for event in events] == ["tmdb", "external", "complete"]
+    assert events[1]["data"]["imdb_rating"] == "8.3"
+    assert sources.scrapes == 1
+
+
+@pytest.mark.asyncio
+async def test_closed_stream_completes_into_the_cache(sources):
+    events = details_manager.stream_title_details("949", "movie", "key")
+    await events.__anext__()
+    await events.aclose()
+
+    sources.release()
+
+    async def is_cached():
+        cached_data, _ = await cached_details()
+        return cached_data is not None
+
+    await until(is_cached)
+    cached_data, _ = await cached_details()
+    assert cached_data["external_data"]["imdb_rating"] == "8.3"
+    assert cached_data["external_data"]["pending_fields"] == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_details_request_joins_the_streamed_scrape(sources):
+    events = details_manager.stream_title_details("949", "movie", "key")
+    await events.__anext__()
+
+    details = asyncio.create_task(
+        details_manager.get_title_details("949", "movie", "key")
+    )
+    await asyncio.sleep(0.01)
+    sources.release()
+    remaining = [event async for event in events]
+
+    assert remaining[-1]["event"] == "complete"
+    assert (await details)["external_data"]["letterboxd_rating"] == 3.9
+    assert sources.tmdb_calls == 1 and sources.scrapes == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_raises_tmdb_errors_before_the_first_event(sources):
+    sources.tmdb_error = ValueError("TMDB unavailable")
+
+    with pytest.raises(ValueError, match="TMDB unavailable"):
+        await details_manager.stream_title_details("949", "movie", "key").__anext__()
+
+    assert not details_manager.details_single_flight.in_flight(
+        get_details_cache_key("949", "movie")
+    )
+
+
+def complete_details(title="Heat"):
+    return {
+        "tmdb_data": {**TMDB_DATA, "title": title},
+        "external_data": {"imdb_rating": "8.3", "pending_fields": []},
+    }
+
+
+@pytest.fixture
+def computed(monkeypatch, fake_redis):
+    """Replaces the computation of misses, recording the titles and concurrency"""
+    state = {"titles": [], "running": 0, "max_running": 0}
+
+    async def fetch_and_cache_details(tmdb_id, media_type, api_key, latency_budget=None):
+        state["titles"].append((tmdb_id, media_type))
+        state["running"] += 1
+        state["max_running"] = max(state["max_running"], state["running"])
+        await asyncio.sleep(0.01)
+        state["running"] -= 1
+        if tmdb_id == "0":
+            raise ValueError("TMDB unavailable")
+        return complete_details(f"Title {tmdb_id}")
+
+    monkeypatch.setattr(details_manager, "fetch_and_cache_details", fetch_and_cache_details)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_batch_yields_cached_titles_before_computing_misses(computed):
+    await redis_client.set_key_with_soft_expiry(
+        get_details_cache_key("949", "movie"), complete_details()
+    )
+    titles = [("1", "movie"), ("949", "movie"), ("2", "tv")]
+
+    yielded = [
+        index async for index, _ in details_manager.iter_title_details_batch(titles, "key")
+    ]
+
+    assert yielded[0] == 1
+    assert sorted(yielded) == [0, 1, 2]
+    assert sorted(computed["titles"]) == [("1", "movie"), ("2", "tv")]
+
+
+@pytest.mark.asyncio
+async def test_batch_results_keep_the_request_order(computed):
+    await redis_client.set_key_with_soft_expiry(
+        get_details_cache_key("949", "movie"), complete_details()
+    )
+    titles = [("1", "movie"), ("949", "movie"), ("1", "movie"), ("0", "movie"), ("5", "anime")]
+
+    results = await details_manager.get_title_details_batch(titles, "key")
+
+    assert [result["status"] for result in results] == ["ok", "ok", "ok", "error", "error"]
+    assert results[0]["data"]["tmdb_data"]["title"] == "Title 1"
+    assert results[1]["data"]["tmdb_data"]["title"] == "Heat"
+    assert results[2] == results[0]
+    assert results[3]["error"] == "ValueError: TMDB unavailable"
+    assert results[4]["error"] == "Invalid media type"
+    # Duplicates are computed once, and invalid titles not at all
+    assert sorted(computed["titles"]) == [("0", "movie"), ("1", "movie")]
+
+
+@pytest.mark.asyncio
+async def test_batch_bounds_concurrent_misses(computed):
+    titles = [(str(tmdb_id), "movie") for tmdb_id in range(1, 13)]
+
+    results = await details_manager.get_title_details_batch(titles, "key")
+
+    assert all(result["status"] == "ok" for result in results)
+    assert len(computed["titles"]) == 12
+    assert computed["max_running"] == details_manager.MAX_CONCURRENT_BATCH_MISSES
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_scrape(sources):
+    requests = [
+        asyncio.create_task(details_manager.get_title_details("949", "movie", "key"))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0.01)
+    sources.release()
+    results = await asyncio.gather(*requests)
+
+    assert all(result == results[0] for result in results)
+    assert sources.tmdb_calls == 1 and sources.scrapes == 1
+
+
+@pytest.fixture
+def cross_worker(monkeypatch, sources):
+    monkeypatch.setattr(details_manager, "CROSS_WORKER_COALESCING", True)
+    monkeypatch.setattr(details_manager, "LOCK_POLL_INTERVAL", 0.01)
+    return sources
+
+
+@pytest.mark.asyncio
+async def test_miss_waits_for_the_worker_holding_the_lock(cross_worker, fake_redis):
+    cache_key = get_details_cache_key("949", "movie")
+    lock = fake_redis.lock(f"{cache_key}_lock", timeout=60)
+    assert await lock.acquire(blocking=False)
+
+    request = asyncio.create_task(details_manager.get_title_details("949", "movie", "key"))
+    await asyncio.sleep(0.05)
+    # The other worker caches its result
+    await redis_client.set_key_with_soft_expiry(cache_key, complete_details())
+
+    assert (await request)["tmdb_data"]["title"] == "Heat"
+    assert cross_worker.scrapes == 0
+
+
+@pytest.mark.asyncio
+async def test_miss_scrapes_when_the_lock_is_released_without_a_result(
+    cross_worker, fake_redis
+):
+    cross_worker.release()
+    fallbacks = details_manager.cross_worker_stats["fallback"]
+    lock = fake_redis.lock(f"{get_details_cache_key('949', 'movie')}_lock", timeout=60)
+    assert await lock.acquire(blocking=False)
+
+    request = asyncio.create_task(details_manager.get_title_details("949", "movie", "key"))
+    await asyncio.sleep(0.05)
+    await lock.release()
+
+    assert (await request)["external_data"]["imdb_rating"] == "8.3"
+    assert cross_worker.scrapes == 1
+    assert details_manager.cross_worker_stats["fallback"] == fallbacks + 1
+
+
+async def cache_envelope(fake_redis, soft_expires_at):
+    envelope = {
+        "value": complete_details("Heat (stale)"),
+        "soft_expires_at": soft_expires_at,
+    }
+    await fake_redis.set(
+        get_details_cache_key("949", "movie"), encode_value(envelope), ex=60
+    )
+
+
+@pytest.mark.asyncio
+async def test_stale_details_are_served_then_refreshed(sources, fake_redis):
+    await cache_envelope(fake_redis, time.time() - 1)
+
+    details = await details_manager.get_title_details("949", "movie", "key")
+    assert details["tmdb_data"]["title"] == "Heat (stale)"
+
+    sources.release()
+
+    async def is_fresh():
+        cached_data, is_stale = await cached_details()
+        return not is_stale and cached_data["tmdb_data"]["title"] == "Heat"
+
+    await until(is_fresh)
+    assert sources.scrapes == 1
+
+
+@pytest.mark.asyncio
+async def test_fresh_details_are_served_without_a_refresh(sources, fake_redis):
+    await cache_envelope(fake_redis, time.time() + 60)
+
+    details = await details_manager.get_title_details("949", "movie", "key")
+
+    assert details["tmdb_data"]["title"] == "Heat (stale)"
+    await asyncio.sleep(0.01)
+    assert sources.tmdb_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_details_are_kept_past_their_soft_expiry(sources, fake_redis):
+    sources.release()
+    await details_manager.get_title_details("949", "movie", "key")
+
+    cached_data, is_stale = await cached_details()
+    ttl = await fake_redis.ttl(get_details_cache_key("949", "movie"))
+    assert not is_stale
+    assert ttl > redis_client.STALE_CACHE_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_hard_expired_details_are_scraped(sources, fake_redis):
+    await cache_envelope(fake_redis, time.time() - 1)
+    await fake_redis.delete(get_details_cache_key("949", "movie"))
+    sources.release()
+
+    details = await details_manager.get_title_details("949", "movie", "key")
+
+    assert details["tmdb_data"]["title"] == "Heat"
+    assert sources.scrapes == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_sources_are_pending_then_backfilled(monkeypatch, sources, fake_redis):
+    monkeypatch.setattr(details_manager, "LATENCY_BUDGET", 0.05)
+    sources.release(("letterboxd_rating",))
+
+    details = await details_manager.get_title_details("949", "movie", "key")
+
+    assert details["external_data"]["letterboxd_rating"] == 3.9
+    assert details["external_data"]["imdb_rating"] is None
+    assert details["external_data"]["pending_fields"] == ["imdb_rating", "metascore"]
+    cached_data, _ = await cached_details()
+    assert cached_data["external_data"]["pending_fields"] == ["imdb_rating", "metascore"]
+
+    sources.release()
+
+    async def is_backfilled():
+        cached_data, _ = await cached_details()
+        return not cached_data["external_data"]["pending_fields"]
+
+    await until(is_backfilled)
+    cached_data, _ = await cached_details()
+    assert cached_data["external_data"]["imdb_rating"] == "8.3"
+    assert cached_data["external_data"]["letterboxd_rating"] == 3.9
+    assert sources.scrapes == 1
+
+
+def test_partial_details_are_not_extended_cached():
+    details = {
+        "tmdb_data": {**TMDB_DATA, "year": "1995"},
+        "external_data": {
+            "imdb_url": "https://www.imdb.com/title/tt0113277",
+            "letterboxd_url": "https://letterboxd.com/film/heat-1995/",
+            "rottentomatoes_url": "https://www.rottentomatoes.com/m/heat",
+            "commonsense_info": {"rating": "age 16+"},
+            "pending_fields": [],
+        },
+    }
+    assert redis_client.determine_cache_duration(details) == (
+        redis_client.LONG_TERM_CACHE_SECONDS
+    )
+
+    details["external_data"]["pending_fields"] = ["imdb_rating", "metascore"]
+    assert redis_client.determine_cache_duration(details) == (
+        redis_client.SHORT_TERM_CACHE_SECONDS
+    )
+
+
+@pytest.mark.asyncio
+async def test_prerefresh_skips_fresh_entries_cached_without_soft_expiry(
+    monkeypatch, fake_redis
+):
+    scheduled = []
+    monkeypatch.setattr(
+        details_manager,
+        "schedule_details_refresh",
+        lambda tmdb_id, media_type, api_key: scheduled.append(tmdb_id) or True,
+    )
+    # Popular entries: fresh and plain, expiring and plain, fresh and enveloped
+    await fake_redis.set("details_1_movie", encode_value(complete_details()), ex=86400)
+    await fake_redis.set("details_2_movie", encode_value(complete_details()), ex=60)
+    await redis_client.set_key_with_soft_expiry("details_3_movie", complete_details())
+    await fake_redis.zadd(
+        access_tracker.ACCESS_KEY,
+        {"details_1_movie": 3, "details_2_movie": 2, "details_3_movie": 1},
+    )
+
+    assert await details_manager.prerefresh_popular_details("key") == 1
+    assert scheduled == ["2"]
+
+
+@pytest.mark.asyncio
+async def test_only_titles_that_resolve_are_counted_as_read(sources):
+    access_tracker.pending_accesses.clear()
+    sources.tmdb_error = ValueError("The resource you requested could not be found")
+
+    with pytest.raises(ValueError):
+        await details_manager.get_title_details("0", "movie", "key")
+    with pytest.raises(ValueError):
+        await details_manager.get_title_details("949", "anime", "key")
+    await details_manager.get_title_details_batch([("0", "tv")], "key")
+    assert not access_tracker.pending_accesses
+
+    sources.tmdb_error = None
+    sources.release()
+    await details_manager.get_title_details("949", "movie", "key")
+    await details_manager.get_title_details("949", "movie", "key")
+    assert access_tracker.pending_accesses == {"details_949_movie": 2}
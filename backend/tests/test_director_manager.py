@@ -0,0 +1,114 @@
+from datetime import datetime
+import fakeredis
+import pytest
+from app import director_manager, redis_client, tmdb_api
+from app.utils.serialization_utils import encode_value
+
+THIS_YEAR = datetime.now().year
+
+
+class FakeTMDBClient:
+    def __init__(self, crew):
+        self.crew = crew
+        self.calls = 0
+
+    async def get_json(self, url, conditional=None):
+        self.calls += 1
+        return {"crew": self.crew}
+
+
+def credit(tmdb_id, release_date, job="Director"):
+    return {
+        "id": tmdb_id,
+        "title": f"Title {tmdb_id}",
+        "job": job,
+        "release_date": release_date,
+        "poster_path": None,
+    }
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", client)
+    redis_client.local_cache.clear()
+    return client
+
+
+def use_credits(monkeypatch, crew):
+    tmdb = FakeTMDBClient(crew)
+    monkeypatch.setattr(tmdb_api, "tmdb_client", tmdb)
+    return tmdb
+
+
+@pytest.mark.asyncio
+async def test_filmography_is_sorted_newest_first(monkeypatch, fake_redis):
+    use_credits(
+        monkeypatch,
+        [
+            credit(1, "1995-12-15"),
+            credit(2, "2002-01-05"),
+            credit(3, "2002-11-22"),
+            credit(4, "2010-07-16", job="Producer"),
+            credit(5, ""),
+        ],
+    )
+
+    movies = await director_manager.get_director_movies("138", "key")
+
+    assert [movie["tmdb_id"] for movie in movies] == [3, 2, 1]
+    assert movies[0]["year"] == "2002"
+
+
+@pytest.mark.asyncio
+async def test_inactive_directors_are_cached_longer(monkeypatch, fake_redis):
+    tmdb = use_credits(monkeypatch, [credit(1, "1995-12-15"), credit(2, "2002-11-22")])
+
+    await director_manager.get_director_movies("1", "key")
+    await director_manager.get_director_movies("1", "key")
+
+    ttl = await fake_redis.ttl("director_1")
+    assert ttl > director_manager.DIRECTOR_CACHE_SECONDS
+    assert ttl <= director_manager.DIRECTOR_INACTIVE_CACHE_SECONDS
+    assert tmdb.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_active_directors_are_cached_for_a_day(monkeypatch, fake_redis):
+    use_credits(monkeypatch, [credit(1, "1995-12-15"), credit(2, f"{THIS_YEAR}-03-01")])
+
+    await director_manager.get_director_movies("2", "key")
+
+    assert 0 < await fake_redis.ttl("director_2") <= director_manager.DIRECTOR_CACHE_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_ratings_are_added_from_cached_details(monkeypatch, fake_redis):
+    use_credits(
+        monkeypatch,
+        [credit(1, "1995-12-15"), credit(2, "2002-11-22"), credit(3, "2008-07-18")],
+    )
+    external_data = {"imdb_rating": "8.3", "letterboxd_rating": 4.2, "metascore": "76"}
+    await redis_client.set_key_with_soft_expiry(
+        "details_1_movie", {"tmdb_data": {"year": "1995"}, "external_data": external_data}
+    )
+    # Entries cached before soft expiry are plain values
+    await fake_redis.set(
+        "details_3_movie",
+        encode_value({"tmdb_data": {}, "external_data": {"imdb_rating": "9.0"}}),
+    )
+
+    movies = await director_manager.get_director_movies("3", "key", with_ratings=True)
+
+    ratings = {movie["tmdb_id"]: movie["ratings"] for movie in movies}
+    assert ratings[1] == {
+        "imdb_rating": "8.3",
+        "metascore": "76",
+        "rottentomatoes_scores": None,
+        "letterboxd_rating": 4.2,
+    }
+    assert ratings[2] is None
+    assert ratings[3]["imdb_rating"] == "9.0"
+    # The cached filmography itself has no ratings
+    cached_movies = await redis_client.get_key("director_3")
+    assert all("ratings" not in movie for movie in cached_movies)
@@ -0,0 +1,142 @@
+import asyncio
+import fakeredis
+import pytest
+from app import external_data, redis_client
+from app.external_data import EXTERNAL_DATA_FIELDS, collect_external_data
+from app.external_ids import get_external_ids
+
+
+async def value_after(delay, value):
+    await asyncio.sleep(delay)
+    return value
+
+
+@pytest.mark.asyncio
+async def test_collect_waits_for_every_task_without_timeout():
+    tasks = {
+        ("imdb_rating", "metascore"): asyncio.create_task(
+            value_after(0, {"imdb_rating": "7.9", "metascore": "81"})
+        ),
+        ("letterboxd_rating",): asyncio.create_task(value_after(0.05, "4.1")),
+    }
+
+    external_data, pending_fields = await collect_external_data(tasks)
+
+    assert pending_fields == []
+    assert set(external_data) == set(EXTERNAL_DATA_FIELDS)
+    assert external_data["metascore"] == "81"
+    assert external_data["letterboxd_rating"] == "4.1"
+    assert external_data["justwatch_page"] is None
+
+
+@pytest.mark.asyncio
+async def test_collect_marks_slow_fields_pending_and_leaves_them_running():
+    slow = asyncio.create_task(value_after(0.2, "4.1"))
+    tasks = {
+        ("rottentomatoes_url",): asyncio.create_task(value_after(0, "https://rt")),
+        ("letterboxd_rating",): slow,
+    }
+
+    external_data, pending_fields = await collect_external_data(tasks, timeout=0.05)
+
+    assert pending_fields == ["letterboxd_rating"]
+    assert external_data["rottentomatoes_url"] == "https://rt"
+    assert external_data["letterboxd_rating"] is None
+    assert not slow.cancelled()
+    assert await slow == "4.1"
+
+
+@pytest.mark.asyncio
+async def test_collect_leaves_failed_fields_empty():
+    async def fail():
+        raise RuntimeError("boom")
+
+    tasks = {("commonsense_info",): asyncio.create_task(fail())}
+
+    external_data, pending_fields = await collect_external_data(tasks)
+
+    assert pending_fields == []
+    assert external_data["commonsense_info"] is None
+
+
+def stub_sources(monkeypatch, **values):
+    """Replace every scraper, returning values[name] (or None) and recording calls"""
+    calls = {}
+    for name in (
+        "get_imdb_rating",
+        "get_rottentomatoes_url",
+        "get_rottentomatoes_scores",
+        "get_letterboxd_url",
+        "get_letterboxd_rating",
+        "get_commonsense_info",
+        "get_box_office_amounts",
+        "get_boxofficemojo_url",
+        "get_justwatch_page",
+    ):
+
+        async def scrape(*args, name=name):
+            calls.setdefault(name, []).append(args)
+            return values.get(name)
+
+        monkeypatch.setattr(external_data, name, scrape)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_known_external_ids_skip_the_search_pages(monkeypatch):
+    calls = stub_sources(
+        monkeypatch,
+        get_commonsense_info={"url": "https://csm/x", "rating": "age 14+"},
+        get_justwatch_page="https://justwatch/x",
+    )
+
+    known = {
+        "rottentomatoes_url": "https://rt/m/x",
+        "letterboxd_url": "https://lb/film/x",
+        "commonsense_url": "https://csm/x",
+    }
+    tasks = external_data.start_movie_tasks(
+        "tt1", "X", "2010", "movie", "https://tmdb/watch", known
+    )
+    data, _ = await collect_external_data(tasks)
+
+    assert data["rottentomatoes_url"] == "https://rt/m/x"
+    assert "get_rottentomatoes_url" not in calls
+    assert "get_letterboxd_url" not in calls
+    assert calls["get_rottentomatoes_scores"] == [("https://rt/m/x",)]
+    # The rating and the JustWatch page are scraped again
+    assert calls["get_commonsense_info"] == [("X", "2010", "movie", "https://csm/x")]
+    assert data["commonsense_info"]["rating"] == "age 14+"
+    assert data["justwatch_page"] == "https://justwatch/x"
+
+
+@pytest.mark.asyncio
+async def test_refresh_picks_up_a_changed_rating(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", client)
+    redis_client.local_cache.clear()
+    stub_sources(monkeypatch)
+    ratings = ["age 13+", "age 15+"]
+    searches = []
+
+    async def get_commonsense_info(*args):
+        searches.append(args)
+        return {"url": "https://csm/x", "rating": ratings.pop(0)}
+
+    monkeypatch.setattr(external_data, "get_commonsense_info", get_commonsense_info)
+
+    first = await external_data.get_movie_data(
+        "tt1", "X", "2010", "movie", None, tmdb_id="1"
+    )
+    refreshed = await external_data.get_movie_data(
+        "tt1", "X", "2010", "movie", None, tmdb_id="1"
+    )
+
+    assert first["commonsense_info"]["rating"] == "age 13+"
+    assert refreshed["commonsense_info"]["rating"] == "age 15+"
+    assert searches[1] == ("X", "2010", "movie", "https://csm/x")
+    assert await get_external_ids("1", "movie", "tt1") == {
+        "rottentomatoes_url": None,
+        "letterboxd_url": None,
+        "commonsense_url": "https://csm/x",
+    }
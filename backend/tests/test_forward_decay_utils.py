@@ -0,0 +1,29 @@
+import pytest
+from app.utils.forward_decay_utils import ForwardDecay
+
+HOUR = 3600
+
+
+def test_recent_events_outweigh_older_ones():
+    decay = ForwardDecay(half_life=HOUR)
+    landmark = 1_000_000
+
+    old = 4 * decay.weight(landmark, landmark)
+    recent = 1 * decay.weight(landmark + 3 * HOUR, landmark)
+
+    # Four reads three half-lives ago count for half a read now
+    assert decay.decayed_count(old, landmark + 3 * HOUR, landmark) == pytest.approx(0.5)
+    assert recent > old
+
+
+def test_rescaling_keeps_decayed_counts():
+    decay = ForwardDecay(half_life=HOUR, max_exponent=10)
+    landmark = 0
+    now = 12 * HOUR
+    score = 3 * decay.weight(now - HOUR, landmark)
+
+    assert decay.needs_rescale(now, landmark)
+    rescaled = score * decay.rescale_factor(landmark, now)
+    assert decay.decayed_count(rescaled, now, now) == pytest.approx(
+        decay.decayed_count(score, now, landmark)
+    )
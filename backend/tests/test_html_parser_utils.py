@@ -0,0 +1,40 @@
+import pytest
+from app.utils.html_parser_utils import element_strainer, parse_html
+
+PAGE = (
+    "<html><head><meta name='twitter:data2' content='4.2 out of 5'>"
+    "<meta name='twitter:data1' content='2h 50m'></head><body>"
+    "<span class='a-size-medium a-text-bold extra'>$1</span>"
+    "<span class='a-size-medium'>Footer</span>"
+    "<div data-testid='score'><span>8.3</span></div>"
+    "<div data-testid='other'>x</div></body></html>"
+)
+
+
+@pytest.mark.parametrize("parser", ["lxml", "html.parser"])
+def test_strainer_keeps_only_the_given_elements_and_their_children(parser):
+    strainer = element_strainer(
+        ("meta", {"name": "twitter:data2"}), ("div", {"data-testid": "score"})
+    )
+    soup = parse_html(PAGE, strainer, parser)
+
+    assert [meta["content"] for meta in soup.find_all("meta")] == ["4.2 out of 5"]
+    assert [div["data-testid"] for div in soup.find_all("div")] == ["score"]
+    assert soup.find("div").span.text == "8.3"
+    assert soup.find("span", class_="a-size-medium") is None
+
+
+@pytest.mark.parametrize("parser", ["lxml", "html.parser"])
+def test_strainer_class_matches_when_all_classes_are_on_the_tag(parser):
+    soup = parse_html(
+        PAGE, element_strainer(("span", {"class": "a-text-bold a-size-medium"})), parser
+    )
+
+    assert [span.text for span in soup.find_all("span")] == ["$1"]
+
+
+def test_strainer_without_a_match_parses_nothing():
+    soup = parse_html(PAGE, element_strainer(("script", {"id": "media-scorecard-json"})))
+
+    assert soup.find("script") is None
+    assert soup.get_text() == ""
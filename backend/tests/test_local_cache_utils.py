@@ -0,0 +1,69 @@
+import time
+from app.utils.local_cache_utils import LocalCache, estimate_size
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LocalCache(max_entries=2)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    cache.get("a")
+    cache.set("c", 3, size=10)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_evicted_by_size():
+    cache = LocalCache(max_bytes=25)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    cache.set("c", 3, size=10)
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 20
+
+
+def test_expired_entries_are_misses():
+    cache = LocalCache(ttl=0.01)
+    cache.set("trending_movies", [1, 2], size=10)
+    time.sleep(0.02)
+
+    assert cache.get("trending_movies") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_removes_entry():
+    cache = LocalCache()
+    cache.set("details_1_movie", {"a": 1}, size=10)
+    cache.invalidate("details_1_movie")
+
+    assert cache.get("details_1_movie") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_fill_invalidated_while_fetched_is_dropped():
+    cache = LocalCache()
+    generation = cache.generation
+    cache.invalidate("details_1_movie")
+    cache.set("details_1_movie", {"a": 1}, size=10, generation=generation)
+    cache.set("details_2_movie", {"a": 2}, size=10, generation=generation)
+
+    assert cache.get("details_1_movie") is None
+    assert cache.get("details_2_movie") == {"a": 2}
+    assert cache.stats()["dropped_fills"] == 1
+
+
+def test_fills_started_before_a_clear_are_dropped():
+    cache = LocalCache()
+    generation = cache.generation
+    cache.clear()
+    cache.set("details_1_movie", {"a": 1}, size=10, generation=generation)
+
+    assert cache.get("details_1_movie") is None
+
+
+def test_size_estimate_counts_decoded_objects():
+    value = {"external_data": {"imdb_rating": "8.3", "letterboxd_rating": 4.2}}
+    assert estimate_size(value) > estimate_size({}) + estimate_size("8.3")
@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from httpx import AsyncClient
@@ -33,3 +34,71 @@ def test_director_movies():
     response = client.get("/api/director/138")
     assert response.status_code == 200
     assert "results" in response.json()
+
+
+def test_title_details_stream_maps_first_event_error_to_500(monkeypatch):
+    async def failing_stream(tmdb_id, media_type, api_key):
+        raise ValueError("TMDB unavailable")
+        yield
+
+    monkeypatch.setattr("app.main.stream_title_details", failing_stream)
+    response = client.get("/api/details/949/movie/stream")
+    assert response.status_code == 500
+
+
+def test_title_details_stream_sends_ndjson_events(monkeypatch):
+    async def stream(tmdb_id, media_type, api_key):
+        yield {"event": "tmdb", "data": {"title": "Heat"}}
+        yield {"event": "external", "data": {"letterboxd_rating": 3.9}}
+        yield {"event": "complete", "data": None}
+
+    monkeypatch.setattr("app.main.stream_title_details", stream)
+    response = client.get("/api/details/949/movie/stream")
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == ["tmdb", "external", "complete"]
+
+
+def test_title_details_batch_rejects_oversized_batches():
+    titles = [{"tmdb_id": str(i), "media_type": "movie"} for i in range(101)]
+    response = client.post("/api/details/batch", json={"titles": titles})
+    assert response.status_code == 400
+
+
+def test_title_details_batch_streams_results_with_their_index(monkeypatch):
+    async def iter_batch(titles, api_key):
+        yield 1, {"tmdb_id": "949", "media_type": "movie", "status": "ok", "data": {}}
+        yield 0, {"tmdb_id": "1", "media_type": "anime", "status": "error", "error": "Invalid media type"}
+
+    monkeypatch.setattr("app.main.iter_title_details_batch", iter_batch)
+    response = client.post(
+        "/api/details/batch",
+        json={
+            "titles": [
+                {"tmdb_id": "1", "media_type": "anime"},
+                {"tmdb_id": "949", "media_type": "movie"},
+            ],
+            "stream": True,
+        },
+    )
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["index"], line["status"]) for line in lines] == [(1, "ok"), (0, "error")]
+
+
+def test_title_details_batch_accepts_integer_ids(monkeypatch):
+    received = []
+
+    async def get_batch(titles, api_key):
+        received.extend(titles)
+        return []
+
+    monkeypatch.setattr("app.main.get_title_details_batch", get_batch)
+    response = client.post(
+        "/api/details/batch",
+        json={"titles": [{"tmdb_id": 550, "media_type": "movie"}]},
+    )
+
+    assert response.status_code == 200
+    assert received == [("550", "movie")]
@@ -0,0 +1,29 @@
+import pytest
+from app.metrics import REGISTRY, get_key_family, track_scrape
+
+
+def test_key_families():
+    assert get_key_family("details_550_movie") == "details"
+    assert get_key_family("trending_movies") == "trending_movies"
+    assert get_key_family("validators_3f2a") == "validators"
+    assert get_key_family("warmup_current_run") == "other"
+
+
+@pytest.mark.asyncio
+async def test_track_scrape_times_and_releases_in_flight():
+    @track_scrape
+    async def get_example_rating(fail):
+        assert REGISTRY.get_sample_value(
+            "reelratings_scrapes_in_flight", {"function": "get_example_rating"}
+        ) == 1
+        if fail:
+            raise ValueError("page changed")
+        return "8.1"
+
+    assert await get_example_rating(False) == "8.1"
+    with pytest.raises(ValueError):
+        await get_example_rating(True)
+
+    labels = {"function": "get_example_rating"}
+    assert REGISTRY.get_sample_value("reelratings_scrapes_in_flight", labels) == 0
+    assert REGISTRY.get_sample_value("reelratings_scrape_duration_seconds_count", labels) == 2
@@ -0,0 +1,46 @@
+from app.utils.prefix_index_utils import PrefixIndex, normalize_query
+
+
+def title(tmdb_id, name):
+    return {"tmdb_id": tmdb_id, "title": name, "media_type": "movie"}
+
+
+def build_index(*names, **kwargs):
+    index = PrefixIndex(**kwargs)
+    for i, name in enumerate(names):
+        index.add(i, name, title(i, name))
+    return index
+
+
+def test_normalize_query_folds_case_diacritics_and_punctuation():
+    assert normalize_query("  Amélie:  Le Fabuleux ") == "amelie le fabuleux"
+    assert normalize_query("WALL·E") == normalize_query("wall e")
+    assert normalize_query("") == ""
+
+
+def test_search_matches_word_prefixes_and_ranks_title_prefix_first():
+    index = build_index("The Matrix", "Matilda", "Mad Max: Fury Road", "Dune")
+
+    names = [result["title"] for result in index.search("ma")]
+
+    assert set(names) == {"The Matrix", "Matilda", "Mad Max: Fury Road"}
+    assert names[-1] == "The Matrix"
+    assert index.search("MAD f")[0]["title"] == "Mad Max: Fury Road"
+    assert index.search("mx") == []
+
+
+def test_search_confirms_words_longer_than_the_indexed_prefix():
+    index = build_index("Interstellar", "Internship", max_prefix_length=3)
+
+    assert [result["title"] for result in index.search("interst")] == ["Interstellar"]
+
+
+def test_oldest_titles_are_evicted_and_readding_replaces():
+    index = build_index("Alien", "Aliens", "Alien 3", max_entries=2)
+
+    assert len(index) == 2
+    assert {result["title"] for result in index.search("alien")} == {"Aliens", "Alien 3"}
+
+    index.add(1, "Brazil", title(1, "Brazil"))
+    assert [result["title"] for result in index.search("alien")] == ["Alien 3"]
+    assert index.search("bra")[0]["title"] == "Brazil"
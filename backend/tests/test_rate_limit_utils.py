@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from app.utils.rate_limit_utils import (
+    BACKGROUND_PRIORITY,
+    USER_PRIORITY,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+@pytest.mark.asyncio
+async def test_user_waiters_are_served_before_background_waiters():
+    bucket = TokenBucket(rate=50, capacity=1)
+    await bucket.acquire()
+    order = []
+
+    async def request(name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    background = asyncio.create_task(request("background", BACKGROUND_PRIORITY))
+    await asyncio.sleep(0)
+    user = asyncio.create_task(request("user", USER_PRIORITY))
+    await asyncio.gather(background, user)
+
+    assert order == ["user", "background"]
+
+
+@pytest.mark.asyncio
+async def test_background_requests_leave_the_reserve():
+    bucket = TokenBucket(rate=1, capacity=4, reserve=3)
+    await bucket.acquire(BACKGROUND_PRIORITY)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(bucket.acquire(BACKGROUND_PRIORITY), 0.05)
+    await asyncio.wait_for(bucket.acquire(USER_PRIORITY), 0.05)
+
+
+def test_throttling_halves_the_rate_and_success_recovers_it():
+    bucket = TokenBucket(rate=4, capacity=4)
+    bucket.on_throttled(retry_after=2)
+
+    assert bucket.rate == 2
+    assert bucket.tokens == 0
+    assert bucket.stats()["paused_for"] > 1.5
+
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.rate == 4
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
@@ -0,0 +1,27 @@
+import pytest
+from app import rate_limiter
+from app.utils.rate_limit_utils import BACKGROUND_PRIORITY
+
+
+@pytest.fixture
+def buckets(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_PROCESSES", 2)
+
+
+def test_limits_are_split_between_processes(buckets):
+    bucket = rate_limiter.get_bucket("imdb")
+
+    assert bucket.rate == 1
+    assert bucket.max_rate == 1
+    assert bucket.capacity == 3
+
+
+@pytest.mark.asyncio
+async def test_background_requests_fit_in_a_one_token_bucket(buckets, monkeypatch):
+    monkeypatch.setenv("COMMONSENSEMEDIA_BURST", "1")
+    bucket = rate_limiter.get_bucket("commonsensemedia")
+
+    assert bucket.capacity == 1
+    await bucket.acquire(BACKGROUND_PRIORITY)
+    assert bucket.acquired == 1
@@ -0,0 +1,172 @@
+import asyncio
+import fakeredis
+import pytest
+from app import redis_client
+from app.utils.serialization_utils import encode_value
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", client)
+    monkeypatch.setattr(redis_client, "LOCAL_CACHE_ENABLED", True)
+    redis_client.local_cache.clear()
+    return client
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_are_served_locally(fake_redis):
+    await redis_client.set_key("search_heat", ["Heat"], ex=60)
+    assert await redis_client.get_key("search_heat") == ["Heat"]
+
+    # Changed behind the local tier's back, without an invalidation
+    await fake_redis.set("search_heat", encode_value(["Heat (1986)"]))
+
+    assert await redis_client.get_key("search_heat") == ["Heat"]
+
+
+@pytest.mark.asyncio
+async def test_published_invalidations_drop_local_copies(fake_redis):
+    listener = asyncio.create_task(redis_client.listen_for_invalidations(fake_redis))
+    try:
+        await redis_client.set_key("search_heat", ["Heat"], ex=60)
+        await redis_client.get_key("search_heat")
+        await asyncio.sleep(0.05)
+
+        # Another worker writes the key
+        await fake_redis.set("search_heat", encode_value(["Heat (1986)"]))
+        await fake_redis.publish(redis_client.INVALIDATION_CHANNEL, "search_heat")
+        await asyncio.sleep(0.05)
+
+        assert await redis_client.get_key("search_heat") == ["Heat (1986)"]
+    finally:
+        listener.cancel()
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_a_read_is_not_undone(monkeypatch, fake_redis):
+    await fake_redis.set("search_heat", encode_value(["Heat"]))
+    get = fake_redis.get
+
+    async def get_then_invalidate(key):
+        value = await get(key)
+        redis_client.local_cache.invalidate(key)
+        return value
+
+    monkeypatch.setattr(fake_redis, "get", get_then_invalidate)
+
+    assert await redis_client.get_key("search_heat") == ["Heat"]
+    assert redis_client.local_cache.get("search_heat") is None
+
+
+@pytest.mark.asyncio
+async def test_mget_reads_only_keys_missing_locally(monkeypatch, fake_redis):
+    await redis_client.set_key("details_1_movie", {"title": "Heat"}, ex=60)
+    await redis_client.get_key("details_1_movie")
+    await fake_redis.set("details_2_movie", encode_value({"title": "Ronin"}))
+    await fake_redis.set("details_4_movie", b"\x00RR\x09\x02\x00corrupt")
+    mget = fake_redis.mget
+    requested = []
+
+    async def recording_mget(keys):
+        requested.extend(keys)
+        return await mget(keys)
+
+    monkeypatch.setattr(fake_redis, "mget", recording_mget)
+
+    values = await redis_client.get_keys(
+        ["details_1_movie", "details_2_movie", "details_3_movie", "details_4_movie"]
+    )
+
+    assert values == [{"title": "Heat"}, {"title": "Ronin"}, None, None]
+    assert requested == ["details_2_movie", "details_3_movie", "details_4_movie"]
+    assert redis_client.local_cache.get("details_2_movie") == {"title": "Ronin"}
+
+
+class PubSubServer:
+    """A Redis server speaking just enough RESP to hold one subscription"""
+
+    def __init__(self):
+        self.subscriptions = 0
+        self.subscribers = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                command = await self.read_command(reader)
+                name = command[0].upper()
+                if name == b"SUBSCRIBE":
+                    self.subscriptions += 1
+                    self.subscribers.append(writer)
+                    writer.write(encode_array(b"subscribe", command[1], 1))
+                elif name == b"PING" and writer in self.subscribers:
+                    writer.write(encode_array(b"pong", *command[1:]))
+                elif name == b"PING" and len(command) > 1:
+                    writer.write(encode_array(command[1])[4:])
+                elif name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    async def read_command(self, reader):
+        header = await reader.readline()
+        if not header:
+            raise ConnectionError("Client disconnected")
+        count = int(header[1:])
+        arguments = []
+        for _ in range(count):
+            length = int((await reader.readline())[1:])
+            arguments.append((await reader.readexactly(length + 2))[:-2])
+        return arguments
+
+    async def stop(self):
+        for writer in self.subscribers:
+            writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def publish(self, channel, message):
+        for writer in self.subscribers:
+            writer.write(encode_array(b"message", channel, message))
+            await writer.drain()
+
+
+def encode_array(*items):
+    encoded = f"*{len(items)}\r\n".encode()
+    for item in items:
+        if isinstance(item, int):
+            encoded += f":{item}\r\n".encode()
+        else:
+            encoded += f"${len(item)}\r\n".encode() + item + b"\r\n"
+    return encoded
+
+
+@pytest.mark.asyncio
+async def test_invalidation_after_an_idle_period_is_received(monkeypatch):
+    server = PubSubServer()
+    port = await server.start()
+    monkeypatch.setattr(redis_client, "REDIS_URL", f"redis://127.0.0.1:{port}")
+    monkeypatch.setattr(redis_client, "REDIS_SOCKET_TIMEOUT", 0.1)
+    redis_client.local_cache.clear()
+    redis_client.local_cache.set("search_heat", ["Heat"], size=10)
+
+    listener = asyncio.create_task(redis_client.listen_for_invalidations())
+    try:
+        # Idle for longer than the socket timeout of the shared pool
+        await asyncio.sleep(0.5)
+        await server.publish(redis_client.INVALIDATION_CHANNEL.encode(), b"search_heat")
+        await asyncio.sleep(0.05)
+
+        assert redis_client.local_cache.get("search_heat") is None
+        assert server.subscriptions == 1
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        await server.stop()
@@ -0,0 +1,157 @@
+import fakeredis
+import httpx
+import pytest
+from app import revalidation
+from app.revalidation import (
+    ConditionalFetch,
+    fingerprint_value,
+    get_previous_value,
+    get_validators_key,
+    revalidating,
+    revalidation_stats,
+    start_conditional_fetch,
+)
+from app.utils.serialization_utils import decode_value, encode_value
+
+PREVIOUS_VALUE = {"imdb_rating": "8.1", "metascore": "76"}
+PREVIOUS = {
+    "etag": '"abc"',
+    "last_modified": "Wed, 01 Oct 2025 00:00:00 GMT",
+    "fingerprint": fingerprint_value(PREVIOUS_VALUE),
+    "bytes": 1000,
+}
+PREVIOUS_DETAILS = {
+    "tmdb_data": {"title": "Heat", "year": "1995"},
+    "external_data": {**PREVIOUS_VALUE, "letterboxd_rating": None, "pending_fields": []},
+}
+IMDB_FIELDS = ("imdb_rating", "metascore")
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake_redis = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(revalidation, "redis_client", fake_redis)
+    return fake_redis
+
+
+def test_sends_validators_only_for_the_previous_value():
+    assert ConditionalFetch("https://example.com", PREVIOUS).request_headers() == {}
+    changed_value = {"imdb_rating": "7.9", "metascore": "76"}
+    assert (
+        ConditionalFetch(
+            "https://example.com", PREVIOUS, previous_value=changed_value
+        ).request_headers()
+        == {}
+    )
+
+    conditional = ConditionalFetch(
+        "https://example.com", PREVIOUS, previous_value=PREVIOUS_VALUE
+    )
+
+    assert conditional.request_headers() == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Wed, 01 Oct 2025 00:00:00 GMT",
+    }
+
+
+def test_not_modified_reuses_previous_value():
+    bytes_saved = revalidation_stats["bytes_saved"]
+    conditional = ConditionalFetch(
+        "https://example.com", PREVIOUS, previous_value=PREVIOUS_VALUE
+    )
+
+    conditional.record_response(httpx.Response(304))
+
+    assert conditional.not_modified
+    assert conditional.previous_value == PREVIOUS_VALUE
+    assert revalidation_stats["bytes_saved"] == bytes_saved + 1000
+
+
+def test_records_validators_of_changed_page():
+    conditional = ConditionalFetch("https://example.com", PREVIOUS)
+    conditional.record_response(httpx.Response(200, headers={"ETag": '"def"'}))
+
+    assert not conditional.not_modified
+    assert conditional.validators == {"etag": '"def"', "last_modified": None}
+
+
+def test_previous_value_comes_from_the_details():
+    assert get_previous_value(PREVIOUS_DETAILS, "tmdb_data") == {
+        "title": "Heat",
+        "year": "1995",
+    }
+    assert get_previous_value(PREVIOUS_DETAILS, IMDB_FIELDS) == PREVIOUS_VALUE
+    assert get_previous_value(PREVIOUS_DETAILS, "letterboxd_rating") is None
+    assert get_previous_value(None, "imdb_rating") is None
+
+    partial_details = {
+        "external_data": {"imdb_rating": None, "pending_fields": ["imdb_rating"]}
+    }
+    assert get_previous_value(partial_details, IMDB_FIELDS) is None
+
+
+def test_search_results_are_kept_per_title():
+    url = "https://www.rottentomatoes.com/search?search=Heat"
+
+    assert get_validators_key(url, "Heat", "1995", "movie") != get_validators_key(
+        url, "Heat", "1986", "movie"
+    )
+    assert get_validators_key(url, "Heat", "1995", "movie") != get_validators_key(
+        url, "Heat", "1995", "tv"
+    )
+
+
+@pytest.mark.asyncio
+async def test_not_modified_page_keeps_its_validators(fake_redis):
+    url = "https://www.imdb.com/title/tt0113277"
+    key = get_validators_key(url)
+    await fake_redis.set(key, encode_value(PREVIOUS), ex=60)
+
+    with revalidating(PREVIOUS_DETAILS):
+        conditional = await start_conditional_fetch(url, fields=IMDB_FIELDS)
+    conditional.record_response(httpx.Response(304))
+
+    assert await conditional.reuse_previous_value() == PREVIOUS_VALUE
+    assert await fake_redis.ttl(key) > 60
+
+
+@pytest.mark.asyncio
+async def test_saves_only_the_validators_and_a_fingerprint(fake_redis):
+    url = "https://www.imdb.com/title/tt0113277"
+    conditional = await start_conditional_fetch(url, fields=IMDB_FIELDS)
+    conditional.record_response(httpx.Response(200, headers={"ETag": '"abc"'}))
+
+    await conditional.save(PREVIOUS_VALUE)
+
+    entry = decode_value(await fake_redis.get(get_validators_key(url)))
+    assert entry == {
+        "etag": '"abc"',
+        "last_modified": None,
+        "fingerprint": fingerprint_value(PREVIOUS_VALUE),
+        "bytes": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_page_without_validators_is_not_saved(fake_redis):
+    url = "https://www.imdb.com/title/tt0113277"
+    conditional = await start_conditional_fetch(url, fields=IMDB_FIELDS)
+    conditional.record_response(httpx.Response(200))
+
+    await conditional.save(PREVIOUS_VALUE)
+
+    assert await fake_redis.dbsize() == 0
+
+
+@pytest.mark.asyncio
+async def test_revalidated_page_without_validators_drops_them(fake_redis):
+    url = "https://www.imdb.com/title/tt0113277"
+    key = get_validators_key(url)
+    await fake_redis.set(key, encode_value(PREVIOUS), ex=60)
+
+    with revalidating(PREVIOUS_DETAILS):
+        conditional = await start_conditional_fetch(url, fields=IMDB_FIELDS)
+    conditional.record_response(httpx.Response(200))
+    await conditional.save({"imdb_rating": "7.9", "metascore": "76"})
+
+    assert not await fake_redis.exists(key)
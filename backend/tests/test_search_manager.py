@@ -0,0 +1,79 @@
+import fakeredis
+import pytest
+from app import redis_client, search_manager
+from app.utils.prefix_index_utils import PrefixIndex
+
+
+def title(tmdb_id, name, media_type="movie"):
+    return {"tmdb_id": tmdb_id, "title": name, "media_type": media_type}
+
+
+HE_TITLES = [
+    title(1, "Heat"),
+    title(2, "Her"),
+    title(3, "Hereditary"),
+    title(4, "Hell or High Water"),
+    title(5, "Hereafter"),
+    title(6, "Hellboy"),
+]
+
+
+@pytest.fixture
+def tmdb_searches(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", client)
+    redis_client.local_cache.clear()
+    monkeypatch.setattr(search_manager, "search_index", PrefixIndex())
+    monkeypatch.setattr(search_manager, "indexed_trending", {"keys": None})
+
+    queries = []
+
+    async def search_title(query, api_key):
+        queries.append(query)
+        return [title(99, f"{query.title()} (TMDB)")]
+
+    monkeypatch.setattr(search_manager, "search_title", search_title)
+    return queries
+
+
+@pytest.mark.asyncio
+async def test_short_queries_are_answered_from_the_index(tmdb_searches):
+    search_manager.index_titles(HE_TITLES)
+
+    results = await search_manager.search_titles("He", "key")
+
+    assert {result["tmdb_id"] for result in results} == {1, 2, 3, 4, 5, 6}
+    assert tmdb_searches == []
+
+
+@pytest.mark.asyncio
+async def test_short_queries_with_few_local_matches_call_tmdb(tmdb_searches):
+    search_manager.index_titles(HE_TITLES[:2])
+
+    results = await search_manager.search_titles("he", "key")
+    assert results == [title(99, "He (TMDB)")]
+    assert tmdb_searches == ["he"]
+
+    # The normalized query is cached for the next search
+    assert await search_manager.search_titles(" HE ", "key") == results
+    assert tmdb_searches == ["he"]
+
+
+@pytest.mark.asyncio
+async def test_longer_queries_skip_the_index(tmdb_searches):
+    search_manager.index_titles(HE_TITLES + [title(7, f"Heat {i}") for i in range(5)])
+
+    await search_manager.search_titles("heat", "key")
+
+    assert len("heat") > search_manager.LOCAL_PREFIX_MAX_LENGTH
+    assert tmdb_searches == ["heat"]
+
+
+def test_unchanged_trending_list_is_indexed_once(tmdb_searches):
+    assert search_manager.index_trending_titles(HE_TITLES)
+    assert not search_manager.index_trending_titles(list(HE_TITLES))
+    assert search_manager.index_trending_titles(HE_TITLES[1:] + [title(7, "Heist")])
+
+    # Titles evicted by search results are indexed again
+    search_manager.search_index.remove("movie_7")
+    assert search_manager.index_trending_titles(HE_TITLES[1:] + [title(7, "Heist")])
@@ -0,0 +1,36 @@
+import json
+import pytest
+from app.utils.serialization_utils import (
+    SerializationError,
+    decode_value,
+    encode_value,
+)
+
+DETAILS = {
+    "tmdb_data": {"title": "Amélie", "year": "2001", "director": [{"id": 1}]},
+    "external_data": {"imdb_rating": "8.3", "box_office_amounts": ["$1"] * 200},
+}
+
+
+@pytest.mark.parametrize("codec", ["json", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_round_trip(codec, compression):
+    pytest.importorskip("msgpack")
+    encoded = encode_value(DETAILS, codec=codec, compression=compression)
+    assert decode_value(encoded) == DETAILS
+
+
+def test_small_payloads_are_not_compressed():
+    encoded = encode_value({"a": 1}, codec="json", compression="zlib")
+    assert encoded[5] == 0
+
+
+def test_legacy_json_values_are_read():
+    assert decode_value(json.dumps(DETAILS).encode("utf-8")) == DETAILS
+    assert decode_value(json.dumps(DETAILS)) == DETAILS
+
+
+def test_corrupt_values_raise_serialization_error():
+    encoded = encode_value(DETAILS, codec="json", compression="zlib")
+    with pytest.raises(SerializationError):
+        decode_value(encoded[:-10])
@@ -0,0 +1,28 @@
+import asyncio
+import pytest
+from app.utils.server_timing_utils import recording_server_timing, timed
+
+
+def test_timed_is_a_no_op_outside_a_request():
+    with timed("cache_lookup"):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_records_stages_of_tasks_started_in_the_request():
+    async def scrape():
+        with timed("imdb_fetch"):
+            await asyncio.sleep(0.01)
+        with timed("imdb_fetch"):
+            await asyncio.sleep(0.01)
+
+    with recording_server_timing() as timing:
+        with timed("cache_lookup"):
+            pass
+        await asyncio.create_task(scrape())
+
+    durations = timing.as_dict()
+    assert list(durations) == ["cache_lookup", "imdb_fetch", "total"]
+    assert durations["imdb_fetch"] >= 20
+    assert timing.header().startswith("cache_lookup;dur=")
+    assert "imdb_fetch;dur=" in timing.header()
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from app.utils.single_flight_utils import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_computation():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    results = await asyncio.gather(
+        *(single_flight.run("details_1_movie", compute) for _ in range(5))
+    )
+
+    assert calls == 1
+    assert all(result == {"value": 1} for result in results)
+    assert single_flight.stats() == {"originating": 1, "coalesced": 4, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_key_is_released():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("scrape failed")
+
+    results = await asyncio.gather(
+        single_flight.run("details_1_movie", fail),
+        single_flight.run("details_1_movie", fail),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not single_flight.in_flight("details_1_movie")
@@ -0,0 +1,29 @@
+from app.utils.streaming_utils import StreamTarget
+
+
+def test_reached_once_every_marker_pair_is_complete():
+    target = StreamTarget(markers=[(b'id="scores"', b"</script>"), (b"meta", b">")])
+    scanner = target.scanner()
+    buffer = bytearray(b'<head><meta name="x"><script id="sco')
+
+    assert not scanner.reached(buffer)
+    buffer += b'res">{"score": 1}</scr'
+    assert not scanner.reached(buffer)
+    buffer += b"ipt><body>"
+    assert scanner.reached(buffer)
+
+
+def test_end_marker_before_start_marker_does_not_count():
+    target = StreamTarget(markers=[(b'id="scores"', b"</script>")])
+    scanner = target.scanner()
+
+    assert not scanner.reached(bytearray(b'<script></script><script id="scores">'))
+
+
+def test_reached_on_stop_marker_or_byte_budget():
+    target = StreamTarget(
+        markers=[(b"twitter:data2", b">")], stop_markers=[b"</head>"], byte_budget=50
+    )
+
+    assert target.scanner().reached(bytearray(b"<head></head><body>"))
+    assert target.scanner().reached(bytearray(b"x" * 50))
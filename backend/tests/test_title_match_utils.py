@@ -0,0 +1,60 @@
+import pytest
+from app.utils import title_match_utils
+from app.utils.title_match_utils import best_match, normalize_title, rank_candidates, title_scores
+
+
+@pytest.fixture(params=["rapidfuzz", "pure python"])
+def backend(request, monkeypatch):
+    if request.param == "pure python":
+        monkeypatch.setattr(title_match_utils, "process", None)
+    elif title_match_utils.process is None:
+        pytest.skip("rapidfuzz is not installed")
+    return request.param
+
+
+def test_normalize_title_folds_articles_diacritics_and_punctuation():
+    assert normalize_title("Godfather, The") == "godfather"
+    assert normalize_title("The Godfather") == "godfather"
+    assert normalize_title("Amélie") == "amelie"
+    assert normalize_title("Fast & Furious") == "fast and furious"
+    assert normalize_title("WALL·E") == normalize_title("WALL-E")
+
+
+def test_title_scores_match_across_backends(backend):
+    scores = title_scores("The Godfather", ["Godfather, The", "The Godfather Part II", ""])
+
+    assert scores[0] == pytest.approx(1.0)
+    assert 0.6 < scores[1] < 0.8
+    assert scores[2] == 0
+    assert title_scores("Heat", []) == []
+
+
+def test_word_order_is_ignored(backend):
+    assert title_scores("Lost in Translation", ["Translation Lost In"])[0] == pytest.approx(1.0)
+
+
+def test_best_match_ranks_instead_of_taking_the_first_match(backend):
+    candidates = [("Aliens", 1986), ("Alien", 1979), ("Alien 3", 1992)]
+    assert best_match("Alien", 1979, candidates) == 1
+
+    remakes = [("Heat", 1986), ("The Heat", 2013), ("Heat", 1995)]
+    assert best_match("Heat", 1995, remakes) == 2
+
+
+def test_year_distance_breaks_ties_and_limits_matches(backend):
+    candidates = [("Whiplash", 2013), ("Whiplash", 2014)]
+    ranked = rank_candidates("Whiplash", 2014, candidates)
+
+    assert [index for index, _ in ranked] == [1, 0]
+    assert best_match("Whiplash", 2016, candidates) is None
+    assert best_match("Whiplash", None, candidates) == 0
+
+
+def test_no_match_below_the_threshold(backend):
+    assert best_match("Barbie", 2023, [("Barbie & Ken", 2023)]) is None
+
+
+def test_off_by_one_year_matches_over_the_threshold(backend):
+    assert title_scores("Tangled", ["Tangled Up"])[0] == pytest.approx(0.82, abs=0.01)
+    assert best_match("Tangled", 2010, [("Tangled Up", 2011)]) == 0
+    assert best_match("Tangled", 2010, [("Tangled Up", 2012)]) is None
@@ -0,0 +1,92 @@
+import time
+import fakeredis
+import pytest
+from app import redis_client, tmdb_api
+from app.redis_client import STALE_CACHE_SECONDS
+from app.utils.serialization_utils import encode_value
+
+DAY = 24 * 60 * 60
+HOUR = 60 * 60
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "redis_client", client)
+    redis_client.local_cache.clear()
+    return client
+
+
+def movie(tmdb_id):
+    return {"tmdb_id": tmdb_id, "media_type": "movie"}
+
+
+async def cache_details(fake_redis, tmdb_id, expires_in, soft_expiry=True):
+    """Cache details with a soft expiry envelope, or with a plain TTL"""
+    details = {"tmdb_data": {"title": f"Title {tmdb_id}"}, "external_data": {}}
+    if soft_expiry:
+        value = {"value": details, "soft_expires_at": time.time() + expires_in}
+        ttl = expires_in + STALE_CACHE_SECONDS
+    else:
+        value = details
+        ttl = expires_in
+    await fake_redis.set(f"details_{tmdb_id}_movie", encode_value(value), ex=ttl)
+
+
+@pytest.mark.asyncio
+async def test_expiring_titles_with_and_without_soft_expiry(fake_redis):
+    await cache_details(fake_redis, 1, DAY)
+    await cache_details(fake_redis, 2, HOUR)
+    await cache_details(fake_redis, 3, DAY, soft_expiry=False)
+    await cache_details(fake_redis, 4, HOUR, soft_expiry=False)
+    movies = [movie(tmdb_id) for tmdb_id in range(1, 6)]
+
+    expiring = await tmdb_api.select_expiring_titles(movies)
+
+    assert [m["tmdb_id"] for m in expiring] == [2, 4, 5]
+
+
+@pytest.fixture
+def warmed(monkeypatch):
+    titles = []
+
+    async def warm_up_titles(movies, api_key):
+        titles.extend(m["tmdb_id"] for m in movies)
+
+    monkeypatch.setattr(tmdb_api, "warm_up_titles", warm_up_titles)
+    return titles
+
+
+@pytest.mark.asyncio
+async def test_trending_warm_up_skips_fresh_titles(fake_redis, warmed):
+    await cache_details(fake_redis, 1, DAY)
+    await cache_details(fake_redis, 2, HOUR)
+    await cache_details(fake_redis, 3, DAY, soft_expiry=False)
+    await cache_details(fake_redis, 4, HOUR, soft_expiry=False)
+    movies = [movie(tmdb_id) for tmdb_id in range(1, 6)]
+
+    await tmdb_api.cache_trending_movie_details(movies, "key")
+
+    assert warmed == [2, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh_warms_new_and_expiring_titles(fake_redis, warmed):
+    # Kept: 1 fresh, 2 expiring. New: 3 fresh, 4 missing. Dropped: 5
+    await cache_details(fake_redis, 1, DAY)
+    await cache_details(fake_redis, 2, HOUR)
+    await cache_details(fake_redis, 3, DAY)
+    previous = [movie(tmdb_id) for tmdb_id in (1, 2, 5)]
+    movies = [movie(tmdb_id) for tmdb_id in (4, 2, 3, 1)]
+
+    counts = await tmdb_api.refresh_trending_incrementally(previous, movies, "key")
+
+    # In trending rank order
+    assert warmed == [4, 2]
+    assert counts == {
+        "new": 2,
+        "kept": 2,
+        "dropped": 1,
+        "refreshed": 1,
+        "warmed_new": 1,
+    }
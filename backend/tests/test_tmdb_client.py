@@ -0,0 +1,57 @@
+import httpx
+import pytest
+from app import rate_limiter, tmdb_client as tmdb_client_module
+from app.tmdb_client import TMDBClient
+
+
+def use_responses(monkeypatch, responses):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return responses[min(len(requests), len(responses)) - 1]
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(rate_limiter, "RATE_LIMITING_ENABLED", False)
+    monkeypatch.setattr(tmdb_client_module, "get_client", lambda source: client)
+    return requests
+
+
+@pytest.mark.asyncio
+async def test_retries_throttled_and_server_errors(monkeypatch):
+    requests = use_responses(
+        monkeypatch,
+        [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(503),
+            httpx.Response(200, json={"results": []}),
+        ],
+    )
+    client = TMDBClient(retry_base_delay=0.001)
+
+    assert await client.get_json("https://api.test/3/movie/1") == {"results": []}
+    assert len(requests) == 3
+    assert client.stats() == {"requests": 1, "retries": 2, "failures": 0}
+
+
+@pytest.mark.asyncio
+async def test_gives_up_on_long_retry_after(monkeypatch):
+    requests = use_responses(
+        monkeypatch, [httpx.Response(429, headers={"Retry-After": "120"})]
+    )
+    client = TMDBClient(max_retry_delay=10)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_json("https://api.test/3/movie/1")
+    assert len(requests) == 1
+    assert client.stats()["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_client_errors(monkeypatch):
+    requests = use_responses(monkeypatch, [httpx.Response(404)])
+    client = TMDBClient()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_json("https://api.test/3/movie/1")
+    assert len(requests) == 1
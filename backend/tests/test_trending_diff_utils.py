@@ -0,0 +1,29 @@
+from app.utils.trending_diff_utils import diff_titles
+
+
+def title(tmdb_id, media_type="movie"):
+    return {"tmdb_id": tmdb_id, "media_type": media_type, "title": f"Film {tmdb_id}"}
+
+
+def test_diff_keeps_rank_order():
+    previous = [title(1), title(2), title(3)]
+    current = [title(4), title(3), title(1), title(5)]
+
+    diff = diff_titles(previous, current)
+
+    assert [movie["tmdb_id"] for movie in diff["new"]] == [4, 5]
+    assert [movie["tmdb_id"] for movie in diff["kept"]] == [3, 1]
+    assert [movie["tmdb_id"] for movie in diff["dropped"]] == [2]
+
+
+def test_diff_matches_ids_across_types():
+    diff = diff_titles([title("7")], [title(7), title(7, "tv")])
+
+    assert [movie["media_type"] for movie in diff["kept"]] == ["movie"]
+    assert [movie["media_type"] for movie in diff["new"]] == ["tv"]
+
+
+def test_everything_is_new_without_a_previous_list():
+    diff = diff_titles([], [title(1), title(2)])
+
+    assert len(diff["new"]) == 2 and diff["kept"] == [] and diff["dropped"] == []
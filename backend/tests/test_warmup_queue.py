@@ -0,0 +1,86 @@
+import asyncio
+import fakeredis
+import pytest
+from app import warmup_queue
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(
+        warmup_queue, "redis_client", fakeredis.aioredis.FakeRedis(decode_responses=False)
+    )
+    monkeypatch.setattr(warmup_queue, "WARMUP_RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(warmup_queue, "WARMUP_MAX_ATTEMPTS", 2)
+    return warmup_queue
+
+
+async def consume_until(queue, handler, predicate, consumer_name="consumer"):
+    stop = asyncio.Event()
+
+    async def watch():
+        while not predicate(await queue.get_warmup_progress()):
+            await asyncio.sleep(0.01)
+        stop.set()
+
+    await asyncio.wait_for(
+        asyncio.gather(
+            queue.run_consumer(handler, consumer_name, stop=stop), watch()
+        ),
+        timeout=10,
+    )
+    return await queue.get_warmup_progress()
+
+
+def movies(count):
+    return [{"tmdb_id": i, "media_type": "movie"} for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_consumer_acknowledges_every_job(queue):
+    handled = []
+
+    async def handler(tmdb_id, media_type):
+        handled.append(tmdb_id)
+        return tmdb_id != "2"
+
+    await queue.enqueue_warm_up(movies(5))
+    progress = await consume_until(
+        queue, handler, lambda p: int(p["done"]) + int(p["skipped"]) == 5
+    )
+
+    assert sorted(handled) == ["0", "1", "2", "3", "4"]
+    assert progress["done"] == "4" and progress["skipped"] == "1"
+    assert progress["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failing_job_is_retried_then_dead_lettered(queue):
+    attempts = []
+
+    async def handler(tmdb_id, media_type):
+        attempts.append(tmdb_id)
+        raise ValueError("TMDB unavailable")
+
+    await queue.enqueue_warm_up(movies(1))
+    progress = await consume_until(queue, handler, lambda p: p["dead"] == "1")
+
+    assert attempts == ["0", "0"]
+    assert progress["retried"] == "1"
+    assert progress["dead_letter"] == 1 and progress["delayed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_jobs_of_a_crashed_consumer_are_claimed(queue, monkeypatch):
+    monkeypatch.setattr(queue, "WARMUP_CLAIM_IDLE_SECONDS", 0)
+    await queue.enqueue_warm_up(movies(2))
+    await queue.ensure_consumer_group()
+    # Read but never acknowledged, as if the worker restarted mid-job
+    assert len(await queue.read_jobs("crashed", 2)) == 2
+
+    async def handler(tmdb_id, media_type):
+        return True
+
+    progress = await consume_until(
+        queue, handler, lambda p: p["done"] == "2", consumer_name="survivor"
+    )
+    assert progress["queued"] == 0